@@ -12,7 +12,9 @@ from user.models import (
     Activities,
     CoporativeMembership,
     CoporativeActivities,
-    SavingsActivities
+    SavingsActivities,
+    SavingsInterestAccrual,
+    LedgerEntry
 )
 from django.contrib import auth
 from rest_framework.exceptions import AuthenticationFailed, ParseError
@@ -198,7 +200,8 @@ class AdminTransactionSerializer(serializers.Serializer):
     #               "amount", "status", "description", "user_id", "type", "withdrawal_details"]
     def to_representation(self, instance):
         if isinstance(instance, Transaction):
-            withdrawal = instance.user_withdrawal_transaction.first()
+            # .all() so the view's prefetch is used instead of a query per row
+            withdrawal = next(iter(instance.user_withdrawal_transaction.all()), None)
             if not withdrawal:
                 details = None
             else:
@@ -324,8 +327,10 @@ class GetUsersSerializers(serializers.ModelSerializer):
 
 
 class ActivitySerializer(serializers.ModelSerializer):
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False)
+
     class Meta:
-        model = Activities
+        model = LedgerEntry
         fields = ['title', 'activity_type', 'created_at', 'amount']
 
 
@@ -390,8 +395,8 @@ class GetSingleUserSerializer(serializers.ModelSerializer):
         return cop.balance
 
     def get_transactions(self, obj):
-        activities = Activities.objects.filter(
-            user=obj).order_by('-created_at')[:5]
+        activities = LedgerEntry.objects.filter(
+            user=obj).order_by('-created_at', '-id')[:5]
         return ActivitySerializer(activities, many=True).data
     def get_referees(self, obj):
         referees = obj.user_set.filter(is_subscribed=True)
@@ -575,12 +580,7 @@ class AdminOutsandingDividendsSerializer(serializers.ModelSerializer):
     def get_name(self, obj):
         return f"{obj.user.firstname} {obj.user.lastname}"
     def get_amount(self, obj):
-        monthly_dividend = obj.monthly_dividend
-        total = 0
-        for div in monthly_dividend.values():
-            if not div["status"]:
-                total += div["dividend"]
-        return total
+        return obj.outstanding
     
 class AdminPayOutstandingDividendsSerializer(serializers.Serializer):
     indices = serializers.ListField(
@@ -639,9 +639,14 @@ class AdminUserSavingsBreakdownSerializer(serializers.ModelSerializer):
         model = UserSavings
         fields = ["payment_details"]
 class AdminUserSavingsInterestSerializer(serializers.ModelSerializer):
+    # created_at, amount, interest and balance are the keys the admin frontend reads;
+    # amount and interest are both the day's accrued interest
+    amount = serializers.DecimalField(max_digits=20, decimal_places=4, coerce_to_string=False)
+    interest = serializers.DecimalField(source="amount", max_digits=20, decimal_places=4, coerce_to_string=False)
+    rate = serializers.DecimalField(max_digits=12, decimal_places=8, coerce_to_string=False)
     class Meta:
-        model = SavingsActivities
-        fields = ["created_at", "amount","interest", "balance"]
+        model = SavingsInterestAccrual
+        fields = ["created_at", "amount", "interest", "balance", "day", "rate"]
 class AdminUserCoporativeBreakdownSerializer(serializers.ModelSerializer):
     class Meta:
         model = CoporativeActivities
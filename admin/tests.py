@@ -1,3 +1,52 @@
+from django.contrib.auth.models import Group
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from transaction.models import Transaction
+from user.models import User, Withdrawal, DataAndAirtimeActivity
 
-# Create your tests here.
+
+class AdminTransactionsQueryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email="admin@example.com", firstname="Admin", lastname="User",
+                                        phone="08000000000", is_staff=True, is_verified=True, role="ADMIN")
+        cls.admin.groups.add(Group.objects.create(name="Accountant"))
+        for i in range(15):
+            user = User.objects.create(email=f"user{i}@example.com", firstname="User", lastname=str(i),
+                                       phone=f"0801000000{i:02d}")
+            transaction = Transaction.objects.create(user=user, amount=1000, source="test",
+                                                     type="WITHDRAWAL", description="withdrawal")
+            Withdrawal.objects.create(user=user, transaction=transaction, amount=1000,
+                                      bank_name="Bank", bank_code="000", account_number="0123456789")
+            Transaction.objects.create(user=user, amount=500, source="test",
+                                       type="WALLET-CREDIT", description="deposit")
+            DataAndAirtimeActivity.objects.create(user=user, amount=100, balance=400,
+                                                  network="MTN", number="08010000000")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def fetch(self, limit):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/admin/transactions/", {"limit": limit})
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        small, small_queries = self.fetch(3)
+        large, large_queries = self.fetch(45)
+        self.assertEqual(len(small["results"]), 3)
+        self.assertEqual(len(large["results"]), 45)
+        self.assertEqual(small_queries, large_queries)
+        # permission check, count, page of keys, transactions, withdrawals, data rows
+        self.assertEqual(large_queries, 6)
+
+    def test_results_are_merged_newest_first(self):
+        data, _ = self.fetch(45)
+        created = [row["created_at"] for row in data["results"]]
+        self.assertEqual(created, sorted(created, reverse=True))
+        withdrawals = [row for row in data["results"] if row["type"] == "WITHDRAWAL"]
+        self.assertTrue(all(row["withdrawal_details"] for row in withdrawals))
@@ -47,4 +47,5 @@ urlpatterns = [
     path("overview/", views.AdminOverview.as_view(), name="admin_overview"),
     path("check_name/<str:id>", views.CheckAccountName.as_view()),
     path("dividends/<str:id>", views.AdminUserEarnedDividend.as_view()),
+    path("metrics/", views.AdminMetrics.as_view(), name="admin_metrics"),
 ]
\ No newline at end of file
@@ -12,7 +12,8 @@ from user.models import (DataAndAirtimeActivity, User,
                          SavingsActivities,
                          Activities,
                          InvestmentCancel,
-                         SavingsCancel
+                         SavingsCancel,
+                         CooperativeDividend
                          )
 from django.contrib.auth.models import Group
 from django.utils.dateparse import parse_date
@@ -23,7 +24,6 @@ from drf_yasg import openapi
 from utils.pagination import CustomPagination
 from utils.safehaven import safe_name_enquires, send_money
 from datetime import timedelta
-from itertools import chain
 from django.utils.timezone import make_aware
 from .serializers import (
     AdminLoginSerializer,
@@ -59,15 +59,20 @@ from .serializers import (
     SendMoneySerializer
 )
 from transaction.models import Transaction
+from transaction import rollups
+from utils.cache import cached_response
+from utils import metrics
+from django.http import HttpResponse
+from user.wallet import WalletService
 import random
 import string
 from utils.email import SendMail
 from rest_framework import status
 from django.db import transaction
 from django.utils import timezone
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField, Subquery, OuterRef
+from django.db.models import Sum, F, ExpressionWrapper, DecimalField, Subquery, OuterRef, Prefetch, CharField
+from django.db.models.functions import Cast
 from datetime import datetime, date
-from operator import attrgetter
 from django.shortcuts import get_object_or_404
 import re
 from django.utils.timezone import now
@@ -108,7 +113,7 @@ class CustomeUserView(generics.GenericAPIView):
         if already_exists:
             return Response(data={"message": "reference code already exist"}, status=status.HTTP_400_BAD_REQUEST)
         user.referal_code = ref_code.upper()
-        user.save()
+        user.save(update_fields=["referal_code"])
         return Response(data={"message": "success"}, status=status.HTTP_200_OK)
 
 
@@ -210,7 +215,7 @@ class AdminUpdateTeamView(generics.GenericAPIView):
                 member.is_active = True
             elif user_status == 'inactive':
                 member.is_active = False
-            member.save()
+            member.save(update_fields=["is_active"])
 
         # Update user role if provided
         new_role = validated_data.get("role")
@@ -233,7 +238,6 @@ class AdminUpdateTeamView(generics.GenericAPIView):
                     name=new_group_name)
                 member.groups.add(new_group)
 
-        member.save()
         return Response(data={"message": "success"}, status=status.HTTP_200_OK)
 
 
@@ -291,22 +295,36 @@ class AdminTransactions(generics.GenericAPIView):
                 data_qs = []
             elif activity_type == 'data':
                 transaction_qs = []
-        combined_qs = sorted(
-            chain(transaction_qs,
-                  data_qs),
-            key=attrgetter('created_at'),
-            reverse=True
-        )
+        # merge both tables in the database so only one page of rows is ever loaded
+        parts = [qs.annotate(key=Cast('id', CharField()), kind=Value(kind))
+                 .values('key', 'created_at', 'kind').order_by()
+                 for qs, kind in ((transaction_qs, 'transaction'), (data_qs, 'data'))
+                 if not isinstance(qs, list)]
+        combined_qs = parts[0].union(*parts[1:], all=True).order_by('-created_at', '-key')
         page = self.paginate_queryset(combined_qs)
+        rows = self.load_rows(page if page is not None else combined_qs)
+        serializer = self.serializer_class(rows, many=True)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
             return self.get_paginated_response(serializer.data)
-        serializer = self.serializer_class(combined_qs, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def get_queryset(self):
         return Transaction.objects.all().order_by("-created_at")
 
+    def load_rows(self, keys):
+        keys = list(keys)
+        transaction_ids = [row['key'] for row in keys if row['kind'] == 'transaction']
+        data_ids = [int(row['key']) for row in keys if row['kind'] == 'data']
+        loaded = {}
+        if transaction_ids:
+            transactions = Transaction.objects.select_related('user').prefetch_related(
+                Prefetch('user_withdrawal_transaction', queryset=Withdrawal.objects.order_by('id')))
+            loaded.update({('transaction', str(pk)): row for pk, row in transactions.in_bulk(transaction_ids).items()})
+        if data_ids:
+            data = DataAndAirtimeActivity.objects.select_related('user')
+            loaded.update({('data', str(pk)): row for pk, row in data.in_bulk(data_ids).items()})
+        return [loaded[(row['kind'], row['key'])] for row in keys]
+
 
 class AdminOverview(views.APIView):
     permission_classes = [permissions.IsAuthenticated, IsAccountant]
@@ -319,6 +337,7 @@ class AdminOverview(views.APIView):
                               type=openapi.TYPE_STRING, required=False),
         ]
     )
+    @cached_response("overview")
     def get(self, request):
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
@@ -336,63 +355,34 @@ class AdminOverview(views.APIView):
         end_date = end_date or today
         end_date += timedelta(days=1)
 
-        transactions = Transaction.objects.all()
-        all_withdrawals = Withdrawal.objects.filter(status="SUCCESS")
-
-        filtered_withdrawal = all_withdrawals.filter(created_at__range=[start_date, end_date])
-        total_withdrawal_amount = all_withdrawals.aggregate(Sum('amount'))['amount__sum'] or 0
-        filtered_withdrawal_amount = filtered_withdrawal.aggregate(Sum('amount'))['amount__sum'] or 0
-
-
-
-        # Sum of all transaction amounts
-        total_sum = transactions.filter(status="SUCCESS", type="WALLET-CREDIT").aggregate(Sum('amount'))['amount__sum'] or 0
-
-        # Filtered transactions for the given period
-        filtered_transactions = transactions.filter(
-            created_at__range=[start_date, end_date], status="SUCCESS", type="WALLET-CREDIT")
-        filtered_sum = filtered_transactions.aggregate(Sum('amount'))['amount__sum'] or 0
-        #TODO clarificaation
-        all_savings = SavingsActivities.objects.all()
-        total_savings = all_savings.aggregate(Sum('amount'))['amount__sum'] or 0
-        filtered_saving = all_savings.filter(
-            created_at__range=[start_date, end_date])
-        filtered_savings_sum = filtered_saving.aggregate(Sum('amount'))[
-            'amount__sum'] or 0
-        
-        # # Sum of all transaction amounts
-        # savings = transactions.filter(nature="SAVINGS")
-        # total_savings = savings.aggregate(Sum('amount'))['amount__sum'] or 0
-
-        # # Filtered transactions for the given period
-        # filtered_saving = savings.filter(
-        #     created_at__range=[start_date, end_date])
-        # filtered_savings_sum = filtered_saving.aggregate(Sum('amount'))[
-        #     'amount__sum'] or 0
+        figures = ["withdrawal", "wallet_credit", "savings_deposit", "new_users",
+                   "loan_disbursed_count", "loan_disbursed", "loan_repayment"]
+        period = rollups.totals(start_date.date(), (end_date - timedelta(days=1)).date(), figures)
+        all_time = rollups.totals(metrics=figures)
 
+        total_withdrawal_amount = all_time['withdrawal']
+        filtered_withdrawal_amount = period['withdrawal']
+        total_sum = all_time['wallet_credit']
+        filtered_sum = period['wallet_credit']
+        total_savings = all_time['savings_deposit']
+        filtered_savings_sum = period['savings_deposit']
 
         all_users = User.objects.all()
         all_users_count = all_users.count()
-        filter_user_count = all_users.filter(
-            created_at__range=[start_date, end_date]).count()
+        filter_user_count = period['new_users']
         active_user = all_users.filter(is_active=True).count()
         all_coop = CoporativeMembership.objects.filter(is_active=True)
         coop_count = all_coop.count()
         total_coop = all_coop.aggregate(Sum('balance'))['balance__sum'] or 0
 
-        all_loans = Loan.objects.all()
-        disbured = all_loans.filter(status__in = ["APPROVED","REPAYED","OVER-DUE"])
-        total_repaid = disbured.filter(status="REPAYED").count()
-        # amount
-        loan_filter = disbured.filter(date_approved__range=[start_date, end_date])
-        all_loan_amount = disbured.aggregate(Sum('amount'))['amount__sum'] or 0
-        loan_filter_amount = loan_filter.aggregate(Sum('amount'))['amount__sum'] or 0
-        percentage_repayed = (total_repaid / disbured.count()) * 100 if disbured.count() else 0
+        total_repaid = Loan.objects.filter(status="REPAYED").count()
+        disbursed_count = all_time['loan_disbursed_count']
+        all_loan_amount = all_time['loan_disbursed']
+        loan_filter_amount = period['loan_disbursed']
+        percentage_repayed = (total_repaid / disbursed_count) * 100 if disbursed_count else 0
 
-        repayment_activities = Activities.objects.filter(title="Loan Repayment")
-        loan_total_repayment = repayment_activities.aggregate(Sum('amount'))['amount__sum'] or 0
-        loan_filter_activities = repayment_activities.filter(created_at__range=[start_date, end_date])
-        loan_filtered_repayment = loan_filter_activities.aggregate(Sum('amount'))['amount__sum'] or 0
+        loan_total_repayment = all_time['loan_repayment']
+        loan_filtered_repayment = period['loan_repayment']
 
 
         return Response({
@@ -647,7 +637,7 @@ class RejectWithdrawal(generics.GenericAPIView):
             withdraw.message = reason
             withdraw.admin_user = user
             withdraw_user = withdraw.user
-            withdraw_user.wallet_balance += withdraw.amount
+            WalletService.credit(withdraw_user, withdraw.amount)
             new_notification = Notification.objects.create(
                 user=withdraw_user,
                 title="Withdrawal request rejected",
@@ -655,7 +645,6 @@ class RejectWithdrawal(generics.GenericAPIView):
             )
             new_notification.save()
             withdraw.save()
-            withdraw_user.save()
             return Response(data={"message": "success"}, status=status.HTTP_200_OK)
 
 
@@ -665,7 +654,7 @@ class SuspendAccount(views.APIView):
     def get(self, request, id):
         user = get_object_or_404(User, pk=id)
         user.is_active = False
-        user.save()
+        user.save(update_fields=["is_active"])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -675,7 +664,7 @@ class UnSuspendAccount(views.APIView):
     def get(self, request, id):
         user = get_object_or_404(User, pk=id)
         user.is_active = True
-        user.save()
+        user.save(update_fields=["is_active"])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -703,21 +692,16 @@ class GetCooperativeUsersView(generics.ListAPIView):
 class AdminCoporateSavingsDashboard(views.APIView):
     permission_classes = [permissions.IsAuthenticated, IsAccountant]
 
+    @cached_response("coporative_stats")
     def get(self, request):
         coporative_members = CoporativeMembership.objects.filter(
             is_active=True)
         total_balance = coporative_members.aggregate(
             total=Sum('balance'))['total'] or 0
         active_members_count = coporative_members.count()
-        current_year = str(datetime.now().year)
-        total_dividends = 0
-        for member in coporative_members:
-            if member.monthly_dividend:
-                for key, entry in member.monthly_dividend.items():
-                    # Extract the year from the key (assuming it's in "Month Year" format)
-                    year = key.split()[-1]
-                    if year == current_year:
-                        total_dividends += entry.get('dividend', 0)
+        total_dividends = CooperativeDividend.objects.filter(
+            membership__is_active=True, period__year=datetime.now().year
+        ).aggregate(total=Sum('dividend'))['total'] or 0
 
         resp = {
             "total": total_balance,
@@ -739,12 +723,9 @@ class AdminOutstandingDividendsView(generics.GenericAPIView):
             return self.get_paginated_response(serializer.data)
         serializer = self.serializer_class(queryset, many=True)
     def get_queryset(self):
-        coporative_members = CoporativeMembership.objects.filter(is_active=True)
-        members_with_false_status = [
-            member for member in coporative_members
-            if any(entry.get('status') == False for entry in member.monthly_dividend.values() if member.monthly_dividend)
-        ]
-        return members_with_false_status
+        return CoporativeMembership.objects.filter(
+            is_active=True, dividends__status=False
+        ).annotate(outstanding=Sum('dividends__dividend')).select_related('user').order_by('id')
 class AdminPayOutstandingDividenView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated, IsAdministrator]
     serializer_class = AdminPayOutstandingDividendsSerializer
@@ -752,30 +733,21 @@ class AdminPayOutstandingDividenView(generics.GenericAPIView):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         indices = serializer.validated_data["indices"]
-        outstanding_users = CoporativeMembership.objects.filter(id__in=indices)
+        outstanding_users = CoporativeMembership.objects.filter(id__in=indices).select_related('user')
         for cop in outstanding_users:
-            monthly_dividends = cop.monthly_dividend
-            amt = 0
-            if not monthly_dividends:
-                continue
-            for key, value in monthly_dividends.items():
-                if value["status"]:
-                    continue
-                amt += value["dividend"]
-                value["status"] = True
-                monthly_dividends[key] = value
             with transaction.atomic():
-                cop.monthly_dividend = monthly_dividends
-                user = cop.user
-                user.wallet_balance += amt
-                user.save()
-                cop.save()
+                outstanding = CooperativeDividend.objects.select_for_update().filter(membership=cop, status=False)
+                amt = sum(outstanding.values_list('dividend', flat=True))
+                if not outstanding.update(status=True):
+                    continue
+                WalletService.credit(cop.user, amt)
                 CoporativeActivities.objects.create(amount=amt, balance=cop.balance, user_coop=cop, activity_type="DIVIDENDS")
         return Response(data={"message": "success"}, status=status.HTTP_200_OK)
 
 class AdminSavingsStatsView(views.APIView):
     permission_classes = [permissions.IsAuthenticated, IsAccountant]
 
+    @cached_response("savings_stats")
     def get(self, request):
         # Aggregating data
         savings_data = UserSavings.objects.aggregate(
@@ -921,6 +893,7 @@ class AdminInvestmentDashboards(views.APIView):
                               type=openapi.TYPE_STRING, required=False),
         ]
     )
+    @cached_response("investment_stats")
     def get(self, request):
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
@@ -1013,14 +986,13 @@ class AdminInvestmentDashboards(views.APIView):
         active_investments = latest_investments.filter(
             status="ACTIVE"
         ).count()
-        all_cancelled_investments = InvestmentCancel.objects.all()
-        cancelled_investment_filter = all_cancelled_investments.filter(created_at__range=[start_date, end_date])
-        cancelled_investment_count = all_cancelled_investments.count()
-        cancelled_investment_filter_count = cancelled_investment_filter.count()
-        cancelled_investment_penalties = all_cancelled_investments.aggregate(
-            total_amount=Sum('penalty'))['total_amount'] or 0
-        cancelled_investment_filter_penalty = cancelled_investment_filter.aggregate(
-            total_amount=Sum('penalty'))['total_amount'] or 0
+        figures = ["investment_cancelled_count", "investment_cancelled_penalty"]
+        cancelled_period = rollups.totals(start_date.date(), (end_date - timedelta(days=1)).date(), figures)
+        cancelled_all_time = rollups.totals(metrics=figures)
+        cancelled_investment_count = cancelled_all_time['investment_cancelled_count']
+        cancelled_investment_filter_count = cancelled_period['investment_cancelled_count']
+        cancelled_investment_penalties = cancelled_all_time['investment_cancelled_penalty']
+        cancelled_investment_filter_penalty = cancelled_period['investment_cancelled_penalty']
 
         investment_plans = InvestmentPlan.objects.all().order_by("-start_date")
         if filter_status:
@@ -1075,6 +1047,7 @@ class AdminLoanDashboard(views.APIView):
                               type=openapi.TYPE_STRING, required=False),
         ]
     )
+    @cached_response("loan_dashboard")
     def get(self, request, *args, **kwargs):
 
         start_date = self.request.query_params.get('start_date', None)
@@ -1108,14 +1081,15 @@ class AdminLoanDashboard(views.APIView):
         # Calculate total amounts
         total_amount = loans_with_interest.filter(
             status__in=approved_statuses).aggregate(Sum('amount'))['amount__sum'] or 0
-        total_amount_filter = loans_with_interest.filter(status__in=approved_statuses, date_approved__range=[
-                                                         start_date, end_date]).aggregate(Sum('amount'))['amount__sum'] or 0
+        period = rollups.totals(start_date.date(), (end_date - timedelta(days=1)).date(), [
+            "loan_disbursed", "loan_amount_repayed", "loan_disbursed_count", "loan_pending_count",
+            "loan_rejected_count", "loan_overdue_count"])
+        total_amount_filter = period['loan_disbursed']
 
         # Calculate total repayment
         total_repayment = loans_with_interest.aggregate(Sum('amount_repayed'))[
             'amount_repayed__sum'] or 0
-        total_repayment_filter = loans_with_interest.filter(date_approved__range=[
-                                                            start_date, end_date]).aggregate(Sum('amount_repayed'))['amount_repayed__sum'] or 0
+        total_repayment_filter = period['loan_amount_repayed']
 
         # Calculate loan interest
         loan_interest = loans_with_interest.filter(status__in=approved_statuses).aggregate(
@@ -1132,26 +1106,22 @@ class AdminLoanDashboard(views.APIView):
         # Count approved requests
         approved_request = loans_with_interest.filter(
             status__in=approved_statuses).count()
-        approved_filter = loans_with_interest.filter(
-            status__in=approved_statuses, date_approved__range=[start_date, end_date]).count()
+        approved_filter = period['loan_disbursed_count']
 
         # Count pending requests
         pending_request = loans_with_interest.filter(
             status=pending_status).count()
-        pending_request_filter = loans_with_interest.filter(
-            status=pending_status, date_requested__range=[start_date, end_date]).count()
+        pending_request_filter = period['loan_pending_count']
 
         # Count rejected requests
         rejected_request = loans_with_interest.filter(
             status=rejected_status).count()
-        rejected_request_filter = loans_with_interest.filter(
-            status=rejected_status, date_approved__range=[start_date, end_date]).count()
+        rejected_request_filter = period['loan_rejected_count']
 
         # Count overdue requests
         overdued_request = loans_with_interest.filter(
             status=overdued_status).count()
-        overdued_request_filter = loans_with_interest.filter(
-            status=overdued_status, date_approved__range=[start_date, end_date]).count()
+        overdued_request_filter = period['loan_overdue_count']
 
         # Prepare the response data
         response_data = {
@@ -1213,7 +1183,7 @@ class AdminAcceptLoan(views.APIView):
         with transaction.atomic():
             loan.status = "APPROVED"
             user = loan.user
-            user.wallet_balance += loan.amount
+            WalletService.credit(user, loan.amount)
             new_notification = Notification.objects.create(
                 user=user, title="LOAN APPROVAL",
                 text=f"Your loan request for {loan.amount} has been approved by an admin",
@@ -1222,7 +1192,6 @@ class AdminAcceptLoan(views.APIView):
             new_notification.save()
             Activities.objects.create(title="LOAN APPROVAL", amount=loan.amount, user=user, activity_type="CREDIT")
             loan.date_approved = datetime.today().date()
-            user.save()
             loan.save()
         return Response({"message": "success"}, status=status.HTTP_200_OK)
 
@@ -1456,14 +1425,10 @@ class AdminUserSavingsInterest(generics.GenericAPIView):
         savings = get_object_or_404(UserSavings, pk=id)
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
-        today = now()
-        start_date = make_aware(datetime.strptime(start_date, '%Y-%m-%d')) if start_date else today
-        start_date = start_date.replace(hour=0, minute=0, second=0)
-        if end_date:
-            end_date = make_aware(datetime.strptime(end_date, '%Y-%m-%d'))
-        end_date = end_date or today
-        end_date += timedelta(days=1)
-        queryset = SavingsActivities.objects.filter(savings=savings, created_at__range=[start_date, end_date]).order_by('-created_at')
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else timezone.localdate()
+        # accruals are written the night after, so default to the last 30 days rather than today alone
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else end_date - timedelta(days=30)
+        queryset = savings.interest_accruals.filter(day__range=(start_date, end_date)).order_by('-day')
         return queryset
 
 class AdminUserSavingsBreakdown(generics.GenericAPIView):
@@ -1562,27 +1527,13 @@ class AdminUserEarnedDividend(views.APIView):
         coporative = CoporativeMembership.objects.filter(is_active=True, user=user).first()
         if not coporative:
             return Response({"message": "not a coporative member"}, status=status.HTTP_400_BAD_REQUEST)
-        monthly_dividend = coporative.monthly_dividend
-        if not monthly_dividend:
-            return Response(data={"total_dividend": 0 ,"dividends": []}, status=status.HTTP_200_OK)
-        sorted_monthly_dividend = self.sort_dividends_by_date(monthly_dividend)
-        all_dividends = sorted_monthly_dividend.values()
-        all_keys = sorted_monthly_dividend.keys()
-        total_pending_dividends = 0
-        all_dividends = [sorted_monthly_dividend[k] for k in all_keys if k.endswith(year)]
-        for dvd in all_dividends:
-            total_pending_dividends += dvd["dividend"]
+        if not year.isdigit():
+            return Response({"message": "invalid year"}, status=status.HTTP_400_BAD_REQUEST)
+        dividends = coporative.dividends.filter(period__year=int(year)).order_by('period')
+        all_dividends = [dividend.as_entry() for dividend in dividends]
+        total_pending_dividends = sum(dvd["dividend"] for dvd in all_dividends)
         return Response(data={"total_dividend": total_pending_dividends ,"dividends": all_dividends}, status=status.HTTP_200_OK)
-    def sort_dividends_by_date(self, dividends):
-        # Sort the dictionary by converting the keys (e.g., "September 2024") to datetime objects
-        sorted_dividends = dict(
-            sorted(
-                dividends.items(),
-                key=lambda item: datetime.strptime(item[0], '%B %Y')
-            )
-        )
-        return sorted_dividends
-        
+
 class AdminListReferal(generics.GenericAPIView):
     # pagination_class = []
     serializer_class = AdminReferralList
@@ -1641,3 +1592,12 @@ class AdminListReferal(generics.GenericAPIView):
         return Response(data=serializer.data, status=status.HTTP_200_OK)
     def get_queryset(self):
         return User.objects.all().order_by("-created_at")
+
+
+class AdminMetrics(views.APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdminStaff]
+    swagger_schema = None
+
+    def get(self, request):
+        # Prometheus text format, scraped with an admin bearer token
+        return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
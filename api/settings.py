@@ -56,6 +56,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'log_request_id.middleware.RequestIDMiddleware',
+    'utils.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -250,6 +251,11 @@ if not PRODUCTION_ENV:
             "BACKEND": "channels.layers.InMemoryChannelLayer",
         },
     }
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
 else:
     CHANNEL_LAYERS = {
     'default': {
@@ -259,6 +265,16 @@ else:
         },
     },
 }
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": config('REDIS_CACHE_URL', default="redis://127.0.0.1:6379/1"),
+        },
+    }
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+# savings-scheduler takes installments at each plan's chosen time; the nightly
+# daily-check and savings-cron-job then only retry queued shortfalls
+SAVINGS_SCHEDULER_ENABLED = config('SAVINGS_SCHEDULER_ENABLED', default=False, cast=bool)
 LOGGING_CONFIG = None
 LOGGING = {
     "version": 1,
@@ -181,7 +181,7 @@ class PhoneVerificationSerializer(serializers.ModelSerializer):
         verificationObj.token_expiry = timezone.now()
         verificationObj.save()
         user.is_verified = True
-        user.save()
+        user.save(update_fields=["is_verified"])
         return True
 
 
@@ -295,7 +295,7 @@ class SetNewPasswordSerializer(serializers.Serializer):
 
         # Update password
         user.set_password(password)
-        user.save()
+        user.save(update_fields=["password"])
 
         return (user)
 
@@ -337,7 +337,7 @@ class ChangePasswordSerializer(serializers.Serializer):
                 "Password must contain One Special Character")
 
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=["password"])
         return user
 
 class UpdateBvnSerializer(serializers.Serializer):
@@ -13,6 +13,7 @@ from django.http import HttpResponsePermanentRedirect, HttpResponse
 from django.db import transaction
 
 from user.models import User, EmailVerification, TIERS_CHOICE, ForgetPasswordToken
+from user.accounts import hash_identity, identity_registered
 from .serializers import (
     SignupSerializer,
     ResendVerificationMailSerializer,
@@ -194,15 +195,14 @@ class SetBvnView(generics.GenericAPIView):
         serializer = self.serializer_class(data = request.data)
         serializer.is_valid(raise_exception=True)
         # call safehaven endpoint
-        numn = str(hashlib.sha256(smart_bytes(serializer.validated_data["bvn"])).digest(), 'utf-8') 
-        if User.objects.filter(bvn=numn).exists():
+        if identity_registered(serializer.validated_data["bvn"]):
             return Response({"message": "Account with this bvn already exist"}, status=status.HTTP_400_BAD_REQUEST)
-        data = {'type':"BVN", "number": numn}
+        data = {'type':"BVN", "number": serializer.validated_data["bvn"]}
         safe_status, resp = safe_initiate(data)
         if safe_status:
             user.bvn_verify_details = resp
             user.bvn_verify_details["nvb"] = serializer.validated_data["bvn"]
-            user.save()
+            user.save(update_fields=["bvn_verify_details"])
             return Response(data={"message": "success"}, status=status.HTTP_200_OK)
         return Response(data={"message": resp}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -228,7 +228,7 @@ class VerifyBVNView(generics.GenericAPIView):
             return Response(data={"message": verify_message}, status=status.HTTP_400_BAD_REQUEST)
         with transaction.atomic():
             verified_bvn = user_det["nvb"] if verify_message == "VERIFIED" else verify_message["bvn"]
-            user.bvn = str(hashlib.sha256(smart_bytes(verified_bvn)).digest(), 'utf-8')
+            user.bvn = hash_identity(verified_bvn)
             user.bvn_verify_details = "BVN has been Verified"
             user.tier = TIERS_CHOICE[2][0]
             user.is_verified = True
@@ -239,7 +239,7 @@ class VerifyBVNView(generics.GenericAPIView):
                 "_id": user_det["_id"],
                 "otp": code
                 }
-            account_number, account_name = create_safehaven_account(acc_data)
+            account_number, account_name = create_safehaven_account(user, acc_data)
             
             if not account_number:
                 return Response(data={"message": account_name}, status=status.HTTP_400_BAD_REQUEST)
@@ -251,7 +251,7 @@ class VerifyBVNView(generics.GenericAPIView):
                 'bvn_verified': True
             }
             send_socket_user_notification(user.id,data)
-            user.save()
+            user.save(update_fields=["bvn", "bvn_verify_details", "tier", "is_verified", "account_number", "account_name"])
         return Response(data={"message": "success"}, status=status.HTTP_200_OK)
 
 class SetNinView(generics.GenericAPIView):
@@ -291,5 +291,5 @@ class VerifyNINView(generics.GenericAPIView):
         with transaction.atomic():
             user.nin = serializer.validated_data["nin"]
             user.tier = TIERS_CHOICE[2][0]
-            user.save()
+            user.save(update_fields=["nin", "tier"])
         return Response(data={"message": "success"}, status=status.HTTP_200_OK)
@@ -0,0 +1,32 @@
+import signal
+import time
+from django.core.management.base import BaseCommand
+from notification.webhooks import apply_batch
+from user.accounts import warm
+
+
+class Command(BaseCommand):
+    help = 'Credit wallets for received deposit webhooks, in batches grouped by user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--poll-interval', type=float, default=0.5,
+                            help='Seconds to wait when nothing is pending')
+        parser.add_argument('--once', action='store_true', help='Exit once nothing is pending')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f"cached {warm()} deposit accounts")
+        while not self.stopping:
+            handled = apply_batch(options['batch_size'])
+            if handled:
+                self.stdout.write(f"handled {handled} deposit events")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,43 @@
+import json
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import make_aware
+from notification.models import WebhookEvent
+from notification.webhooks import record_event
+
+
+class Command(BaseCommand):
+    help = 'Re-ingest raw deposit webhooks from a file, or requeue events that matched no wallet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='JSON lines file of raw webhook payloads, e.g. a provider export')
+        parser.add_argument('--requeue-ignored', action='store_true',
+                            help='Send IGNORED events back to the worker, e.g. after an account number was assigned')
+        parser.add_argument('--since', help='Only requeue events received on or after this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        if not options['file'] and not options['requeue_ignored']:
+            raise CommandError('Pass --file and/or --requeue-ignored')
+        if options['file']:
+            new = seen = skipped = 0
+            with open(options['file']) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    event, created = record_event(json.loads(line))
+                    if event is None:
+                        skipped += 1
+                    elif created:
+                        new += 1
+                    else:
+                        seen += 1
+            self.stdout.write(f"{new} new events, {seen} already received, {skipped} not completed transfers")
+        if options['requeue_ignored']:
+            events = WebhookEvent.objects.filter(status="IGNORED")
+            if options['since']:
+                try:
+                    since = make_aware(datetime.strptime(options['since'], '%Y-%m-%d'))
+                except ValueError:
+                    raise CommandError('Invalid date format. Use YYYY-MM-DD.')
+                events = events.filter(received_at__gte=since)
+            self.stdout.write(f"{events.update(status='RECEIVED')} ignored events requeued")
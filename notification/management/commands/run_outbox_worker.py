@@ -0,0 +1,64 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from notification import outbox
+
+
+def deliver(message, max_attempts):
+    try:
+        return outbox.deliver(message, max_attempts)
+    finally:
+        connection.close()
+
+
+def deliver_emails(messages, max_attempts):
+    try:
+        return outbox.deliver_emails(messages, max_attempts)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued SMS, email and websocket messages, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help='Messages delivered in parallel')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=outbox.MAX_ATTEMPTS)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when nothing is due')
+        parser.add_argument('--keep-days', type=int, default=7, help='Days to keep delivered messages')
+        parser.add_argument('--once', action='store_true', help='Exit once nothing is due')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        keep = timedelta(days=options['keep_days'])
+        next_purge = 0
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            while not self.stopping:
+                if time.monotonic() >= next_purge:
+                    outbox.purge_sent(keep)
+                    next_purge = time.monotonic() + 3600
+                batch = outbox.claim(options['batch_size'])
+                if not batch:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                # all emails in the batch share one SMTP session; the rest go out in parallel
+                emails = [message for message in batch if message.kind == "EMAIL"]
+                others = [message for message in batch if message.kind != "EMAIL"]
+                email_results = pool.submit(deliver_emails, emails, options['max_attempts']) if emails else None
+                results = list(pool.map(deliver, others, [options['max_attempts']] * len(others)))
+                if email_results:
+                    results += email_results.result()
+                self.stdout.write(f"delivered {results.count(True)} of {len(batch)} messages")
+
+    def stop(self, signum, frame):
+        # finish the batch in hand, then exit
+        self.stopping = True
@@ -0,0 +1,62 @@
+import random
+import time
+import uuid
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+from notification.models import WebhookEvent
+from notification.webhooks import apply_batch
+from transaction.models import Transaction
+from user.models import User, Activities, LedgerEntry, VirtualAccount
+
+
+class Command(BaseCommand):
+    help = 'Post synthetic deposit webhooks (each delivered twice) and time ingest and wallet crediting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:10]
+        users = [User.objects.create(email=f"webhook-benchmark-{tag}-{i}@example.com", firstname="Bench",
+                                     lastname="Mark", account_number=f"9{random.randrange(10 ** 9):09d}")
+                 for i in range(options['users'])]
+        VirtualAccount.objects.bulk_create(
+            [VirtualAccount(user=user, account_number=user.account_number) for user in users])
+        payloads = [self.payload(f"{tag}-{i}", users[i % len(users)].account_number, 100 + i % 7)
+                    for i in range(options['events'])]
+        client = APIClient()
+        try:
+            started = time.monotonic()
+            for payload in payloads:
+                # providers retry, so every event arrives twice
+                for _ in range(2):
+                    response = client.post("/api/v1/notification/hook/", payload, format="json")
+                    if response.status_code != 200:
+                        raise CommandError(f"webhook answered {response.status_code}")
+            ingest = time.monotonic() - started
+
+            started = time.monotonic()
+            while apply_batch(options['batch_size']):
+                pass
+            apply = time.monotonic() - started
+
+            expected = sum(Decimal(payload["data"]["amount"]) for payload in payloads)
+            credited = sum(user.wallet_balance for user in User.objects.filter(id__in=[user.id for user in users]))
+            stored = WebhookEvent.objects.filter(reference__startswith=tag).count()
+            self.stdout.write(f"ingest: {2 * len(payloads)} deliveries in {ingest:.2f}s, "
+                              f"{2 * len(payloads) / ingest:.0f} deliveries/s, {stored} events stored")
+            self.stdout.write(f"apply: {stored} events in {apply:.2f}s, {stored / apply:.0f} events/s")
+            self.stdout.write(f"credited N{credited} of N{expected}: {'OK' if credited == expected else 'MISMATCH'}")
+        finally:
+            WebhookEvent.objects.filter(reference__startswith=tag).delete()
+            for model in (LedgerEntry, Activities, Transaction):
+                model.objects.filter(user__in=users).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def payload(self, reference, account_number, amount):
+        return {"type": "transfer", "data": {
+            "sessionId": reference, "status": "Completed", "amount": str(amount),
+            "creditAccountNumber": account_number, "debitAccountName": "Benchmark"}}
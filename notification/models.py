@@ -1,4 +1,6 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from user.models import User
 
 # Create your models here.
@@ -21,5 +23,77 @@ class Notification(models.Model):
     status = models.CharField(choices=NOTIFICATION_STATUS, default=NOTIFICATION_STATUS[0][0])
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-status", "-created_at", "-id"], name="notification_user_status_idx"),
+            models.Index(fields=["user"], condition=models.Q(status="UNREAD"), name="notification_unread_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.user.firstname} {self.user.lastname} - {self.status}"
+
+OUTBOX_KIND = [
+    ("SMS", "Termii SMS"),
+    ("EMAIL", "Email"),
+    ("SOCKET", "Websocket notification")
+]
+OUTBOX_STATUS = [
+    ("PENDING", "Pending"),
+    ("SENT", "Sent"),
+    ("FAILED", "Failed")
+]
+class OutboxMessage(models.Model):
+    """
+    A side effect (SMS, email, websocket push) written in the same transaction
+    as the change that caused it and delivered later by run_outbox_worker.
+    """
+    kind = models.CharField(max_length=10, choices=OUTBOX_KIND)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS, default=OUTBOX_STATUS[0][0])
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt_at"], name="outbox_pending_due_idx",
+                         condition=models.Q(status="PENDING")),
+            models.Index(fields=["sent_at"], name="outbox_sent_idx",
+                         condition=models.Q(status="SENT")),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} - {self.status}"
+
+
+WEBHOOK_EVENT_STATUS = [
+    ("RECEIVED", "Received, not yet applied"),
+    ("APPLIED", "Credited to the wallet"),
+    ("IGNORED", "No wallet matches the account number")
+]
+class WebhookEvent(models.Model):
+    """
+    A completed transfer reported by SafeHaven, stored before it is acknowledged.
+    The provider reference is unique, so retried deliveries are dropped.
+    """
+    reference = models.CharField(max_length=100, unique=True)
+    account_number = models.CharField(max_length=20)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    source = models.CharField(max_length=1000)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=WEBHOOK_EVENT_STATUS, default=WEBHOOK_EVENT_STATUS[0][0])
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="webhook_events")
+    received_at = models.DateTimeField(auto_now_add=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["id"], name="webhook_received_idx",
+                         condition=models.Q(status="RECEIVED")),
+        ]
+
     def __str__(self):
-        return f"{self.title} - {self.user.firstname} {self.user.lastname} - {self.status}"
\ No newline at end of file
+        return f"{self.reference} - {self.amount} - {self.status}"
@@ -0,0 +1,88 @@
+import random
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboxMessage
+
+# a claimed message stays hidden from other workers this long while it is delivered
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 30
+BACKOFF_MAX = 3600
+
+
+def enqueue(kind, payload):
+    """Queue a side effect. It commits or rolls back with the caller's transaction."""
+    return OutboxMessage.objects.create(kind=kind, payload=payload)
+
+
+def enqueue_many(kind, payloads):
+    return OutboxMessage.objects.bulk_create([OutboxMessage(kind=kind, payload=payload) for payload in payloads])
+
+
+def handlers():
+    from user.consumers import deliver_socket_notification
+    from utils.email import SendMail
+    from utils.sms import SendSMS
+    return {
+        "SMS": SendSMS.deliver,
+        "EMAIL": SendMail.deliver,
+        "SOCKET": deliver_socket_notification,
+    }
+
+
+def backoff(attempts):
+    """Exponential delay before the next attempt, with jitter so retries spread out."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def claim(batch_size):
+    """
+    Take up to batch_size due messages. The row locks are released as soon as
+    the lease is written, so nothing is locked while the messages are sent.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(OutboxMessage.objects.select_for_update(skip_locked=True).filter(
+            status="PENDING", next_attempt_at__lte=now
+        ).order_by("next_attempt_at").values_list("id", flat=True)[:batch_size])
+        OutboxMessage.objects.filter(id__in=ids).update(next_attempt_at=now + LEASE)
+    return list(OutboxMessage.objects.filter(id__in=ids).order_by("next_attempt_at", "id"))
+
+
+def record(message, error, max_attempts=MAX_ATTEMPTS):
+    """Store the outcome of one attempt: sent, retried later, or given up on."""
+    attempts = message.attempts + 1
+    if error is None:
+        OutboxMessage.objects.filter(pk=message.pk).update(
+            attempts=attempts, status="SENT", sent_at=timezone.now())
+        return True
+    OutboxMessage.objects.filter(pk=message.pk).update(
+        attempts=attempts,
+        last_error=repr(error),
+        status="FAILED" if attempts >= max_attempts else "PENDING",
+        next_attempt_at=timezone.now() + backoff(attempts))
+    return False
+
+
+def deliver(message, max_attempts=MAX_ATTEMPTS):
+    """Send one claimed message and record the outcome. Returns True when it went out."""
+    try:
+        handlers()[message.kind](message.payload)
+    except Exception as e:
+        return record(message, e, max_attempts)
+    return record(message, None, max_attempts)
+
+
+def deliver_emails(messages, max_attempts=MAX_ATTEMPTS):
+    """Send claimed EMAIL messages over a single SMTP session. Returns one bool per message."""
+    from utils.email import SendMail
+    results = SendMail.deliver_many([message.payload for message in messages])
+    return [record(message, result.error, max_attempts) for message, result in zip(messages, results)]
+
+
+def purge_sent(older_than):
+    """Delete delivered messages; they can hold verification codes."""
+    return OutboxMessage.objects.filter(
+        status="SENT", sent_at__lt=timezone.now() - older_than).delete()[0]
@@ -1,3 +1,104 @@
-from django.test import TestCase
+from unittest import mock
+from django.core import mail
+from django.template.loader import get_template
+from datetime import date, timedelta
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from notification import outbox, webhooks
+from notification.models import OutboxMessage, WebhookEvent
+from transaction.models import Transaction
+from user.models import User, UserSavings, VirtualAccount
+from user.savings_debit import run_savings_debit
+from utils.email import SendMail, template
 
-# Create your tests here.
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+                   EMAIL_FROM_USER="noreply@example.com")
+class EmailOutboxTest(TestCase):
+    def email(self, to, subject="Hello"):
+        return {"subject": subject, "body": "Body", "user": to}
+
+    def test_bulk_emails_share_one_connection(self):
+        SendMail.send_bulk([self.email(f"user{i}@example.com") for i in range(5)])
+        messages = outbox.claim(10)
+        with mock.patch("utils.email.get_connection", wraps=mail.get_connection) as get_connection:
+            results = outbox.deliver_emails(messages)
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         [f"user{i}@example.com" for i in range(5)])
+        self.assertEqual(OutboxMessage.objects.filter(status="SENT").count(), 5)
+
+    def test_failed_message_is_retried_without_blocking_the_rest(self):
+        # a newline in the subject is rejected when the message is built
+        SendMail.send_bulk([self.email("good@example.com"), self.email("bad@example.com", "Bad\nsubject")])
+        results = SendMail.deliver_many([message.payload for message in OutboxMessage.objects.order_by("id")])
+        self.assertEqual([result.ok for result in results], [True, False])
+
+        self.assertEqual(outbox.deliver_emails(outbox.claim(10)), [True, False])
+        failed = OutboxMessage.objects.get(payload__user="bad@example.com")
+        self.assertEqual((failed.status, failed.attempts), ("PENDING", 1))
+        self.assertGreater(failed.next_attempt_at, failed.created_at)
+        self.assertEqual(outbox.claim(10), [])
+
+    def test_loan_notification_template_is_compiled_once(self):
+        info = {"guarantor_name": "G", "user_name": "U", "amount": 1000, "duration": 3,
+                "accept_link": "a", "reject_link": "r", "email": "g@example.com"}
+        template.cache_clear()
+        with mock.patch("utils.email.get_template", wraps=get_template) as loader:
+            SendMail.send_loan_notification_emails([info, {**info, "email": "h@example.com"}])
+        self.assertEqual(loader.call_count, 1)
+        self.assertEqual(OutboxMessage.objects.filter(kind="EMAIL").count(), 2)
+
+
+class WebhookTest(TestCase):
+    def payload(self, reference, account_number="9000000001", amount="150.00"):
+        return {"type": "transfer", "data": {
+            "sessionId": reference, "status": "Completed", "amount": amount,
+            "creditAccountNumber": account_number, "debitAccountName": "Sender"}}
+
+    def test_retried_events_credit_once(self):
+        user = User.objects.create(email="hook@example.com", firstname="Hook", account_number="9000000001")
+        VirtualAccount.objects.create(user=user, account_number="9000000001")
+        for reference in ["a", "b", "a", "b"]:
+            response = self.client.post("/api/v1/notification/hook/", self.payload(reference),
+                                        content_type="application/json")
+            self.assertEqual(response.status_code, 200)
+        self.client.post("/api/v1/notification/hook/", self.payload("c", "9999999999"),
+                         content_type="application/json")
+
+        self.assertEqual(webhooks.apply_batch(), 3)
+        user.refresh_from_db()
+        self.assertEqual(user.wallet_balance, 300)
+        self.assertEqual(Transaction.objects.filter(user=user).count(), 2)
+        self.assertEqual(WebhookEvent.objects.get(reference="c").status, "IGNORED")
+        self.assertEqual(webhooks.apply_batch(), 0)
+
+    def test_kobo_deposit_history_matches_the_wallet(self):
+        user = User.objects.create(email="kobo@example.com", firstname="Kobo", account_number="9000000003")
+        VirtualAccount.objects.create(user=user, account_number="9000000003")
+        webhooks.record_event(self.payload("kobo", "9000000003", "150.75"))
+        webhooks.apply_batch()
+        user.refresh_from_db()
+        self.assertEqual(user.wallet_balance, Decimal("150.75"))
+        self.assertEqual(Transaction.objects.get(user=user).amount, Decimal("150.75"))
+        self.assertEqual(set(user.ledger_entries.values_list("amount", flat=True)), {Decimal("150.75")})
+
+    def test_deposit_settles_missed_installments_oldest_first(self):
+        user = User.objects.create(email="saver@example.com", firstname="Saver", account_number="9000000002")
+        VirtualAccount.objects.create(user=user, account_number="9000000002")
+        today = date.today()
+        saving = UserSavings.objects.create(user=user, amount=100, frequency="DAILY",
+                                            start_date=today - timedelta(days=5),
+                                            withdrawal_date=today + timedelta(days=30))
+        for days_ago in [2, 1, 0]:
+            run_savings_debit(today=today - timedelta(days=days_ago))
+        self.assertEqual(list(saving.shortfalls.values_list("status", flat=True)), ["PENDING"] * 3)
+
+        webhooks.record_event(self.payload("deposit", "9000000002", "250.00"))
+        webhooks.apply_batch()
+        user.refresh_from_db()
+        saving.refresh_from_db()
+        self.assertEqual((user.wallet_balance, saving.saved), (50, 200))
+        self.assertEqual(list(saving.shortfalls.order_by("due_date").values_list("status", flat=True)),
+                         ["SETTLED", "SETTLED", "PENDING"])
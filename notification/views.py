@@ -2,6 +2,7 @@ from django.shortcuts import render, get_object_or_404
 from rest_framework import generics, status, views, permissions, parsers
 from rest_framework.response import Response
 from user.models import User, Activities
+from notification.webhooks import record_event
 from django.db import transaction
 from user.consumers import send_socket_user_notification
 from transaction.models import Transaction
@@ -42,16 +43,8 @@ class UserNotifications(generics.GenericAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
     def get_queryset(self):
         user = self.request.user
-        UNREAD = 'UNREAD'
-        READ = 'READ'
-        queryset = Notification.objects.filter(user=user).order_by(
-            Case(
-                When(status=UNREAD, then=1),
-                When(status=READ, then=0),
-                default=0,
-            ).desc(),
-            '-created_at'
-        )
+        # UNREAD sorts after READ, so unread come first and the index supplies the order
+        queryset = Notification.objects.filter(user=user).order_by('-status', '-created_at', '-id')
         return queryset
 
 class MarkAsRead(generics.GenericAPIView):
@@ -73,44 +66,8 @@ class MarkAsRead(generics.GenericAPIView):
 class Webhook(views.APIView):
     # permission_classes = [permissions.IsAuthenticated]
     def post(self, request):
-        data = request.data
-        t_type = data.get("type")
-        t_data = data.get("data")
-        if not t_type == "transfer" or not t_data:
-            return Response(data={"message":"success"})
-        t_status = t_data.get("status")
-        creditAccountNumber = t_data.get("creditAccountNumber")
-        debitAccountName = t_data.get("debitAccountName")
-        source = f"Bank Transfer/{debitAccountName}"
-        amount = t_data.get("amount")
-        if t_status != "Completed" or not creditAccountNumber or not amount:
-            return Response(data={"message":"success"})
-        user = User.objects.filter(account_number = creditAccountNumber).first()
-        if not user:
-            return Response(data={"message":"success"})
-        with transaction.atomic():
-            user.wallet_balance += amount
-            new_activity = Activities.objects.create(title="Wallet Deposit", amount=amount, user=user, activity_type="CREDIT")
-            new_transaction = Transaction.objects.create(
-                user=user,
-                amount = amount,
-                source = source,
-                status="SUCCESS",
-                description = f"N{amount} deposited by {user.firstname}"
-            )
-            new_transaction.save()
-            new_activity.save()
-            user.save()
-            # data = {
-            #     "balance": float(user.wallet_balance),
-            #     "activity":{
-            #         "title":new_activity.title,
-            #         "amount": float(new_activity.amount),
-            #         "activity_type": new_activity.activity_type,
-            #         "created_at": new_activity.created_at.isoformat()
-            #     }
-            # }
-            # send_socket_user_notification(user.id,data)
+        # store and acknowledge; process-webhooks credits the wallet
+        record_event(request.data)
         return Response(data={"message":"success"})
 
     # serializer_class = UserActivitiesSerializer
@@ -0,0 +1,112 @@
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from transaction.models import Transaction
+from user import accounts
+from user.models import User, Activities, LedgerEntry
+from user.savings_debit import settle_shortfalls
+from user.wallet import WalletService
+from utils.cache import invalidate_dashboards
+from .models import WebhookEvent
+
+
+def parse_event(data):
+    """Return the WebhookEvent for a completed transfer, or None for anything we do not act on."""
+    if not isinstance(data, dict) or data.get("type") != "transfer":
+        return None
+    t_data = data.get("data")
+    if not isinstance(t_data, dict) or t_data.get("status") != "Completed":
+        return None
+    reference = t_data.get("sessionId") or t_data.get("_id")
+    account_number = t_data.get("creditAccountNumber")
+    try:
+        amount = Decimal(str(t_data.get("amount")))
+    except InvalidOperation:
+        return None
+    if not reference or not account_number or not amount.is_finite() or amount <= 0:
+        return None
+    return WebhookEvent(
+        reference=reference,
+        account_number=account_number,
+        amount=amount,
+        source=f"Bank Transfer/{t_data.get('debitAccountName')}",
+        payload=data)
+
+
+def record_event(payload):
+    """
+    Store a completed transfer unless its reference was seen before.
+    Returns (event, created); event is None when the payload is not a completed transfer.
+    """
+    event = parse_event(payload)
+    if event is None:
+        return None, False
+    # get_or_create falls back to a lookup if a concurrent retry inserted it first
+    return WebhookEvent.objects.get_or_create(reference=event.reference, defaults={
+        "account_number": event.account_number,
+        "amount": event.amount,
+        "source": event.source,
+        "payload": event.payload,
+    })
+
+
+def apply_batch(batch_size=500):
+    """
+    Credit one batch of received transfers. Each wallet gets a single UPDATE
+    for all of its transfers in the batch, then pays off any savings
+    installments it was short for. Returns the number of events handled.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(WebhookEvent.objects.select_for_update(skip_locked=True)
+                      .filter(status="RECEIVED").order_by("id")[:batch_size])
+        if not events:
+            return 0
+        owners = accounts.owners(event.account_number for event in events)
+        users = User.objects.only("id", "firstname").in_bulk(set(owners.values()))
+
+        by_user = defaultdict(list)
+        ignored = []
+        for event in events:
+            user = users.get(owners.get(event.account_number))
+            if user:
+                by_user[user].append(event)
+            else:
+                ignored.append(event.id)
+
+        activities = []
+        transactions = []
+        # wallets in id order, so concurrent workers always lock them in the same order
+        for user in sorted(by_user, key=lambda user: user.id):
+            user_events = by_user[user]
+            WalletService.credit(user, sum(event.amount for event in user_events))
+            for event in user_events:
+                # the history carries the kobo the wallet was credited
+                amount = event.amount
+                naira = int(amount) if amount == int(amount) else amount
+                activities.append(Activities(title="Wallet Deposit", amount=amount, user=user, activity_type="CREDIT"))
+                transactions.append(Transaction(
+                    user=user,
+                    amount=amount,
+                    source=event.source,
+                    status="SUCCESS",
+                    description=f"N{naira} deposited by {user.firstname}"))
+                event.user = user
+                event.status = "APPLIED"
+                event.applied_at = now
+
+        Activities.objects.bulk_create(activities)
+        Transaction.objects.bulk_create(transactions)
+        LedgerEntry.objects.bulk_create(
+            [row.ledger_entry() for row in activities] + [row.ledger_entry() for row in transactions])
+        WebhookEvent.objects.bulk_update(
+            [event for user_events in by_user.values() for event in user_events], ["user", "status", "applied_at"])
+        WebhookEvent.objects.filter(id__in=ignored).update(status="IGNORED")
+        settled = settle_shortfalls(sorted(user.id for user in by_user))
+    # bulk inserts send no model signals
+    if settled:
+        invalidate_dashboards()
+    elif transactions:
+        invalidate_dashboards("overview")
+    return len(events)
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from transaction import rollups
+from transaction.models import DailyMetric
+from user.models import User
+from utils.cache import invalidate_dashboards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-day dashboard rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD), defaults to yesterday')
+        parser.add_argument('--days', type=int, default=7,
+                            help='Days before the last finalised day to rebuild, to pick up late status changes')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError:
+            raise CommandError('Invalid date format. Use YYYY-MM-DD.')
+        end = end or timezone.localdate() - timedelta(days=1)
+        if not start:
+            last = DailyMetric.objects.filter(metric=rollups.COMPLETE).aggregate(last=Max('date'))['last']
+            if last:
+                start = last - timedelta(days=options['days'])
+            else:
+                # first run: cover all history, which cannot predate the first user
+                first = User.objects.aggregate(first=Min('created_at'))['first']
+                start = timezone.localdate(first) if first else end
+        rows = rollups.refresh(start, end)
+        invalidate_dashboards()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups from {start} to {end} ({rows} rows)'))
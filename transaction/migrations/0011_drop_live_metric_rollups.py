@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:02
+
+from django.db import migrations
+
+
+def drop_live_metric_rollups(apps, schema_editor):
+    # these figures are now always aggregated live; their finalised rows had gone stale
+    apps.get_model('transaction', 'DailyMetric').objects.filter(
+        metric__in=["loan_amount_repayed", "loan_pending_count", "loan_overdue_count"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0010_index_pack'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_live_metric_rollups, migrations.RunPython.noop),
+    ]
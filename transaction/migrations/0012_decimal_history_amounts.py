@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0011_drop_live_metric_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailymetric',
+            name='value',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 import uuid
 from django.contrib.auth import get_user_model
+from user.ledger import LedgerRecordMixin, ledger_model
 
 User = get_user_model()
 
@@ -21,10 +22,10 @@ TRANSACTION_NATURE = [
     ("SAVINGS", "Savings"),
     ("LOAN_REPAYMENT", "Loan Repayment"),
 ]
-class Transaction(models.Model):
+class Transaction(LedgerRecordMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
-    amount = models.PositiveBigIntegerField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
     revenue = models.PositiveBigIntegerField(default=0)
     source = models.CharField(max_length=1000)
     message = models.TextField(null=True, blank=True)
@@ -48,4 +49,38 @@ class Transaction(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.user.firstname if self.user else 'DELETED ACCOUNT'} - {self.description} - {self.status}"
\ No newline at end of file
+        return f"{self.user.firstname if self.user else 'DELETED ACCOUNT'} - {self.description} - {self.status}"
+
+    def ledger_entry(self):
+        if not self.user_id:
+            return None
+        return ledger_model()(
+            user_id=self.user_id, source="transactions", source_id=str(self.pk),
+            transaction=self, title=self.type.title(), amount=self.amount,
+            description=self.description,
+            activity_type="CREDIT" if self.type == "WALLET-CREDIT" else "DEBIT",
+            created_at=self.created_at)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="transaction_user_created_idx"),
+            models.Index(fields=["status", "type", "created_at"], name="transaction_status_type_idx"),
+            models.Index(fields=["type", "created_at"], name="transaction_type_created_idx"),
+            models.Index(fields=["-created_at"], name="transaction_created_idx"),
+        ]
+
+
+class DailyMetric(models.Model):
+    """One pre-aggregated dashboard figure for one day, see transaction.rollups."""
+    metric = models.CharField(max_length=50)
+    date = models.DateField()
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["metric", "date"], name="daily_metric_unique_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} - {self.date} - {self.value}"
@@ -0,0 +1,119 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from user.models import (User,
+                         Withdrawal,
+                         SavingsActivities,
+                         Activities,
+                         Loan,
+                         InvestmentCancel)
+from .models import Transaction, DailyMetric
+
+# Marks a day whose rows are final, so readers know where the live tail starts.
+COMPLETE = "rollup_complete"
+DISBURSED_LOAN_STATUSES = ["APPROVED", "REPAYED", "OVER-DUE"]
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def metric_sources():
+    """metric -> (queryset, date field, aggregate) for every rolled-up dashboard figure."""
+    return {
+        "wallet_credit": (Transaction.objects.filter(status="SUCCESS", type="WALLET-CREDIT"), "created_at", Sum("amount")),
+        "withdrawal": (Withdrawal.objects.filter(status="SUCCESS"), "created_at", Sum("amount")),
+        "savings_deposit": (SavingsActivities.objects.all(), "created_at", Sum("amount")),
+        "new_users": (User.objects.all(), "created_at", Count("id")),
+        "loan_repayment": (Activities.objects.filter(title="Loan Repayment"), "created_at", Sum("amount")),
+        "loan_disbursed": (Loan.objects.filter(status__in=DISBURSED_LOAN_STATUSES), "date_approved", Sum("amount")),
+        "loan_disbursed_count": (Loan.objects.filter(status__in=DISBURSED_LOAN_STATUSES), "date_approved", Count("id")),
+        "loan_amount_repayed": (Loan.objects.all(), "date_approved", Sum("amount_repayed")),
+        "loan_pending_count": (Loan.objects.filter(status="PENDING"), "date_requested", Count("id")),
+        "loan_rejected_count": (Loan.objects.filter(status="REJECTED"), "date_approved", Count("id")),
+        "loan_overdue_count": (Loan.objects.filter(status="OVER-DUE"), "date_approved", Count("id")),
+        "investment_cancelled_count": (InvestmentCancel.objects.all(), "created_at", Count("id")),
+        "investment_cancelled_penalty": (InvestmentCancel.objects.all(), "created_at", Sum("penalty")),
+    }
+
+
+# Bucketed by a date that never moves while the rows keep changing for
+# months: withdrawals are approved long after they are requested, loans are
+# repaid, approved late or go overdue (daily-check moves them to "OVERDUE",
+# out of the disbursed statuses). A finalised day would go stale, so these
+# are always read live.
+LIVE = {"withdrawal", "loan_disbursed", "loan_disbursed_count", "loan_amount_repayed",
+        "loan_pending_count", "loan_overdue_count"}
+ROLLED_UP = [metric for metric in metric_sources() if metric not in LIVE]
+COUNTS = {metric for metric, (_, _, aggregate) in metric_sources().items() if isinstance(aggregate, Count)}
+
+
+def compute(start, end, metrics=None):
+    """Aggregate the raw tables per day for start..end, as {(metric, day): value}."""
+    values = {}
+    sources = metric_sources()
+    for metric in metrics or sources:
+        qs, field, aggregate = sources[metric]
+        if qs.model._meta.get_field(field).get_internal_type() == "DateTimeField":
+            day = TruncDate(field)
+            # plain bounds rather than __date so an index on the column can be used
+            qs = qs.filter(**{f"{field}__gte": day_start(start), f"{field}__lt": day_start(end + timedelta(days=1))})
+        else:
+            day = F(field)
+            qs = qs.filter(**{f"{field}__range": (start, end)})
+        rows = qs.annotate(day=day).values("day").annotate(value=aggregate).order_by()
+        for row in rows:
+            values[(metric, row["day"])] = row["value"] or 0
+    return values
+
+
+def refresh(start, end):
+    """Rebuild the rollup rows for start..end, never past yesterday. Returns rows written."""
+    end = min(end, timezone.localdate() - timedelta(days=1))
+    if start > end:
+        return 0
+    rows = [DailyMetric(metric=metric, date=day, value=value)
+            for (metric, day), value in compute(start, end, ROLLED_UP).items()]
+    day = start
+    while day <= end:
+        rows.append(DailyMetric(metric=COMPLETE, date=day, value=1))
+        day += timedelta(days=1)
+    with transaction.atomic():
+        DailyMetric.objects.filter(date__range=(start, end)).delete()
+        DailyMetric.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def totals(start=None, end=None, metrics=None):
+    """
+    Sum the given metrics, every one by default, over start..end (inclusive
+    dates, open-ended when None). Days the refresher has finalised come from
+    rollup rows; anything after the last finalised day, and every LIVE
+    metric, is aggregated from the raw tables.
+    """
+    start = start or date.min
+    end = end or timezone.localdate()
+    metrics = list(metrics or metric_sources())
+    rolled_up = [metric for metric in metrics if metric not in LIVE]
+    live = [metric for metric in metrics if metric in LIVE]
+    result = defaultdict(int)
+    complete_through = DailyMetric.objects.filter(
+        metric=COMPLETE, date__lte=end).aggregate(last=Max("date"))["last"]
+    tail_start = start
+    if rolled_up and complete_through and complete_through >= start:
+        rows = DailyMetric.objects.filter(date__range=(start, complete_through), metric__in=rolled_up).values(
+            "metric").annotate(total=Sum("value")).order_by()
+        for row in rows:
+            # values are stored as decimals so money keeps its kobo; counts go back out as ints
+            result[row["metric"]] = int(row["total"]) if row["metric"] in COUNTS else row["total"]
+        tail_start = complete_through + timedelta(days=1)
+    if rolled_up and tail_start <= end:
+        for (metric, _), value in compute(tail_start, end, rolled_up).items():
+            result[metric] += value
+    if live:
+        for (metric, _), value in compute(start, end, live).items():
+            result[metric] += value
+    return result
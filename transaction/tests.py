@@ -1,3 +1,24 @@
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
+from transaction import rollups
+from transaction.models import Transaction
+from user.models import User, Withdrawal
 
-# Create your tests here.
+
+class RollupTest(TestCase):
+    def test_status_change_after_the_rewind_window_is_counted(self):
+        user = User.objects.create(email="rollup@example.com", firstname="Roll", phone="08020000000")
+        transaction = Transaction.objects.create(user=user, amount=777, source="test",
+                                                 type="WITHDRAWAL", description="withdrawal")
+        withdrawal = Withdrawal.objects.create(user=user, transaction=transaction, amount=777, bank_name="Bank",
+                                               bank_code="000", account_number="0123456789")
+        created = timezone.now() - timedelta(days=20)
+        Withdrawal.objects.filter(pk=withdrawal.pk).update(created_at=created)
+        today = timezone.localdate()
+        rollups.refresh(today - timedelta(days=30), today)
+
+        # approved long after the refresher rewinds past its day
+        Withdrawal.objects.filter(pk=withdrawal.pk).update(status="SUCCESS")
+        self.assertEqual(rollups.totals(metrics=["withdrawal"])["withdrawal"], 777)
+        self.assertEqual(rollups.totals(timezone.localdate(created), today, ["withdrawal"])["withdrawal"], 777)
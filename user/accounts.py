@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from decouple import config
+from django.db import transaction
+from .models import VirtualAccount
+
+CACHE_SIZE = config("ACCOUNT_CACHE_SIZE", default=100000, cast=int)
+
+
+def hash_identity(number):
+    return hashlib.sha256(str(number).encode()).hexdigest()
+
+
+class OwnerCache:
+    """
+    Account number -> user id, evicting the least recently used entry.
+    Only hits are stored, so an account is found on the first deposit
+    after it is registered.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, numbers):
+        found = {}
+        with self.lock:
+            for number in numbers:
+                if number in self.data:
+                    self.data.move_to_end(number)
+                    found[number] = self.data[number]
+        return found
+
+    def put_many(self, mapping):
+        with self.lock:
+            for number, user_id in mapping.items():
+                self.data[number] = user_id
+                self.data.move_to_end(number)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def discard(self, number):
+        with self.lock:
+            self.data.pop(number, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+owner_cache = OwnerCache(CACHE_SIZE)
+
+
+def register(user, account_number, account_name, identity_number=None):
+    account = VirtualAccount.objects.create(
+        user=user,
+        account_number=account_number,
+        account_name=account_name or "",
+        identity_hash=hash_identity(identity_number) if identity_number else None)
+    transaction.on_commit(lambda: owner_cache.put_many({account_number: user.pk}))
+    return account
+
+
+def owners(account_numbers):
+    """Map each known account number to its user id, with one indexed query for cache misses."""
+    numbers = set(account_numbers)
+    found = owner_cache.get_many(numbers)
+    missing = numbers - found.keys()
+    if missing:
+        fetched = dict(VirtualAccount.objects.filter(
+            account_number__in=missing).values_list("account_number", "user_id"))
+        owner_cache.put_many(fetched)
+        found.update(fetched)
+    return found
+
+
+def owner(account_number):
+    return owners([account_number]).get(account_number)
+
+
+def identity_registered(identity_number):
+    return VirtualAccount.objects.filter(identity_hash=hash_identity(identity_number)).exists()
+
+
+def warm(limit=CACHE_SIZE):
+    """Load the most recently issued accounts, newest last so they are evicted last."""
+    rows = list(VirtualAccount.objects.order_by("-id").values_list("account_number", "user_id")[:limit])
+    owner_cache.put_many(dict(reversed(rows)))
+    return len(rows)
+
+
+def evict(sender, instance, **kwargs):
+    owner_cache.discard(instance.account_number)
@@ -11,7 +11,10 @@ from .models import (User, EmailVerification,
                      SavingsActivities,
                      CoporativeActivities,
                      Withdrawal,
-                     DataAndAirtimeActivity
+                     DataAndAirtimeActivity,
+                     VirtualAccount,
+                     SavingsShortfall,
+                     SavingsInterestAccrual
                      )
 # Register your models here.
 # admin.site.register(User)
@@ -36,4 +39,7 @@ admin.site.register(Loan)
 admin.site.register(SavingsActivities)
 admin.site.register(CoporativeActivities)
 admin.site.register(Withdrawal)
-admin.site.register(DataAndAirtimeActivity)
\ No newline at end of file
+admin.site.register(DataAndAirtimeActivity)
+admin.site.register(VirtualAccount)
+admin.site.register(SavingsShortfall)
+admin.site.register(SavingsInterestAccrual)
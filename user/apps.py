@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        from django.db.models.signals import post_delete
+        from utils.cache import connect_invalidation_signals
+        from .accounts import evict
+        from .models import VirtualAccount
+        connect_invalidation_signals()
+        post_delete.connect(evict, sender=VirtualAccount, dispatch_uid="virtual_account_evict")
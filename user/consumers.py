@@ -33,11 +33,17 @@ class UserConsumer(AsyncWebsocketConsumer):
         }))
 
 def send_socket_user_notification(user_id, message):
+    # pushed by run_outbox_worker once the caller's transaction commits
+    from notification.outbox import enqueue
+    enqueue("SOCKET", {"user_id": user_id, "message": message})
+
+
+def deliver_socket_notification(payload):
     channel_layer = get_channel_layer()
     async_to_sync(channel_layer.group_send)(
-        f'user_{user_id}',
+        f'user_{payload["user_id"]}',
         {
             'type': 'send_notification',
-            'message': message,
+            'message': payload["message"],
         }
-    )
\ No newline at end of file
+    )
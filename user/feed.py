@@ -0,0 +1,44 @@
+import base64
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from .models import LedgerEntry
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token):
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(token.encode()))
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if created_at is None:
+        raise InvalidCursor("Invalid cursor")
+    return created_at, pk
+
+
+def get_activity_page(user, limit, cursor=None):
+    """
+    Return (entries, next_cursor) for the user's ledger, newest first, read
+    as one range scan of the (user, created_at, id) index.
+    """
+    qs = LedgerEntry.objects.filter(user=user).select_related("transaction")
+    if cursor is not None:
+        created_at, pk = decode_cursor(cursor)
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    page = list(qs.order_by("-created_at", "-pk")[:limit + 1])
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].pk)
+    return page, next_cursor
@@ -0,0 +1,110 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from decouple import config
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from utils.sharding import in_shard
+from .models import UserSavings, SavingsInstallment, SavingsInterestAccrual
+
+# simple interest on the end-of-day balance, 15% a year
+DAILY_RATE = Decimal(config('SAVINGS_DAILY_RATE', default='0.00041096'))
+
+# One statement per day. A plan earns on what it held at the end of the day:
+# its current saved total less the payments received after that day. Rerunning
+# a day rewrites its rows and moves each plan's interest by the difference,
+# so a back-dated recompute corrects the running totals without double
+# counting. Rows of plans since paid out or restarted are left as history.
+ACCRUE_SQL = """
+WITH later AS (
+    SELECT savings_id, SUM(amount) AS amount
+    FROM {installments}
+    WHERE paid_at >= %(day_end)s AND paid_status
+    GROUP BY savings_id
+), earning AS (
+    SELECT s.id, s.saved - COALESCE(later.amount, 0) AS balance
+    FROM {savings} s
+    LEFT JOIN later ON later.savings_id = s.id
+    WHERE s.start_date <= %(day)s AND s.withdrawal_date > %(day)s {shard}
+      AND s.saved - COALESCE(later.amount, 0) > 0
+), previous AS (
+    SELECT a.id, a.savings_id, a.amount
+    FROM {accruals} a
+    JOIN {savings} s ON s.id = a.savings_id
+    WHERE a.day = %(day)s AND s.start_date <= %(day)s {shard}
+), removed AS (
+    DELETE FROM {accruals} a
+    USING previous
+    WHERE a.id = previous.id AND previous.savings_id NOT IN (SELECT id FROM earning)
+), written AS (
+    INSERT INTO {accruals} (savings_id, day, balance, rate, amount, created_at)
+    SELECT id, %(day)s, balance, %(rate)s, ROUND(balance * %(rate)s, 4), %(now)s
+    FROM earning
+    ON CONFLICT (savings_id, day) DO UPDATE
+    SET balance = EXCLUDED.balance, rate = EXCLUDED.rate, amount = EXCLUDED.amount
+    RETURNING savings_id, amount
+), changes AS (
+    SELECT COALESCE(written.savings_id, previous.savings_id) AS savings_id,
+           COALESCE(written.amount, 0) - COALESCE(previous.amount, 0) AS delta
+    FROM written
+    FULL JOIN previous ON previous.savings_id = written.savings_id
+)
+UPDATE {savings} s
+SET interest = s.interest + changes.delta, all_time_interest = s.all_time_interest + changes.delta
+FROM changes
+WHERE s.id = changes.savings_id AND changes.delta <> 0
+"""
+
+
+def accrue(day=None, shard=None, rate=None):
+    """
+    Write the interest every plan earned on this date, yesterday by default,
+    and add it to the plans' totals. Returns the number of plans whose
+    interest changed.
+    """
+    day = day or timezone.localdate() - timedelta(days=1)
+    shard_filter = "AND s.user_id %% %(shard_count)s = %(shard_index)s" if shard else ""
+    sql = ACCRUE_SQL.format(
+        installments=SavingsInstallment._meta.db_table, savings=UserSavings._meta.db_table,
+        accruals=SavingsInterestAccrual._meta.db_table, shard=shard_filter)
+    params = {
+        "day": day,
+        "day_end": timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min)),
+        "rate": DAILY_RATE if rate is None else rate,
+        "now": timezone.now(),
+        "shard_index": shard[0] if shard else 0,
+        "shard_count": shard[1] if shard else 1,
+    }
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def accrue_range(start, end, shard=None):
+    """Accrue start..end inclusive, one transaction per day, never past yesterday. Returns plans changed."""
+    end = min(end, timezone.localdate() - timedelta(days=1))
+    changed = 0
+    day = start
+    while day <= end:
+        changed += accrue(day, shard)
+        day += timedelta(days=1)
+    return changed
+
+
+def accrue_missed(shard=None):
+    """
+    Accrue every day since the last one accrued up to yesterday, so a night
+    the job did not run is caught up rather than lost. With no accruals yet
+    it starts from the earliest running plan, which rebuilds interest after
+    the switch from up-front interest. Returns plans changed.
+    """
+    last = in_shard(SavingsInterestAccrual.objects, shard, "savings__user_id").aggregate(
+        last=Max("day"))["last"]
+    if last:
+        start = last + timedelta(days=1)
+    else:
+        start = in_shard(UserSavings.objects, shard).filter(withdrawal_date__isnull=False).aggregate(
+            first=Min("start_date"))["first"]
+    if not start:
+        return 0
+    return accrue_range(start, timezone.localdate() - timedelta(days=1), shard)
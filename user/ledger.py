@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.db import transaction
+
+
+LEDGER_SOURCE = [
+    ("activities", "Wallet activity"),
+    ("transactions", "Transaction"),
+    ("savings_activities", "Savings activity"),
+    ("data_activities", "Data and airtime purchase"),
+    ("coporative_activities", "Cooporative activity"),
+]
+
+
+def ledger_model():
+    return apps.get_model("user", "LedgerEntry")
+
+
+class LedgerRecordMixin:
+    """
+    Mixed into every model that moves money. Creating a row also appends its
+    LedgerEntry inside the same database transaction.
+    """
+
+    def ledger_entry(self):
+        raise NotImplementedError
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if creating:
+                entry = self.ledger_entry()
+                if entry is not None:
+                    entry.save()
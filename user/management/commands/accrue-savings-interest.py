@@ -0,0 +1,46 @@
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from user import interest
+from utils.cache import invalidate_dashboards
+from utils.metrics import record_job
+from utils.sharding import parse_shard
+
+
+class Command(BaseCommand):
+    help = 'Accrue savings interest for every day not yet accrued, or recompute a range of past days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to recompute (YYYY-MM-DD); without --start and --end, '
+                                            'every day since the last accrual')
+        parser.add_argument('--end', help='Last day to recompute (YYYY-MM-DD), defaults to yesterday')
+        parser.add_argument('--shard', help='Only accrue for users in shard N/M, e.g. 0/4')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError:
+            raise CommandError('Invalid date format. Use YYYY-MM-DD.')
+        try:
+            shard = parse_shard(options['shard']) if options['shard'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+        started = time.monotonic()
+        if not start and not end:
+            changed = interest.accrue_missed(shard)
+            label = 'every day not yet accrued'
+        else:
+            yesterday = timezone.localdate() - timedelta(days=1)
+            end = end or yesterday
+            start = start or end
+            if end > yesterday:
+                raise CommandError('Interest can only be accrued for days that have ended.')
+            if start > end:
+                raise CommandError('--start must not be after --end.')
+            changed = interest.accrue_range(start, end, shard)
+            label = f'{start} to {end}'
+        record_job('accrue-savings-interest', 'accrue', time.monotonic() - started, changed)
+        invalidate_dashboards()
+        self.stdout.write(self.style.SUCCESS(f'Accrued interest for {label} ({changed} plan updates)'))
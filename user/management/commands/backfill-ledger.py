@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from user.models import (Activities,
+                         SavingsActivities,
+                         CoporativeActivities,
+                         DataAndAirtimeActivity,
+                         LedgerEntry)
+from transaction.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Copy existing activity and transaction rows into the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        sources = [
+            Activities.objects.all(),
+            Transaction.objects.filter(user__isnull=False),
+            SavingsActivities.objects.select_related('savings'),
+            DataAndAirtimeActivity.objects.all(),
+            CoporativeActivities.objects.select_related('user_coop'),
+        ]
+        for qs in sources:
+            copied = self.copy(qs, chunk_size)
+            self.stdout.write(f'{qs.model.__name__}: {copied} rows processed, existing entries skipped')
+        self.stdout.write(self.style.SUCCESS('Ledger backfill complete'))
+
+    def copy(self, qs, chunk_size):
+        copied = 0
+        batch = []
+        for row in qs.order_by('pk').iterator(chunk_size=chunk_size):
+            batch.append(row.ledger_entry())
+            if len(batch) >= chunk_size:
+                copied += len(LedgerEntry.objects.bulk_create(batch, ignore_conflicts=True))
+                batch = []
+        if batch:
+            copied += len(LedgerEntry.objects.bulk_create(batch, ignore_conflicts=True))
+        return copied
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+import uvicorn
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from user.models import User
+from utils.n3data import AsyncDataAPI
+
+
+def fake_provider(latency):
+    """ASGI app that answers every purchase with success after a fixed delay."""
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await asyncio.sleep(latency)
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": json.dumps({"status": "success"}).encode()})
+    return app
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent airtime purchases through the async view at a fake provider with fixed latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=2.0, help='Provider latency in seconds')
+
+    def handle(self, *args, **options):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        server = uvicorn.Server(uvicorn.Config(fake_provider(options['latency']), lifespan="off", log_level="warning"))
+        thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+        AsyncDataAPI.base_url = "http://%s:%s" % sock.getsockname()
+
+        tag = uuid.uuid4().hex[:12]
+        user = User.objects.create(email=f"buy-load-test-{tag}@example.com", firstname="Load",
+                                   lastname="Test", pin=1234, wallet_balance=options['requests'] * 100)
+        token = str(RefreshToken.for_user(user).access_token)
+        try:
+            seconds, statuses = asyncio.run(self.fire(token, options['requests']))
+        finally:
+            User.objects.filter(pk=user.pk).delete()
+            server.should_exit = True
+            thread.join()
+
+        ok = statuses.count(200)
+        self.stdout.write(f"{options['requests']} purchases with {options['latency']}s provider latency "
+                          f"in {seconds:.2f}s: {options['requests'] / seconds:.1f} requests/s, {ok} succeeded")
+        if options['latency']:
+            self.stdout.write(f"a worker thread blocked on the provider manages {1 / options['latency']:.1f} requests/s")
+
+    async def fire(self, token, count):
+        client = AsyncClient()
+        headers = {"Authorization": f"Bearer {token}"}
+        body = {"pin": 1234, "amount": 100, "phone": "08000000000", "network": "MTN"}
+        started = time.monotonic()
+        responses = await asyncio.gather(*[
+            client.post("/api/v1/user/buy_airtime/", body, content_type="application/json", headers=headers)
+            for _ in range(count)])
+        return time.monotonic() - started, [response.status_code for response in responses]
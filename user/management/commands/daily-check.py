@@ -1,127 +1,132 @@
+from django.conf import settings
 from django.core.management import call_command
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 # from django.contrib.auth.models import User
-from user.models import Loan, InvestmentPlan, UserInvestments, UserSavings, Activities, CoporativeMembership, SavingsActivities
+from user.models import Loan, InvestmentPlan, UserInvestments, UserSavings, Activities, CoporativeMembership, CooperativeDividend, SavingsActivities
+from user.savings_debit import run_savings_debit, settle_pending
+from user.interest import accrue_missed
+from user.wallet import WalletService, InsufficientFunds
 from django.utils import timezone
-from django.db import transaction
+from django.db import transaction, connection, connections
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from concurrent.futures import ProcessPoolExecutor
+from utils.sharding import parse_shard, in_shard
+from utils.cache import invalidate_dashboards
+from utils.metrics import record_job
+import multiprocessing
+import time
 import calendar
+from decimal import Decimal, ROUND_DOWN
 from datetime import datetime, timedelta
+# Sub-jobs in the same group run in order; groups are independent of each other.
+# Every job that moves wallet balances lives in the first group.
+JOB_GROUPS = [
+    ["check_loan_repayment", "check_overdue_loans", "accrue_savings_interest", "check_matured_user_savings", "check_savings"],
+    ["check_expired_investment_plans", "check_expired_user_investments"],
+    ["update_monthly_dividend"],
+]
+
+
+def run_group(jobs, shard, options):
+    command = Command()
+    try:
+        return shard, command.run_jobs(jobs, shard, options)
+    finally:
+        connections.close_all()
+
+
 class Command(BaseCommand):
     help = 'Check for overdue loans and expired investment plans and update their status'
 
-    def handle(self, *args, **kwargs):
-        self.check_loan_repayment()
-        self.check_overdue_loans()
-        self.check_expired_investment_plans()
-        self.check_expired_user_investments()
-        self.check_matured_user_savings()
-        self.update_monthly_dividend()
-        self.check_savings()
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--shard', help='Only process users in shard N of M, e.g. 0/4')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Split users into this many shards and run them in a process pool')
+
+    def handle(self, *args, **options):
+        shard = None
+        if options['shard']:
+            try:
+                shard = parse_shard(options['shard'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        if options['processes'] <= 1 or shard:
+            jobs = [job for group in JOB_GROUPS for job in group]
+            self.report(shard, self.run_jobs(jobs, shard, options))
+        else:
+            count = options['processes']
+            tasks = [(group, (index, count)) for index in range(count) for group in JOB_GROUPS]
+            job_options = {'batch_size': options['batch_size'], 'workers': options['workers']}
+            # children must not share the parent's database connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=count, mp_context=context) as pool:
+                futures = [pool.submit(run_group, group, task_shard, job_options) for group, task_shard in tasks]
+                for future in futures:
+                    self.report(*future.result())
+        # the sub-jobs write with bulk UPDATEs, which send no model signals
+        invalidate_dashboards()
         self.stdout.write(self.style.SUCCESS('Successfully updated overdue loans, expired user plan and expired investment plans'))
 
-    def check_savings(self):
+    def run_jobs(self, jobs, shard, options):
+        results = []
+        for job in jobs:
+            started = time.monotonic()
+            rows = getattr(self, job)(shard, options)
+            seconds = time.monotonic() - started
+            record_job("daily-check", job, seconds, rows)
+            results.append((job, rows, seconds))
+        return results
+
+    def report(self, shard, results):
+        label = f"shard {shard[0]}/{shard[1]}" if shard else "all users"
+        for job, rows, seconds in results:
+            self.stdout.write(f"[{label}] {job}: {rows} rows in {seconds:.2f}s")
+
+    def check_savings(self, shard=None, options=None):
+        options = options or {}
+        if settings.SAVINGS_SCHEDULER_ENABLED:
+            return settle_pending(batch_size=options.get('batch_size', 500), shard=shard)
+        return run_savings_debit(batch_size=options.get('batch_size', 500), workers=options.get('workers', 1),
+                                 wages_point=5, shard=shard)
+
+    def check_overdue_loans(self, shard=None, options=None):
         today = timezone.now().date()
-        savings = UserSavings.objects.filter(
-            start_date__lte=today,
-            withdrawal_date__gte=today,
-            goal_met=False
-        ).exclude(withdrawal_date__isnull=True)
-
-        for saving in savings:
-            with transaction.atomic():  # Start an atomic transaction
-                user = saving.user
-                payment_made = False
-                remaining_amount = saving.amount  # Start with the full amount to be paid
-
-                if saving.frequency == 'DAILY':
-                    # Check if a payment has already been made today
-                    for entry_str, details in saving.payment_details.items():
-                        entry_datetime = datetime.strptime(entry_str, '%d/%m/%Y %H:%M:%S')
-                        if entry_datetime.date() == today:
-                            if details['paid_status']:
-                                remaining_amount -= details['amount']  # Deduct the amount already paid
-                            if remaining_amount <= 0:
-                                payment_made = True
-                                break
-
-                elif saving.frequency == 'WEEKLY':
-                    # Check if a payment has already been made in the last 6 days
-                    start_of_week = today - timedelta(days=6)
-                    for entry_str, details in saving.payment_details.items():
-                        entry_datetime = datetime.strptime(entry_str, '%d/%m/%Y %H:%M:%S')
-                        if start_of_week <= entry_datetime.date() <= today:
-                            if details['paid_status']:
-                                remaining_amount -= details['amount']  # Deduct the amount already paid
-                            if remaining_amount <= 0:
-                                payment_made = True
-                                break
-
-                elif saving.frequency == 'MONTHLY':
-                    # Check if a payment has already been made in the last 30 days
-                    start_of_month = today - timedelta(days=30)
-                    for entry_str, details in saving.payment_details.items():
-                        entry_datetime = datetime.strptime(entry_str, '%d/%m/%Y %H:%M:%S')
-                        if start_of_month <= entry_datetime.date() <= today:
-                            if details['paid_status']:
-                                remaining_amount -= details['amount']  # Deduct the amount already paid
-                            if remaining_amount <= 0:
-                                payment_made = True
-                                break
-
-                if not payment_made and remaining_amount > 0:
-                    if user.wallet_balance >= remaining_amount:
-                        payment_datetime = timezone.now()
-                        saving.mark_payment_as_made(payment_datetime, remaining_amount)
-                        user.wallet_balance -= remaining_amount
-                        user.wages_point += 5
-                        user.save()
-                        ttday = datetime.now().date()
-                        days_to_withdrawal = (saving.withdrawal_date - ttday).days
-                        interest = days_to_withdrawal * 0.00041096 * remaining_amount
-
-                        # Log the savings activity
-                        new_savings_activity = SavingsActivities.objects.create(
-                            savings=saving,
-                            amount=remaining_amount,
-                            balance=saving.saved,
-                            user=user,
-                            interest=interest
-                        )
-                        new_savings_activity.save()
-
-                        # Save the updated state of saving
-                        saving.save()  # Save to prevent the same payment from being processed again
-
-    def check_overdue_loans(self):
-        loans = Loan.objects.filter(status='APPROVED')
-        for loan in loans:
-            if loan.is_overdue():
-                loan.status = 'OVERDUE'
-                loan.save()
+        return in_shard(Loan.objects, shard).filter(
+            status='APPROVED', due_date__lte=today).update(status='OVERDUE')
 
-    def check_expired_investment_plans(self):
+    def check_expired_investment_plans(self, shard=None, options=None):
+        # plans are not owned by a user, so only the first shard handles them
+        if shard and shard[0] != 0:
+            return 0
         today = timezone.now().date()
-        investment_plans = InvestmentPlan.objects.filter(is_active=True, end_date__lte=today)
-        for plan in investment_plans:
-            plan.is_active = False
-            plan.save()
-    def check_expired_user_investments(self):
+        return InvestmentPlan.objects.filter(is_active=True, end_date__lte=today).update(
+            is_active=False, updated_at=timezone.now())
+    def check_expired_user_investments(self, shard=None, options=None):
         today = timezone.now().date()
-        investment_plans = UserInvestments.objects.filter(status="ACTIVE", due_date__lte=today)
-        for plan in investment_plans:
-            plan.status = "MATURED"
-            int_rate = plan.investment.interest_rate * 0.01 * plan.amount
-            plan.interest = int_rate
-            plan.save()
-    def check_matured_user_savings(self):
+        # UPDATE cannot join, so the plan's rate is read through a correlated subquery
+        interest = InvestmentPlan.objects.filter(pk=OuterRef('investment_id')).values(
+            interest=OuterRef('amount') * F('interest_rate') / 100)
+        return in_shard(UserInvestments.objects, shard).filter(status="ACTIVE", due_date__lte=today).update(
+            status="MATURED", interest=Coalesce(Subquery(interest), 0))
+    def accrue_savings_interest(self, shard=None, options=None):
+        # every day up to yesterday lands before matured plans are paid out
+        return accrue_missed(shard=shard)
+
+    def check_matured_user_savings(self, shard=None, options=None):
         today = timezone.now().date()
-        all_user_savings =  UserSavings.objects.filter(withdrawal_date__lte=today, is_active=True)
+        all_user_savings =  in_shard(UserSavings.objects, shard).filter(withdrawal_date__lte=today, is_active=True)
+        updated = 0
         for user_savings in all_user_savings:
-            refund = user_savings.saved + user_savings.interest
+            # interest accrues to four places; wallets hold kobo
+            refund = user_savings.saved + user_savings.interest.quantize(Decimal("0.01"), ROUND_DOWN)
             with transaction.atomic():
                 user = user_savings.user
-                user.wallet_balance += refund
-                user.save()
+                WalletService.credit(user, refund)
                 user_savings.amount = 0
                 user_savings.saved = 0
                 user_savings.is_active = False
@@ -129,48 +134,55 @@ class Command(BaseCommand):
                 user_savings.start_date = None
                 user_savings.target_amount = None
                 user_savings.goal_met = False
-                user_savings.payment_details = None
                 user_savings.interest = 0
                 user_savings.time = None
                 user_savings.day_week = None
                 user_savings.day_month = None
+                user_savings.next_due_at = None
                 user_savings.save()
+                user_savings.installments.all().delete()
+                user_savings.shortfalls.filter(status="PENDING").update(status="CANCELLED")
                 Activities.objects.create(title="Savings Payout", amount=refund, user=user, activity_type="CREDIT")
+            updated += 1
+        return updated
 
-    def update_monthly_dividend(self):
+    def update_monthly_dividend(self, shard=None, options=None):
         today = timezone.now()
         last_day = calendar.monthrange(today.year, today.month)[1]
-        
+
         # Check if today is the last day of the month
-        if today.day == last_day:
-            active_memberships = CoporativeMembership.objects.filter(is_active=True)
-            
-            for membership in active_memberships:
-                closing_balance = membership.balance
-                dividend = round(0.02 * closing_balance)  # 2% of the balance
-                
-                # Prepare the entry for monthly_dividend
-                month_year = today.strftime('%B %Y')
-                entry = {
-                    "date": today.strftime('%Y-%m-%d'),
-                    "closing_balance": closing_balance,
-                    "dividend": dividend,
-                    "status": False
-                }
-                
-                # Update the monthly_dividend field
-                monthly_dividend = membership.monthly_dividend or {}  # if it's empty
-                monthly_dividend[month_year] = entry
-                
-                membership.monthly_dividend = monthly_dividend
-                membership.save()
-
-    def check_loan_repayment(self):
+        if today.day != last_day:
+            return 0
+        # 2% of each active member's closing balance, accrued in one statement.
+        # Re-running on the same day refreshes the month's row unless it is already paid.
+        dividend_table = CooperativeDividend._meta.db_table
+        membership_table = CoporativeMembership._meta.db_table
+        sql = f"""
+            INSERT INTO {dividend_table} (membership_id, period, date, closing_balance, dividend, status)
+            SELECT id, %s, %s, balance, ROUND(balance * 0.02), false
+            FROM {membership_table}
+            WHERE is_active
+        """
+        params = [today.date().replace(day=1), today.date()]
+        if shard:
+            sql += " AND user_id %% %s = %s"
+            params += [shard[1], shard[0]]
+        sql += f"""
+            ON CONFLICT (membership_id, period) DO UPDATE
+            SET date = EXCLUDED.date, closing_balance = EXCLUDED.closing_balance, dividend = EXCLUDED.dividend
+            WHERE {dividend_table}.status = false
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def check_loan_repayment(self, shard=None, options=None):
         today = timezone.now().date()
         today_str = today.strftime("%d/%m/%Y")
+        updated = 0
 
         # Find all active loans where repayment_details are not null
-        loans = Loan.objects.filter(is_active=True, repayment_details__isnull=False)
+        loans = in_shard(Loan.objects, shard).filter(is_active=True, repayment_details__isnull=False)
 
         for loan in loans:
             repayment_details = loan.repayment_details
@@ -187,11 +199,12 @@ class Command(BaseCommand):
                     # Atomic block to ensure the entire transaction is either fully completed or rolled back
                     try:
                         with transaction.atomic():
-                            # Check if user has enough balance in their wallet
-                            if user.wallet_balance >= amount_due:
-                                # Deduct the amount from the user's wallet
-                                user.wallet_balance -= amount_due
-                                user.wages_point += 5
+                            # Deduct the amount from the user's wallet if it holds enough
+                            try:
+                                WalletService.debit(user, amount_due, points=5)
+                            except InsufficientFunds:
+                                pass
+                            else:
                                 # Update the repayment details to mark this payment as paid
                                 repayment_details[today_str]['paid_status'] = True
                                 loan.repayment_details = repayment_details
@@ -205,8 +218,9 @@ class Command(BaseCommand):
                                 loan.amount_repayed += amount_due
                                 Activities.objects.create(title="Loan Repayment", amount=amount_due, user=user)
                                 loan.save()
-                                user.save()
+                                updated += 1
 
                     except Exception as e:
                         # Catch any exceptions and output an error message
-                        pass
\ No newline at end of file
+                        pass
+        return updated
@@ -0,0 +1,80 @@
+import json
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from notification.models import Notification, OutboxMessage, WebhookEvent
+from transaction.models import Transaction
+from user.models import (User, Activities, SavingsActivities, CoporativeActivities, DataAndAirtimeActivity,
+                         LedgerEntry, Loan, Withdrawal, SavingsInstallment, VirtualAccount)
+
+
+def hot_queries(user_id):
+    """The per-user history reads and admin filters that must stay on an index."""
+    end = timezone.now()
+    start = end - timedelta(days=30)
+    return [
+        ("ledger feed", LedgerEntry.objects.filter(user_id=user_id).order_by("-created_at", "-pk")[:21]),
+        ("activities", Activities.objects.filter(user_id=user_id).order_by("-created_at", "-id")[:20]),
+        ("savings activities", SavingsActivities.objects.filter(user_id=user_id).order_by("-created_at", "-id")[:20]),
+        ("savings plan activities", SavingsActivities.objects.filter(savings_id=1).order_by("-created_at")[:20]),
+        ("cooperative activities", CoporativeActivities.objects.filter(
+            user_coop__user_id=user_id, created_at__range=[start, end]).order_by("-created_at")[:20]),
+        ("data activities", DataAndAirtimeActivity.objects.filter(user_id=user_id).order_by("-created_at")[:20]),
+        ("admin data activities", DataAndAirtimeActivity.objects.filter(
+            created_at__range=[start, end]).order_by("-created_at")[:20]),
+        ("transactions", Transaction.objects.filter(user_id=user_id).order_by("-created_at", "-id")[:20]),
+        ("admin transactions", Transaction.objects.order_by("-created_at")[:20]),
+        ("admin transactions by type", Transaction.objects.filter(
+            type="WITHDRAWAL", created_at__range=[start, end]).order_by("-created_at")[:20]),
+        ("admin transactions by status", Transaction.objects.filter(
+            status="SUCCESS", type="WALLET-CREDIT", created_at__range=[start, end])),
+        ("notifications", Notification.objects.filter(user_id=user_id).order_by("-status", "-created_at", "-id")[:20]),
+        ("unread notifications", Notification.objects.filter(user_id=user_id, status="UNREAD")),
+        ("admin withdrawals", Withdrawal.objects.filter(status="PENDING").order_by("-created_at")[:20]),
+        ("active loans", Loan.objects.filter(is_active=True, status="APPROVED")),
+        ("overdue loans", Loan.objects.filter(status="APPROVED", due_date__lt=end.date())),
+        ("admin loans", Loan.objects.order_by("-date_requested")[:20]),
+        ("savings payments", SavingsInstallment.objects.filter(savings_id=1, paid_status=True, due_at__range=[start, end])),
+        ("pending outbox", OutboxMessage.objects.filter(status="PENDING", next_attempt_at__lte=end).order_by("next_attempt_at")[:100]),
+        ("received webhooks", WebhookEvent.objects.filter(status="RECEIVED").order_by("id")[:500]),
+        ("deposit routing", VirtualAccount.objects.filter(account_number="0000000000")),
+    ]
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot history and admin queries and fail if any of them plans a sequential scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='User id to plan the per-user queries for (default: first user)')
+        parser.add_argument('--planner-costs', action='store_true',
+                            help='Keep sequential scans enabled; only meaningful on a database seeded to production size')
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("EXPLAIN plans are only checked on PostgreSQL")
+        user_id = options['user'] or User.objects.order_by("id").values_list("id", flat=True).first() or 1
+        failures = []
+        with transaction.atomic():
+            if not options['planner_costs']:
+                # on a small database the planner prefers seq scans even when an index fits;
+                # this still falls back to one when no index can serve the query
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, queryset in hot_queries(user_id):
+                plan = json.loads(queryset.explain(format="json"))[0]["Plan"]
+                scans = [node.get("Relation Name") for node in plan_nodes(plan) if node["Node Type"] == "Seq Scan"]
+                indexes = sorted({node["Index Name"] for node in plan_nodes(plan) if "Index Name" in node})
+                if scans:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"{name}: seq scan on {', '.join(scans)}"))
+                else:
+                    self.stdout.write(f"{name}: {', '.join(indexes)}")
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries plan a sequential scan: {', '.join(failures)}")
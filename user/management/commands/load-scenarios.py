@@ -0,0 +1,238 @@
+import asyncio
+import random
+import threading
+import time
+import uuid
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connection
+from notification import outbox
+from transaction.models import Transaction
+from user.models import User, EmailVerification, Withdrawal, BANK_LISTS
+from utils.n3data import DATA_PLANS
+from utils.provider_simulator import add_profile_arguments, build_simulator, point_clients_at, serve_in_thread
+
+PASSWORD = "LoadTest1!"
+PIN = 1234
+JOURNEYS = ("signup", "bvn", "withdrawal", "purchase")
+
+
+class JourneyFailed(Exception):
+    pass
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def parse_mix(spec):
+    """Read "signup=1,bvn=1,withdrawal=2,purchase=3" into journey weights."""
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in JOURNEYS:
+            raise CommandError(f"unknown journey {name!r}; choose from {', '.join(JOURNEYS)}")
+        try:
+            weights[name] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f"invalid weight in {part!r}")
+    return weights
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+class Command(BaseCommand):
+    help = ('Drive signup, BVN, withdrawal and bill purchase journeys against the API '
+            'with the providers replaced by the local simulator')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to generate load for')
+        parser.add_argument('--concurrency', type=int, default=20, help='Virtual users running journeys')
+        parser.add_argument('--users', type=int, default=200, help='Pre-created users for withdrawals and purchases')
+        parser.add_argument('--mix', default='signup=1,bvn=1,withdrawal=2,purchase=3')
+        parser.add_argument('--base-url',
+                            help='API already running elsewhere; it must be pointed at the simulator itself')
+        parser.add_argument('--simulator-port', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Leave the generated users in place')
+        add_profile_arguments(parser)
+
+    def handle(self, *args, **options):
+        if settings.PRODUCTION_ENV:
+            raise CommandError("refusing to run load scenarios in production: they create a staff accountant "
+                               f"and funded users with the password {PASSWORD}")
+        self.weights = parse_mix(options['mix'])
+        self.rng = random.Random(options['seed'])
+        self.tag = uuid.uuid4().hex[:8]
+        self.counter = 0
+        self.samples = {}
+        self.errors = {}
+        try:
+            simulator = build_simulator(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+        _, _, provider_url = serve_in_thread(simulator, port=options['simulator_port'])
+        point_clients_at(provider_url)
+        self.stdout.write(f"provider simulator on {provider_url}")
+
+        api = None
+        base_url = options['base_url']
+        if not base_url:
+            api = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+            api.set_app(get_internal_wsgi_application())
+            threading.Thread(target=api.serve_forever, daemon=True).start()
+            base_url = "http://%s:%s" % api.server_address
+        self.stdout.write(f"api on {base_url}")
+
+        self.pool = self.create_users(options['users'])
+        self.admin_token = self.create_admin()
+        stop = threading.Event()
+        sender = threading.Thread(target=self.send_sms, args=(stop,), daemon=True)
+        sender.start()
+        started = time.monotonic()
+        try:
+            asyncio.run(self.run(base_url, options['duration'], options['concurrency']))
+        finally:
+            elapsed = time.monotonic() - started
+            stop.set()
+            sender.join()
+            if api:
+                api.shutdown()
+            if not options['keep']:
+                self.clean_up()
+        self.report(elapsed, simulator.calls)
+
+    def email(self):
+        self.counter += 1
+        return f"load+{self.tag}-{self.counter}@example.com"
+
+    def phone(self):
+        return f"+23480{self.rng.randrange(10 ** 8):08d}"
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create([
+            User(email=self.email(), firstname="Load", lastname="Test", phone=f"+234{self.tag}{index:06d}",
+                 password=password, pin=PIN, is_verified=True, wallet_balance=10 ** 9)
+            for index in range(count)])
+        return [(user.id, user.tokens()["access"]) for user in users]
+
+    def create_admin(self):
+        admin = User.objects.create(email=self.email(), firstname="Load", lastname="Admin",
+                                    phone=f"+234{self.tag}admin", password=make_password(PASSWORD),
+                                    is_staff=True, is_verified=True, role="ADMIN")
+        admin.groups.add(Group.objects.get_or_create(name="Accountant")[0])
+        return admin.tokens()["access"]
+
+    def send_sms(self, stop):
+        """Deliver queued SMS so Termii sees the traffic the journeys cause; other kinds are left to the worker."""
+        try:
+            while not stop.is_set():
+                batch = [message for message in outbox.claim(100) if message.kind == "SMS"]
+                for message in batch:
+                    outbox.deliver(message)
+                if not batch:
+                    stop.wait(0.5)
+        finally:
+            connection.close()
+
+    async def run(self, base_url, duration, concurrency):
+        deadline = time.monotonic() + duration
+        names = list(self.weights)
+        weights = [self.weights[name] for name in names]
+        limits = httpx.Limits(max_connections=concurrency * 2)
+        async with httpx.AsyncClient(base_url=base_url + "/api/v1", timeout=60, limits=limits) as client:
+            async def virtual_user():
+                while time.monotonic() < deadline:
+                    journey = self.rng.choices(names, weights)[0]
+                    try:
+                        await getattr(self, journey)(client)
+                    except JourneyFailed:
+                        pass
+            await asyncio.gather(*[virtual_user() for _ in range(concurrency)])
+
+    async def call(self, client, label, method, path, token=None, ok=(200, 201), **kwargs):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, headers=headers, **kwargs)
+        except httpx.HTTPError as e:
+            response = None
+            error = type(e).__name__
+        self.samples.setdefault(label, []).append(time.perf_counter() - started)
+        if response is not None and response.status_code in ok:
+            return response.json()
+        error = response.status_code if response is not None else error
+        self.errors.setdefault(label, {}).setdefault(error, 0)
+        self.errors[label][error] += 1
+        raise JourneyFailed(label)
+
+    async def signup(self, client):
+        email, phone = self.email(), self.phone()
+        await self.call(client, "signup", "POST", "/auth/signup/", json={
+            "firstname": "Load", "lastname": "Test", "email": email, "phone": phone, "password": PASSWORD})
+        token = await sync_to_async(
+            EmailVerification.objects.filter(user__email=email).values_list("token", flat=True).first)()
+        await self.call(client, "verify-phone", "POST", "/auth/verify-phone/", json={"token": token, "phone": phone})
+        await self.call(client, "login", "POST", "/auth/login/", json={"email": email, "password": PASSWORD})
+
+    async def bvn(self, client):
+        user = await sync_to_async(User.objects.create)(
+            email=self.email(), firstname="Load", lastname="Bvn", phone=self.phone(), is_verified=True)
+        token = user.tokens()["access"]
+        bvn = 22000000000 + self.rng.randrange(10 ** 9)
+        await self.call(client, "bvn", "POST", "/auth/bvn/", token, json={"bvn": bvn})
+        await self.call(client, "verify-bvn", "POST", "/auth/verify_bvn/", token, json={"code": "123456"})
+
+    async def withdrawal(self, client):
+        user_id, token = self.rng.choice(self.pool)
+        await self.call(client, "withdrawal", "POST", "/user/withdrawal_request/", token, json={
+            "amount": self.rng.randrange(1000, 20000), "bank_code": BANK_LISTS[0]["bankCode"],
+            "account_number": f"{self.rng.randrange(10 ** 10):010d}", "pin": PIN})
+        withdrawal_id = await sync_to_async(
+            Withdrawal.objects.filter(user_id=user_id, status="PENDING").values_list("id", flat=True).last)()
+        enquiry = await self.call(client, "check-name", "GET", f"/admin/check_name/{withdrawal_id}",
+                                  self.admin_token)
+        await self.call(client, "approve-withdrawal", "POST", f"/admin/accept_withdrawal/{withdrawal_id}/",
+                        self.admin_token, json={"session_id": enquiry["id"]})
+
+    async def purchase(self, client):
+        _, token = self.rng.choice(self.pool)
+        phone = f"080{self.rng.randrange(10 ** 8):08d}"
+        if self.rng.random() < 0.5:
+            plan = self.rng.choice(DATA_PLANS)
+            await self.call(client, "buy-data", "POST", "/user/buy_data/", token,
+                            json={"pin": PIN, "plan": int(plan["plan_id"]), "phone": phone})
+        else:
+            await self.call(client, "buy-airtime", "POST", "/user/buy_airtime/", token, json={
+                "pin": PIN, "amount": self.rng.randrange(100, 2000), "phone": phone,
+                "network": self.rng.choice(["MTN", "GLO", "AIRTEL", "9MOBILE"])})
+
+    def clean_up(self):
+        users = User.objects.filter(email__startswith=f"load+{self.tag}-")
+        Transaction.objects.filter(user__in=users).delete()
+        deleted, _ = users.delete()
+        self.stdout.write(f"removed {deleted} generated rows")
+
+    def report(self, elapsed, calls):
+        self.stdout.write(f"{'endpoint':<20}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}"
+                          f"{'p99 ms':>10}{'req/s':>9}")
+        for label in sorted(self.samples):
+            values = sorted(self.samples[label])
+            errors = sum(self.errors.get(label, {}).values())
+            self.stdout.write(
+                f"{label:<20}{len(values):>8}{errors:>8}{percentile(values, 0.5) * 1000:>10.0f}"
+                f"{percentile(values, 0.95) * 1000:>10.0f}{percentile(values, 0.99) * 1000:>10.0f}"
+                f"{len(values) / elapsed:>9.1f}")
+        for label, errors in sorted(self.errors.items()):
+            self.stdout.write(f"{label} errors: " + ", ".join(f"{code} x{count}" for code, count in errors.items()))
+        self.stdout.write("provider calls: " + ", ".join(f"{path} {count}" for path, count in sorted(calls.items())))
+
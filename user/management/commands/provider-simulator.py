@@ -0,0 +1,23 @@
+import uvicorn
+from django.core.management.base import BaseCommand, CommandError
+from utils.provider_simulator import TERMII_PATH, add_profile_arguments, build_simulator
+
+
+class Command(BaseCommand):
+    help = 'Serve local stand-ins for the SafeHaven, N3 and Termii endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8900)
+        add_profile_arguments(parser)
+
+    def handle(self, *args, **options):
+        try:
+            simulator = build_simulator(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+        base_url = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(f"point SAFE_HAVEN_BASE_URL and N3BASEURL at {base_url} "
+                          f"and TERMII_BASE_URL at {base_url}{TERMII_PATH}")
+        uvicorn.run(simulator, host=options['host'], port=options['port'], lifespan="off", log_level="warning")
+
@@ -0,0 +1,92 @@
+import heapq
+import signal
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from user.models import UserSavings
+from user.savings_debit import debit_batch
+from utils.cache import invalidate_dashboards
+from utils.metrics import record_job
+from utils.sharding import parse_shard, in_shard
+
+
+class Command(BaseCommand):
+    help = ("Debit savings plans through the day at each plan's chosen time, day of week "
+            "and day of month, instead of all at once")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tick', type=float, default=30,
+                            help='Seconds between reads of the next_due_at index')
+        parser.add_argument('--lookahead', type=float, default=300,
+                            help='Seconds ahead of now to queue plans for on each read')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--queue-limit', type=int, default=50000,
+                            help='Most plans held in memory at once')
+        parser.add_argument('--wages-point', type=int, default=5)
+        parser.add_argument('--shard', help='Only handle users in shard N/M, e.g. 0/4')
+        parser.add_argument('--once', action='store_true', help='Debit what is due now and exit')
+
+    def handle(self, *args, **options):
+        if not settings.SAVINGS_SCHEDULER_ENABLED:
+            # otherwise the nightly debit takes every plan due today before its time comes
+            raise CommandError('Set SAVINGS_SCHEDULER_ENABLED=True so daily-check and savings-cron-job '
+                               'stop debiting plans, then start the scheduler.')
+        try:
+            self.shard = parse_shard(options['shard']) if options['shard'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.options = options
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        # (next_due_at, plan id), earliest first
+        self.queue = []
+        next_read = 0
+        while not self.stopping:
+            if time.monotonic() >= next_read:
+                self.read_due()
+                next_read = time.monotonic() + options['tick']
+            now = timezone.now()
+            due = []
+            while self.queue and self.queue[0][0] <= now and len(due) < options['batch_size']:
+                due.append(heapq.heappop(self.queue))
+            if due:
+                self.debit(due, now)
+                continue
+            if options['once']:
+                break
+            wait = next_read - time.monotonic()
+            if self.queue:
+                wait = min(wait, (self.queue[0][0] - now).total_seconds())
+            time.sleep(max(wait, 0.05))
+
+    def read_due(self):
+        """
+        Replace the queue with the plans falling due before the lookahead ends.
+        Rereading drops plans rescheduled since and picks up ones another
+        worker had locked.
+        """
+        until = timezone.now() + timedelta(seconds=self.options['lookahead'])
+        # index order is already a valid heap
+        self.queue = list(in_shard(UserSavings.objects, self.shard).filter(next_due_at__lte=until)
+                          .order_by('next_due_at', 'id')
+                          .values_list('next_due_at', 'id')[:self.options['queue_limit']])
+
+    def debit(self, due, now):
+        started = time.monotonic()
+        by_day = {}
+        for due_at, savings_id in due:
+            by_day.setdefault(timezone.localtime(due_at).date(), []).append(savings_id)
+        debited = 0
+        # plans locked by another worker keep their next_due_at and come back on the next read
+        for day, savings_ids in sorted(by_day.items()):
+            debited += debit_batch(savings_ids, day, self.options['wages_point'], due_by=now)
+        record_job("savings-scheduler", "debit_batch", time.monotonic() - started, debited)
+        if debited:
+            invalidate_dashboards()
+        self.stdout.write(f"debited {debited} of {len(due)} due plans")
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,81 @@
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from user.models import UserSavings
+from user.schedule import Schedule
+
+STEPS = {"DAILY": relativedelta(days=1), "WEEKLY": relativedelta(weeks=1), "MONTHLY": relativedelta(months=1)}
+
+
+def json_schedule(plan):
+    # the old payment_details blob: one key per installment, built up front
+    payment_details = {}
+    current_date = plan.start_date
+    while current_date <= plan.withdrawal_date:
+        default_time_str = plan.time.strftime('%H:%M:%S') if plan.time else '00:00:00'
+        payment_details[current_date.strftime(f'%d/%m/%Y {default_time_str}')] = {
+            "date": str(current_date), "amount": plan.amount, "paid_status": False, "balance": 0}
+        current_date += STEPS[plan.frequency]
+    return payment_details
+
+
+def json_payment(payment_details, saved, payment_datetime, amount):
+    # the old mark_payment_as_made: record the payment, then walk every later key
+    payment_date_str = payment_datetime.strftime('%d/%m/%Y %H:%M:%S')
+    if payment_date_str in payment_details:
+        payment_details[payment_date_str]['amount'] += amount
+        payment_details[payment_date_str]['paid_status'] = True
+        payment_details[payment_date_str]['balance'] = saved + amount
+    else:
+        payment_details[payment_date_str] = {
+            "date": str(payment_datetime.date()), 'amount': amount, 'paid_status': True, 'balance': saved + amount}
+    for date_str in payment_details:
+        if timezone.make_aware(datetime.strptime(date_str, '%d/%m/%Y %H:%M:%S')) > payment_datetime:
+            payment_details[date_str]['balance'] += amount
+
+
+class Command(BaseCommand):
+    help = 'Compare the JSON payment_details schedule with the derived Schedule on one long plan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--frequency', choices=list(STEPS), default='DAILY')
+        parser.add_argument('--payments', type=int, default=200, help='Payments made into the plan')
+        parser.add_argument('--page-size', type=int, default=30)
+
+    def handle(self, *args, **options):
+        start = date(2024, 1, 1)
+        plan = UserSavings(amount=1000, frequency=options['frequency'], start_date=start,
+                           withdrawal_date=start + relativedelta(years=options['years']), time=dt_time(9))
+        payments = [(timezone.make_aware(datetime.combine(start + timedelta(days=day), dt_time(9))), plan.amount)
+                    for day in range(options['payments'])]
+        page = options['page_size']
+
+        started = time.perf_counter()
+        details = json_schedule(plan)
+        built = time.perf_counter()
+        saved = 0
+        for paid_at, amount in payments:
+            json_payment(details, saved, paid_at, amount)
+            saved += amount
+        paid = time.perf_counter()
+        window = list(details.values())[len(details) // 2:len(details) // 2 + page]
+        json_times = (built - started, paid - built, time.perf_counter() - paid)
+
+        started = time.perf_counter()
+        schedule = Schedule(plan)
+        built = time.perf_counter()
+        schedule = Schedule(plan, payments)
+        paid = time.perf_counter()
+        derived = schedule[len(schedule) // 2:len(schedule) // 2 + page]
+        schedule_times = (built - started, paid - built, time.perf_counter() - paid)
+
+        assert [row["balance"] for row in window] == [row["balance"] for row in derived]
+        self.stdout.write(f"{options['years']}-year {options['frequency'].lower()} plan: "
+                          f"{len(details)} installments, {len(payments)} payments")
+        self.stdout.write(f"{'':<10}{'build ms':>12}{'payments ms':>14}{'page ms':>10}")
+        for label, times in (("json", json_times), ("schedule", schedule_times)):
+            self.stdout.write(f"{label:<10}" + "".join(
+                f"{seconds * 1000:>{width}.3f}" for seconds, width in zip(times, (12, 14, 10))))
@@ -0,0 +1,354 @@
+import contextlib
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as dt_time, timedelta
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from notification.models import Notification, NOTIFICATION_TYPE
+from transaction.models import Transaction, TRANSACTION_TYPE
+from user.models import (User, UserSavings, SavingsInstallment, SavingsActivities, CoporativeMembership,
+                         CooperativeDividend, CoporativeActivities, Loan, InvestmentPlan, UserInvestments,
+                         LedgerEntry, VirtualAccount, SAVINGS_TYPES)
+from user.schedule import Schedule, next_due
+from utils.cache import invalidate_dashboards
+
+FIRST_NAMES = ["Ade", "Bola", "Chidi", "Dayo", "Emeka", "Funmi", "Gbenga", "Halima", "Ifeoma", "Jide",
+               "Kemi", "Lanre", "Musa", "Ngozi", "Ola", "Tunde", "Uche", "Yemi", "Zainab", "Segun"]
+LAST_NAMES = ["Adeyemi", "Bello", "Chukwu", "Danjuma", "Eze", "Fashola", "Garba", "Ibrahim", "Johnson",
+              "Okafor", "Okon", "Olawale", "Suleiman", "Usman", "Yusuf"]
+HISTORY_DAYS = 3 * 365
+PASSWORD = "LoadTest1!"
+TIMESTAMPED = [User, UserSavings, SavingsActivities, CoporativeMembership, CoporativeActivities,
+               Loan, UserInvestments, Transaction, Notification, VirtualAccount]
+
+
+def run_chunk(state, chunk, indexes):
+    command = Command()
+    command.state = state
+    try:
+        with historical_timestamps(*TIMESTAMPED):
+            return command.seed_chunk(chunk, indexes)
+    finally:
+        connections.close_all()
+
+
+@contextlib.contextmanager
+def historical_timestamps(*models):
+    """Let bulk_create keep the generated created_at/updated_at values."""
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate production-sized synthetic data (users, savings, cooperative, loans, investments, history)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, required=True)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users generated per transaction')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+        parser.add_argument('--prefix', default='load', help='Seeded users get <prefix>-<n>@example.com')
+        parser.add_argument('--purge', action='store_true', help='Delete users seeded with this prefix first')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Generate chunks in a process pool; the same --seed gives the same data '
+                                 'except referral and guarantor ids, which follow insert order')
+
+    def handle(self, *args, **options):
+        if settings.PRODUCTION_ENV:
+            raise CommandError(f"refusing to seed load data in production: every user gets the password {PASSWORD}")
+        prefix = options['prefix']
+        if options['purge']:
+            deleted = User.objects.filter(email__startswith=f"{prefix}-", email__endswith="@example.com").delete()[0]
+            Transaction.objects.filter(user__isnull=True, source=f"seed/{prefix}").delete()
+            InvestmentPlan.objects.filter(title__startswith=f"{prefix} plan ").delete()
+            self.stdout.write(f"purged {deleted} rows")
+        if User.objects.filter(email__startswith=f"{prefix}-", email__endswith="@example.com").exists():
+            raise CommandError(f"users seeded as '{prefix}' already exist; pass --purge or another --prefix")
+
+        now = timezone.now()
+        self.rng = random.Random(options['seed'])
+        self.now, self.prefix, self.batch_size, self.counts = now, prefix, options['batch_size'], {}
+        self.state = {
+            "seed": options['seed'],
+            "prefix": prefix,
+            "batch_size": options['batch_size'],
+            "now": now,
+            # one argon2 run instead of one per user
+            "password": make_password(PASSWORD),
+            # phone, account and referral numbers stay unique across prefixes
+            "offset": (User.objects.aggregate(last=Max("id"))["last"] or 0) + 1,
+            "hubs": [],
+        }
+        self.state["plans"] = self.investment_plans()
+        chunks = [range(start, min(start + options['chunk_size'], options['users']))
+                  for start in range(0, options['users'], options['chunk_size'])]
+
+        started = time.monotonic()
+        counts = {"InvestmentPlan": len(self.state["plans"])}
+        done = 0
+
+        def report(chunk_counts, size):
+            nonlocal done
+            done += size
+            for model, rows in chunk_counts.items():
+                counts[model] = counts.get(model, 0) + rows
+            self.stdout.write(f"{done} users, {sum(counts.values())} rows, {time.monotonic() - started:.0f}s")
+
+        # the first chunk's users are the referral hubs every later chunk can point at
+        with historical_timestamps(*TIMESTAMPED):
+            first_counts = self.seed_chunk(0, chunks[0])
+        self.state["hubs"] = self.hubs
+        report(first_counts, len(chunks[0]))
+        if options['processes'] <= 1:
+            for chunk, indexes in enumerate(chunks[1:], start=1):
+                report(run_chunk(self.state, chunk, indexes), len(indexes))
+        else:
+            # children must not share the parent's database connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=options['processes'], mp_context=context) as pool:
+                futures = [(pool.submit(run_chunk, self.state, chunk, indexes), len(indexes))
+                           for chunk, indexes in enumerate(chunks[1:], start=1)]
+                for future, size in futures:
+                    report(future.result(), size)
+        invalidate_dashboards()
+
+        seconds = time.monotonic() - started
+        total = sum(counts.values())
+        for model, rows in sorted(counts.items()):
+            self.stdout.write(f"  {model}: {rows}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} rows in {seconds:.1f}s ({total / seconds:.0f} rows/s); password for every user: {PASSWORD}"))
+
+    def create(self, model, rows):
+        model.objects.bulk_create(rows, batch_size=self.batch_size)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(rows)
+        return rows
+
+    def moment(self, after, before=None):
+        before = before or self.now
+        span = max(int((before - after).total_seconds()), 1)
+        return after + timedelta(seconds=self.rng.randrange(span))
+
+    def investment_plans(self):
+        plans = []
+        for i in range(5):
+            start = (self.now - timedelta(days=self.rng.randint(30, 700))).date()
+            plans.append(InvestmentPlan(
+                title=f"{self.prefix} plan {i}", image="", duration=self.rng.choice([3, 6, 12]),
+                start_date=start, end_date=start + timedelta(days=365), quota=10000,
+                interest_rate=self.rng.choice([10, 15, 20]), unit_share=self.rng.choice([5000, 10000, 50000])))
+        return self.create(InvestmentPlan, plans)
+
+    @transaction.atomic
+    def seed_chunk(self, chunk, indexes):
+        """Generate one chunk of users and their history; returns rows created per model."""
+        state = self.state
+        # seeded per chunk, so the data is the same whichever process generates it; only the ids
+        # it picks as referrers and guarantors depend on the order chunks are inserted
+        self.rng = rng = random.Random(f"{state['seed']}:{chunk}")
+        self.now, self.prefix, self.batch_size = state["now"], state["prefix"], state["batch_size"]
+        self.plans = state["plans"]
+        self.referrers = list(state["hubs"])
+        self.counts = {}
+        users = []
+        for index in indexes:
+            number = state["offset"] + index
+            created_at = self.now - timedelta(days=rng.random() ** 2 * HISTORY_DAYS)
+            verified = rng.random() < 0.7
+            users.append(User(
+                firstname=rng.choice(FIRST_NAMES), lastname=rng.choice(LAST_NAMES),
+                email=f"{self.prefix}-{index}@example.com", phone=f"+2347{number:09d}", password=state["password"],
+                referal_code=f"L{number:07d}", is_verified=verified, is_subscribed=rng.random() < 0.4,
+                account_number=f"7{number:09d}" if verified else None,
+                account_name=f"WAGES/{number}" if verified else None,
+                wallet_balance=rng.randrange(0, 500000), wages_point=rng.randrange(0, 200),
+                tier="T2" if verified else rng.choice(["T0", "T1"]),
+                # preferential attachment: people who already referred someone are likelier to again
+                referal_id=rng.choice(self.referrers) if self.referrers and rng.random() < 0.35 else None,
+                created_at=created_at, updated_at=created_at))
+        self.create(User, users)
+        for user in users:
+            self.referrers.append(user.id)
+            if user.referal_id:
+                self.referrers.append(user.referal_id)
+
+        self.create(VirtualAccount, [
+            VirtualAccount(user=user, account_number=user.account_number, account_name=user.account_name,
+                           created_at=user.created_at)
+            for user in users if user.account_number])
+        ledger = []
+        ledger += self.seed_savings(users)
+        ledger += self.seed_cooperative([user for user in users if user.is_subscribed])
+        self.seed_loans(users)
+        self.seed_investments(users)
+        ledger += self.seed_transactions(users)
+        self.seed_notifications(users)
+        self.create(LedgerEntry, [entry for entry in ledger if entry is not None])
+        self.hubs = self.referrers
+        return self.counts
+
+    def seed_savings(self, users):
+        rng = self.rng
+        plans, due_times, installments, activities = [], [], [], []
+        for user in users:
+            for _ in range(rng.choice([0, 0, 1, 1, 2, 3])):
+                frequency = rng.choice(["DAILY", "WEEKLY", "WEEKLY", "MONTHLY"])
+                start = self.moment(user.created_at).date()
+                withdrawal = start + timedelta(days=rng.choice([90, 180, 365, 730]))
+                plan = UserSavings(
+                    user=user, type=rng.choice(SAVINGS_TYPES)[0], frequency=frequency,
+                    amount=rng.choice([500, 1000, 2000, 5000]) * (1 if frequency == "DAILY" else 4),
+                    start_date=start, withdrawal_date=withdrawal, time=dt_time(rng.randrange(6, 22)),
+                    day_week=start.strftime("%A") if frequency == "WEEKLY" else None,
+                    day_month=start.day if frequency == "MONTHLY" else None,
+                    is_active=withdrawal > self.now.date(),
+                    created_at=timezone.make_aware(datetime.combine(start, dt_time(8))))
+                plan.updated_at = plan.created_at
+                schedule = Schedule(plan)
+                plan.target_amount = len(schedule) * plan.amount
+                plan.next_due_at = next_due(plan, self.now.date())
+                plans.append(plan)
+                due_times.append([schedule.due_at(n) for n in range(len(schedule))])
+        self.create(UserSavings, plans)
+
+        for plan, schedule in zip(plans, due_times):
+            balance = 0
+            for due_at in schedule:
+                paid = due_at < self.now and rng.random() < 0.9
+                if paid:
+                    balance += plan.amount
+                    activities.append(SavingsActivities(
+                        savings=plan, user_id=plan.user_id, amount=plan.amount, balance=balance,
+                        activity_type="DEPOSIT", created_at=due_at))
+                    installments.append(SavingsInstallment(
+                        savings=plan, due_at=due_at, paid_at=due_at, amount=plan.amount, paid_status=True,
+                        balance=balance))
+            plan.saved = plan.all_time_saved = balance
+        UserSavings.objects.bulk_update(plans, ["saved", "all_time_saved"], batch_size=self.batch_size)
+        self.create(SavingsInstallment, installments)
+        self.create(SavingsActivities, activities)
+        return [activity.ledger_entry() for activity in activities]
+
+    def seed_cooperative(self, users):
+        rng = self.rng
+        memberships = [CoporativeMembership(
+            user=user, membership_id=f"WF-L{user.id:09d}", is_active=rng.random() < 0.9,
+            date_joined=self.moment(user.created_at)) for user in users]
+        for membership in memberships:
+            membership.updated_at = membership.date_joined
+        self.create(CoporativeMembership, memberships)
+
+        activities, dividends = [], []
+        for membership in memberships:
+            balance = outstanding = 0
+            period = membership.date_joined.date().replace(day=1)
+            while period < self.now.date().replace(day=1):
+                deposit = rng.choice([0, 5000, 10000, 20000])
+                if deposit:
+                    balance += deposit
+                    activities.append(CoporativeActivities(
+                        user_coop=membership, amount=deposit, balance=balance, activity_type="DEPOSIT",
+                        created_at=self.moment(timezone.make_aware(datetime.combine(period, dt_time()))),
+                    ))
+                closing = period + relativedelta(months=1) - timedelta(days=1)
+                dividend = CooperativeDividend(
+                    membership=membership, period=period, date=closing, closing_balance=balance,
+                    dividend=round(balance * 0.01), status=rng.random() < 0.8)
+                dividends.append(dividend)
+                if not dividend.status:
+                    outstanding += dividend.dividend
+                period += relativedelta(months=1)
+            membership.balance = balance
+            membership.dividend = outstanding
+        CoporativeMembership.objects.bulk_update(memberships, ["balance", "dividend"], batch_size=self.batch_size)
+        self.create(CoporativeActivities, activities)
+        self.create(CooperativeDividend, dividends)
+        return [activity.ledger_entry() for activity in activities]
+
+    def seed_loans(self, users):
+        rng = self.rng
+        loans = []
+        for user in users:
+            if rng.random() >= 0.2:
+                continue
+            status = rng.choice(["PENDING", "APPROVED", "APPROVED", "REPAYED", "REJECTED", "OVER-DUE"])
+            loan = Loan(
+                user=user, amount=rng.choice([50000, 100000, 250000, 500000]),
+                duration_in_months=rng.choice([3, 6, 12]), status=status,
+                guarantor1_id=rng.choice(self.referrers), guarantor2_id=rng.choice(self.referrers),
+                guarantor1_agreed="APPROVED" if status != "PENDING" else "PENDING",
+                guarantor2_agreed="APPROVED" if status != "PENDING" else "PENDING",
+                is_active=status in ("PENDING", "APPROVED", "OVER-DUE"),
+                date_requested=self.moment(user.created_at))
+            if status in ("APPROVED", "REPAYED", "OVER-DUE"):
+                loan.date_approved = (loan.date_requested + timedelta(days=rng.randint(1, 7))).date()
+                loan.populate_repayment_details()
+                loan.balance = loan.amount + loan.calculate_total_interest()
+                for entry in loan.repayment_details.values():
+                    entry["paid_status"] = status == "REPAYED" or (
+                        entry["date"] < str(self.now.date()) and status == "APPROVED")
+                loan.amount_repayed = sum(entry["amount"] for entry in loan.repayment_details.values()
+                                          if entry["paid_status"])
+                loan.due_date = loan.get_due_date()
+            loans.append(loan)
+        self.create(Loan, loans)
+
+    def seed_investments(self, users):
+        rng = self.rng
+        investments = []
+        for user in users:
+            if rng.random() >= 0.15:
+                continue
+            plan = rng.choice(self.plans)
+            shares = rng.randint(1, 10)
+            created_at = self.moment(user.created_at)
+            due_date = (created_at + relativedelta(months=plan.duration)).date()
+            investments.append(UserInvestments(
+                user=user, investment=plan, shares=shares, amount=shares * plan.unit_share,
+                interest=shares * plan.unit_share * plan.interest_rate // 100,
+                status="ACTIVE" if due_date > self.now.date() else rng.choice(["MATURED", "WITHDRAWN"]),
+                created_at=created_at, due_date=due_date))
+        self.create(UserInvestments, investments)
+
+    def seed_transactions(self, users):
+        rng = self.rng
+        transactions = []
+        for user in users:
+            for _ in range(rng.randint(2, 30)):
+                kind = rng.choice(TRANSACTION_TYPE)[0]
+                amount = rng.choice([500, 1000, 2000, 5000, 10000, 50000])
+                created_at = self.moment(user.created_at)
+                transactions.append(Transaction(
+                    user=user, amount=amount, type=kind, source=f"seed/{self.prefix}",
+                    status=rng.choices(["SUCCESS", "PENDING", "FAILED"], [90, 5, 5])[0],
+                    description=f"N{amount} {kind.lower()}", created_at=created_at, updated_at=created_at))
+        self.create(Transaction, transactions)
+        return [row.ledger_entry() for row in transactions]
+
+    def seed_notifications(self, users):
+        rng = self.rng
+        notifications = []
+        for user in users:
+            for _ in range(rng.randint(0, 15)):
+                created_at = self.moment(user.created_at)
+                notifications.append(Notification(
+                    user=user, title="Account update", text="Synthetic notification",
+                    type=rng.choice(NOTIFICATION_TYPE)[0], status=rng.choices(["READ", "UNREAD"], [7, 3])[0],
+                    created_at=created_at, updated_at=created_at))
+        self.create(Notification, notifications)
@@ -0,0 +1,66 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from user.models import User
+from user.wallet import WalletService, InsufficientFunds
+
+
+def debit_with_service(user_id, amount):
+    try:
+        WalletService.debit(User(pk=user_id), amount)
+        return True
+    except InsufficientFunds:
+        return False
+
+
+def debit_with_save(user_id, amount):
+    # the old read-check-save path, kept to show the lost updates it causes
+    with transaction.atomic():
+        user = User.objects.get(pk=user_id)
+        if user.wallet_balance < amount:
+            return False
+        user.wallet_balance -= amount
+        user.save()
+        return True
+
+
+class Command(BaseCommand):
+    help = 'Fire parallel debits at one throwaway wallet and check the final balance'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--debits', type=int, default=1000)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--amount', type=int, default=100)
+        parser.add_argument('--balance', type=int, default=None,
+                            help='Starting balance, defaults to enough for half of the debits')
+        parser.add_argument('--mode', choices=['service', 'save'], default='service')
+
+    def handle(self, *args, **options):
+        amount = Decimal(options['amount'])
+        debits = options['debits']
+        balance = Decimal(options['balance'] if options['balance'] is not None else amount * debits // 2)
+        tag = uuid.uuid4().hex[:12]
+        user = User.objects.create(email=f"wallet-benchmark-{tag}@example.com", firstname="Wallet",
+                                   lastname="Benchmark", wallet_balance=balance)
+        debit = debit_with_service if options['mode'] == 'service' else debit_with_save
+        try:
+            started = time.monotonic()
+            # each worker thread keeps its own connection for the whole run
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                succeeded = sum(pool.map(debit, [user.pk] * debits, [amount] * debits))
+            seconds = time.monotonic() - started
+            final = User.objects.values_list('wallet_balance', flat=True).get(pk=user.pk)
+        finally:
+            User.objects.filter(pk=user.pk).delete()
+
+        expected = balance - succeeded * amount
+        self.stdout.write(f"{options['mode']}: {debits} debits on {options['threads']} threads "
+                          f"in {seconds:.2f}s ({debits / seconds:.0f}/s)")
+        self.stdout.write(f"succeeded: {succeeded}, final balance: {final}, expected: {expected}")
+        if final == expected and final >= 0:
+            self.stdout.write(self.style.SUCCESS('Balance is consistent'))
+        else:
+            self.stdout.write(self.style.ERROR(f'Lost or duplicated {abs(final - expected) / amount:.0f} debits'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0065_alter_user_bvn'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activities',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='activities_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coporativeactivities',
+            index=models.Index(fields=['user_coop', '-created_at', '-id'], name='coop_act_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataandairtimeactivity',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='data_act_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savingsactivities',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='savings_act_user_created_idx'),
+        ),
+    ]
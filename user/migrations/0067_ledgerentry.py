@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0008_activity_feed_indexes'),
+        ('user', '0066_activity_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('activities', 'Wallet activity'), ('transactions', 'Transaction'), ('savings_activities', 'Savings activity'), ('data_activities', 'Data and airtime purchase'), ('coporative_activities', 'Cooporative activity')], max_length=30)),
+                ('source_id', models.CharField(max_length=64)),
+                ('title', models.CharField(max_length=250)),
+                ('description', models.CharField(blank=True, max_length=250)),
+                ('activity_type', models.CharField(max_length=10)),
+                ('amount', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='transaction.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at', '-id'], name='ledger_user_created_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(fields=('source', 'source_id'), name='ledger_unique_source'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:45
+
+import django.db.models.deletion
+from datetime import datetime
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def convert_payment_details(apps, schema_editor):
+    UserSavings = apps.get_model('user', 'UserSavings')
+    SavingsInstallment = apps.get_model('user', 'SavingsInstallment')
+    batch = []
+    savings_qs = UserSavings.objects.filter(payment_details__isnull=False).only('id', 'payment_details')
+    for savings in savings_qs.iterator(chunk_size=500):
+        for entry_str, details in savings.payment_details.items():
+            due_at = timezone.make_aware(datetime.strptime(entry_str, '%d/%m/%Y %H:%M:%S'))
+            batch.append(SavingsInstallment(
+                savings_id=savings.id,
+                due_at=due_at,
+                amount=details.get('amount', 0),
+                paid_status=details.get('paid_status', False),
+                balance=details.get('balance', 0),
+            ))
+        if len(batch) >= 5000:
+            SavingsInstallment.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        SavingsInstallment.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0067_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavingsInstallment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_at', models.DateTimeField()),
+                ('amount', models.BigIntegerField()),
+                ('paid_status', models.BooleanField(default=False)),
+                ('balance', models.BigIntegerField(default=0)),
+                ('savings', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installments', to='user.usersavings')),
+            ],
+            options={
+                'ordering': ['due_at'],
+                'indexes': [models.Index(condition=models.Q(('paid_status', False)), fields=['savings', 'due_at'], name='installment_unpaid_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='savingsinstallment',
+            constraint=models.UniqueConstraint(fields=('savings', 'due_at'), name='installment_unique_due_at'),
+        ),
+        migrations.RunPython(convert_payment_details, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='usersavings',
+            name='payment_details',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:48
+
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def populate_due_date(apps, schema_editor):
+    Loan = apps.get_model('user', 'Loan')
+    loans = []
+    for loan in Loan.objects.filter(date_approved__isnull=False).only('id', 'date_approved', 'duration_in_months').iterator():
+        loan.due_date = loan.date_approved + timedelta(days=loan.duration_in_months * 30)
+        loans.append(loan)
+    Loan.objects.bulk_update(loans, ['due_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0068_savingsinstallment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='due_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status', 'due_date'], name='loan_status_due_idx'),
+        ),
+        migrations.RunPython(populate_due_date, migrations.RunPython.noop),
+    ]
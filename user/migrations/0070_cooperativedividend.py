@@ -0,0 +1,62 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:49
+
+import django.db.models.deletion
+from datetime import datetime
+from django.db import migrations, models
+
+
+def convert_monthly_dividend(apps, schema_editor):
+    CoporativeMembership = apps.get_model('user', 'CoporativeMembership')
+    CooperativeDividend = apps.get_model('user', 'CooperativeDividend')
+    batch = []
+    memberships = CoporativeMembership.objects.filter(monthly_dividend__isnull=False).only('id', 'monthly_dividend')
+    for membership in memberships.iterator(chunk_size=500):
+        for month_year, entry in membership.monthly_dividend.items():
+            period = datetime.strptime(month_year, '%B %Y').date()
+            batch.append(CooperativeDividend(
+                membership_id=membership.id,
+                period=period,
+                date=datetime.strptime(entry['date'], '%Y-%m-%d').date() if entry.get('date') else period,
+                closing_balance=entry.get('closing_balance', 0),
+                dividend=entry.get('dividend', 0),
+                status=bool(entry.get('status')),
+            ))
+        if len(batch) >= 5000:
+            CooperativeDividend.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        CooperativeDividend.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0069_loan_due_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CooperativeDividend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('date', models.DateField()),
+                ('closing_balance', models.BigIntegerField()),
+                ('dividend', models.BigIntegerField()),
+                ('status', models.BooleanField(default=False)),
+                ('membership', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dividends', to='user.coporativemembership')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period'], name='dividend_period_idx'), models.Index(condition=models.Q(('status', False)), fields=['membership'], name='dividend_outstanding_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cooperativedividend',
+            constraint=models.UniqueConstraint(fields=('membership', 'period'), name='dividend_unique_period'),
+        ),
+        migrations.RunPython(convert_monthly_dividend, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='coporativemembership',
+            name='monthly_dividend',
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_virtual_accounts(apps, schema_editor):
+    User = apps.get_model('user', 'User')
+    VirtualAccount = apps.get_model('user', 'VirtualAccount')
+    numbers, hashes, batch = set(), set(), []
+    users = User.objects.exclude(account_number__isnull=True).exclude(account_number='').order_by('id')
+    for user in users.only('id', 'account_number', 'account_name', 'bvn').iterator(chunk_size=2000):
+        # the oldest holder keeps a number or BVN that was issued twice
+        if user.account_number in numbers:
+            continue
+        numbers.add(user.account_number)
+        identity_hash = user.bvn if user.bvn and user.bvn not in hashes else None
+        hashes.add(identity_hash)
+        batch.append(VirtualAccount(user_id=user.id, account_number=user.account_number,
+                                    account_name=user.account_name or '', identity_hash=identity_hash))
+        if len(batch) >= 5000:
+            VirtualAccount.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        VirtualAccount.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0070_cooperativedividend'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VirtualAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_number', models.CharField(max_length=12, unique=True)),
+                ('account_name', models.CharField(blank=True, max_length=250)),
+                ('identity_hash', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='virtual_account', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_virtual_accounts, migrations.RunPython.noop),
+    ]
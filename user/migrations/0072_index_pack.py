@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0010_index_pack'),
+        ('user', '0071_virtualaccount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dataandairtimeactivity',
+            index=models.Index(fields=['-created_at'], name='data_act_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['status'], name='loan_active_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['-date_requested'], name='loan_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savingsactivities',
+            index=models.Index(fields=['savings', '-created_at'], name='savings_act_savings_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['status', '-created_at'], name='withdrawal_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['-created_at'], name='withdrawal_created_idx'),
+        ),
+    ]
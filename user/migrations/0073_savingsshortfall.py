@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0072_index_pack'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavingsShortfall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_date', models.DateField()),
+                ('amount', models.BigIntegerField()),
+                ('status', models.CharField(choices=[('PENDING', 'Waiting for wallet funds'), ('SETTLED', 'Debited from the wallet'), ('CANCELLED', 'Plan ended before it was settled')], default='PENDING', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('settled_at', models.DateTimeField(blank=True, null=True)),
+                ('savings', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shortfalls', to='user.usersavings')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='savings_shortfalls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDING')), fields=['user', 'due_date', 'id'], name='shortfall_pending_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='savingsshortfall',
+            constraint=models.UniqueConstraint(fields=('savings', 'due_date'), name='shortfall_unique_due_date'),
+        ),
+    ]
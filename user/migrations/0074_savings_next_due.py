@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:27
+
+from django.db import migrations, models
+from django.utils import timezone
+from user.schedule import next_due
+
+
+def backfill_next_due(apps, schema_editor):
+    UserSavings = apps.get_model('user', 'UserSavings')
+    today = timezone.localdate()
+    batch = []
+    for plan in UserSavings.objects.filter(goal_met=False, withdrawal_date__gte=today).iterator():
+        plan.next_due_at = next_due(plan, today)
+        batch.append(plan)
+        if len(batch) >= 5000:
+            UserSavings.objects.bulk_update(batch, ['next_due_at'])
+            batch = []
+    if batch:
+        UserSavings.objects.bulk_update(batch, ['next_due_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0073_savingsshortfall'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersavings',
+            name='next_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='usersavings',
+            index=models.Index(condition=models.Q(('next_due_at__isnull', False)), fields=['next_due_at'], name='savings_next_due_idx'),
+        ),
+        migrations.RunPython(backfill_next_due, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:29
+
+from django.db import migrations
+
+
+def delete_unpaid_installments(apps, schema_editor):
+    # the schedule is derived on demand; only payments stay stored
+    apps.get_model('user', 'SavingsInstallment').objects.filter(paid_status=False).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0074_savings_next_due'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_unpaid_installments, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='savingsinstallment',
+            name='installment_unpaid_idx',
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_upfront_interest(apps, schema_editor):
+    # running plans were credited their whole term's interest on each payment;
+    # the first accrue-savings-interest or daily-check run after this rebuilds
+    # it day by day from the earliest running plan's start
+    UserSavings = apps.get_model('user', 'UserSavings')
+    UserSavings.objects.filter(withdrawal_date__isnull=False).exclude(interest=0).update(
+        all_time_interest=models.F('all_time_interest') - models.F('interest'), interest=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0075_payment_only_installments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavingsInterestAccrual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('balance', models.BigIntegerField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=12)),
+                ('amount', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='usersavings',
+            name='all_time_interest',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=20),
+        ),
+        migrations.AlterField(
+            model_name='usersavings',
+            name='interest',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=20),
+        ),
+        migrations.AddIndex(
+            model_name='savingsinstallment',
+            index=models.Index(fields=['due_at'], include=('savings', 'amount'), name='installment_due_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='savingsinterestaccrual',
+            name='savings',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interest_accruals', to='user.usersavings'),
+        ),
+        migrations.AddIndex(
+            model_name='savingsinterestaccrual',
+            index=models.Index(fields=['day'], name='interest_accrual_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='savingsinterestaccrual',
+            constraint=models.UniqueConstraint(fields=('savings', 'day'), name='interest_accrual_unique_day'),
+        ),
+        migrations.RunPython(drop_upfront_interest, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:10
+
+from django.db import migrations
+
+
+def legacy_to_hex(value):
+    """
+    Old rows hold str(sha256(bvn).digest(), 'utf-8'); hash_identity() is the
+    hexdigest of the same digest. Current values are 64 ASCII characters,
+    a legacy one is 32 bytes once encoded back.
+    """
+    if value and len(value.encode('utf-8')) == 32:
+        return value.encode('utf-8').hex()
+    return value
+
+
+def convert_legacy_hashes(apps, schema_editor):
+    User = apps.get_model('user', 'User')
+    VirtualAccount = apps.get_model('user', 'VirtualAccount')
+    users = []
+    for user in User.objects.exclude(bvn__isnull=True).exclude(bvn='').only('id', 'bvn').iterator(chunk_size=2000):
+        converted = legacy_to_hex(user.bvn)
+        if converted != user.bvn:
+            user.bvn = converted
+            users.append(user)
+    User.objects.bulk_update(users, ['bvn'], batch_size=2000)
+
+    taken = set(VirtualAccount.objects.exclude(identity_hash__isnull=True).values_list('identity_hash', flat=True))
+    accounts = []
+    for account in VirtualAccount.objects.exclude(identity_hash__isnull=True).only('id', 'identity_hash').order_by('id'):
+        converted = legacy_to_hex(account.identity_hash)
+        if converted == account.identity_hash:
+            continue
+        # registered again since under the hex form: that account keeps it
+        account.identity_hash = converted if converted not in taken else None
+        taken.add(converted)
+        accounts.append(account)
+    VirtualAccount.objects.bulk_update(accounts, ['identity_hash'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0076_savings_interest_accrual'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_legacy_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0077_hex_legacy_bvn_hashes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activities',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12),
+        ),
+    ]
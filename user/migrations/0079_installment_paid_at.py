@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_paid_at(apps, schema_editor):
+    # when older payments actually arrived was not recorded; their due time is the closest we have
+    apps.get_model('user', 'SavingsInstallment').objects.update(paid_at=models.F('due_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0078_decimal_history_amounts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='savingsinstallment',
+            name='installment_due_at_idx',
+        ),
+        migrations.AddField(
+            model_name='savingsinstallment',
+            name='paid_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_paid_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='savingsinstallment',
+            index=models.Index(fields=['paid_at'], include=('savings', 'amount'), name='installment_paid_at_idx'),
+        ),
+    ]
@@ -9,6 +9,8 @@ from dateutil.relativedelta import relativedelta
 import time
 import os
 from django.utils.timezone import now
+from .ledger import LedgerRecordMixin, LEDGER_SOURCE
+from .schedule import Schedule, next_due
 
 # Create your models here.
 
@@ -188,9 +190,9 @@ SAVINGS_FREQUENCY_CHOICE = [
 ]
 
 
-class Activities(models.Model):
+class Activities(LedgerRecordMixin, models.Model):
     title = models.CharField(max_length=250)
-    amount = models.IntegerField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='user_activity')
     activity_type = models.CharField(
@@ -203,6 +205,18 @@ class Activities(models.Model):
     def __str__(self):
         return f"{self.amount} - {self.title} by {self.user.firstname} on {self.created_at}"
 
+    def ledger_entry(self):
+        return LedgerEntry(
+            user_id=self.user_id, source="activities", source_id=str(self.pk),
+            title=self.title, amount=self.amount,
+            description=f"{self.activity_type.lower()} of N{self.amount} ",
+            activity_type=self.activity_type, created_at=self.created_at)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="activities_user_created_idx"),
+        ]
+
 
 WITHDRAWAL_STATUS = [
     ("PENDING", "Withdrawal yet to be approved"),
@@ -232,6 +246,12 @@ class Withdrawal(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "-created_at"], name="withdrawal_status_created_idx"),
+            models.Index(fields=["-created_at"], name="withdrawal_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.created_at} == {self.user.firstname} {self.user.lastname} == {self.amount} == {self.bank_name} == {self.account_number} == {self.status} "
 
@@ -318,8 +338,9 @@ class UserSavings(models.Model):
     type = models.CharField(
         max_length=35, choices=SAVINGS_TYPES, default=SAVINGS_TYPES[0][0])
     amount = models.BigIntegerField()
-    all_time_interest = models.BigIntegerField(default=0)
-    interest = models.BigIntegerField(default=0)
+    # accrued day by day by user.interest; see SavingsInterestAccrual
+    all_time_interest = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    interest = models.DecimalField(max_digits=20, decimal_places=4, default=0)
     target_amount = models.BigIntegerField(blank=True, null=True)
     all_time_saved = models.BigIntegerField(default=0)
     is_active = models.BooleanField(default=True)
@@ -337,84 +358,94 @@ class UserSavings(models.Model):
     time = models.TimeField(null=True, blank=True)
     day_week = models.CharField(max_length=9, choices=DAY_OF_WEEK_CHOICES, blank=True, null=True)
     day_month = models.PositiveIntegerField(blank=True, null=True)
-    payment_details = models.JSONField(blank=True, null=True)
+    # when savings-scheduler takes the next installment; None once the plan has ended
+    next_due_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_due_at"], condition=models.Q(next_due_at__isnull=False),
+                         name="savings_next_due_idx"),
+        ]
+
+    @property
+    def payment_details(self):
+        if not self.withdrawal_date:
+            return None
+        return {
+            timezone.localtime(entry["due_at"]).strftime('%d/%m/%Y %H:%M:%S'): {
+                "date": entry["date"],
+                "amount": entry["amount"],
+                "paid_status": entry["paid_status"],
+                "balance": entry["balance"],
+            }
+            for entry in self.schedule()
+        }
+
+    def schedule(self):
+        """The plan's installments, derived from its terms and the payments made."""
+        return Schedule.for_savings(self)
+
     def calculate_payment_details(self):
         if not self.start_date or not self.withdrawal_date:
             return
-        
-        payment_details = {}
-        current_date = self.start_date
-
-        while current_date <= self.withdrawal_date:
-            # Use the default time specified in the object
-            default_time_str = self.time.strftime('%H:%M:%S') if self.time else '00:00:00'
-            entry_str = current_date.strftime(f'%d/%m/%Y {default_time_str}')
-            
-            payment_details[entry_str] = {
-                "date": str(current_date),
-                "amount": self.amount,
-                "paid_status": False,
-                "balance": 0,  # Balance starts at 0 before any payments are made
-            }
-            
-            if self.frequency == 'DAILY':
-                current_date += relativedelta(days=1)
-            elif self.frequency == 'WEEKLY':
-                current_date += relativedelta(weeks=1)
-            elif self.frequency == 'MONTHLY':
-                current_date += relativedelta(months=1)
-            else:
-                break
-
-        self.payment_details = payment_details
-        self.target_amount = int(len(payment_details) * self.amount)
+        # installments are derived on demand; only payments are stored
+        self.target_amount = int(len(Schedule(self)) * self.amount)
+        self.next_due_at = next_due(self, timezone.localdate())
         self.save()
+
+    def paid_between(self, start_date, end_date):
+        """Total paid on installments due between the two dates, inclusive."""
+        return self.installments.filter(
+            paid_status=True, due_at__date__range=(start_date, end_date)
+        ).aggregate(total=models.Sum('amount'))['total'] or 0
+
     def mark_payment_as_made(self, payment_datetime, amount):
         # Ensure payment_datetime is timezone-aware
         if timezone.is_naive(payment_datetime):
             payment_datetime = timezone.make_aware(payment_datetime, timezone.get_current_timezone())
-
-        payment_date_str = payment_datetime.strftime('%d/%m/%Y %H:%M:%S')
-
-        # Update the payment details for the current payment date
-        if payment_date_str in self.payment_details:
-            self.payment_details[payment_date_str]['amount'] += amount
-            self.payment_details[payment_date_str]['paid_status'] = True
-            self.payment_details[payment_date_str]['balance'] = self.saved + amount
-        else:
-            self.payment_details[payment_date_str] = {
-                "date": str(payment_datetime.date()),
-                'amount': amount,
-                'paid_status': True,
-                'balance': self.saved + amount,
-            }
-        ttday = datetime.now().date()
-        days_to_withdrawal = (self.withdrawal_date - ttday).days
-        interest = days_to_withdrawal * 0.00041096 * amount
-        # Update the saved amount
-        self.all_time_interest += interest
-        self.interest += interest
+        payment_datetime = payment_datetime.replace(microsecond=0)
+
+        # Update the installment for the current payment date
+        updated = SavingsInstallment.objects.filter(savings=self, due_at=payment_datetime).update(
+            amount=models.F('amount') + amount, paid_status=True, balance=self.saved + amount,
+            paid_at=timezone.now())
+        if not updated:
+            SavingsInstallment.objects.create(
+                savings=self, due_at=payment_datetime, amount=amount,
+                paid_status=True, balance=self.saved + amount)
+        # Update the saved amount; interest is left to the nightly accrual
         self.saved += amount
         self.all_time_saved += amount
+        self.save(update_fields=['saved', 'all_time_saved', 'updated_at'])
+    def __str__(self):
+        return f"{self.user.lastname} - {self.type} - {self.amount} - {self.start_date} - {self.withdrawal_date}"
+
 
-        # Update the balance for all future entries
-        future_dates = [
-            date_str for date_str in self.payment_details
-            if timezone.make_aware(datetime.strptime(date_str, '%d/%m/%Y %H:%M:%S'), timezone.get_current_timezone()) > payment_datetime
+class SavingsInstallment(models.Model):
+    """A payment into a plan. The installments still due are worked out by user.schedule.Schedule."""
+    savings = models.ForeignKey(
+        UserSavings, on_delete=models.CASCADE, related_name="installments")
+    # the installment the payment is for; when the money arrived is paid_at
+    due_at = models.DateTimeField()
+    paid_at = models.DateTimeField(default=timezone.now)
+    amount = models.BigIntegerField()
+    paid_status = models.BooleanField(default=False)
+    balance = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["due_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["savings", "due_at"], name="installment_unique_due_at"),
+        ]
+        indexes = [
+            # payments made after a given day, for the interest accrual's end-of-day balances
+            models.Index(fields=["paid_at"], include=["savings", "amount"], name="installment_paid_at_idx"),
         ]
-        
-        for future_date in future_dates:
-            future_date_datetime = datetime.strptime(future_date, '%d/%m/%Y %H:%M:%S')
-            if timezone.is_naive(future_date_datetime):
-                future_date_datetime = timezone.make_aware(future_date_datetime, timezone.get_current_timezone())
-            
-            self.payment_details[future_date]['balance'] += amount
 
-        self.save()
     def __str__(self):
-        return f"{self.user.lastname} - {self.type} - {self.amount} - {self.start_date} - {self.withdrawal_date}"
+        return f"{self.savings_id} - {self.due_at} - {self.amount} - {self.paid_status}"
 
 
 SAVINGS_ACTIVITIES_CHOICE = [
@@ -432,7 +463,63 @@ class SavingsCancel(models.Model):
         return f"{self.savings.type} -- {self.savings.user.firstname} -- {self.penalty} -- {self.created_at}"
 
 
-class SavingsActivities(models.Model):
+SHORTFALL_STATUS = [
+    ("PENDING", "Waiting for wallet funds"),
+    ("SETTLED", "Debited from the wallet"),
+    ("CANCELLED", "Plan ended before it was settled"),
+]
+
+
+class SavingsShortfall(models.Model):
+    """
+    An installment that was due while the wallet could not cover it. Pending
+    rows are settled oldest first as soon as the owner's wallet is credited.
+    """
+    savings = models.ForeignKey(UserSavings, on_delete=models.CASCADE, related_name="shortfalls")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="savings_shortfalls")
+    due_date = models.DateField()
+    amount = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=SHORTFALL_STATUS, default=SHORTFALL_STATUS[0][0])
+    created_at = models.DateTimeField(auto_now_add=True)
+    settled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["savings", "due_date"], name="shortfall_unique_due_date"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "due_date", "id"], condition=models.Q(status="PENDING"),
+                         name="shortfall_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.savings_id} - {self.due_date} - {self.amount} - {self.status}"
+
+
+class SavingsInterestAccrual(models.Model):
+    """One day's interest on a plan, written by user.interest.accrue and rewritten on a recompute."""
+    savings = models.ForeignKey(
+        UserSavings, on_delete=models.CASCADE, related_name="interest_accruals")
+    day = models.DateField()
+    # what the plan held at the end of the day, and the daily rate applied to it
+    balance = models.BigIntegerField()
+    rate = models.DecimalField(max_digits=12, decimal_places=8)
+    amount = models.DecimalField(max_digits=20, decimal_places=4)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["savings", "day"], name="interest_accrual_unique_day"),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="interest_accrual_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.savings_id} - {self.day} - {self.amount}"
+
+
+class SavingsActivities(LedgerRecordMixin, models.Model):
     savings = models.ForeignKey(
         UserSavings, on_delete=models.CASCADE, related_name="savings_activities"
     )
@@ -451,6 +538,20 @@ class SavingsActivities(models.Model):
     def __str__(self):
         return f"{self.amount} - {self.savings.type} by {self.user.firstname} on {self.created_at}"
 
+    def ledger_entry(self):
+        return LedgerEntry(
+            user_id=self.user_id, source="savings_activities", source_id=str(self.pk),
+            title=self.savings.type, amount=self.amount,
+            description=f"{self.activity_type.lower()} of N{self.amount} ",
+            activity_type="CREDIT" if self.activity_type == "WITHDRAWAL" else "DEBIT",
+            created_at=self.created_at)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="savings_act_user_created_idx"),
+            models.Index(fields=["savings", "-created_at"], name="savings_act_savings_idx"),
+        ]
+
 
 class CoporativeMembership(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -460,13 +561,50 @@ class CoporativeMembership(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     membership_id = models.CharField(max_length=20, unique=True)
     dividend = models.IntegerField(default=0)
-    monthly_dividend = models.JSONField(blank=True, null=True)
 
     def __str__(self):
         return f"{self.user.lastname} - {self.membership_id} - {self.balance} -{self.date_joined}"
 
+    @property
+    def monthly_dividend(self):
+        return {
+            dividend.period.strftime('%B %Y'): dividend.as_entry()
+            for dividend in self.dividends.order_by('period')
+        } or None
+
+
+class CooperativeDividend(models.Model):
+    membership = models.ForeignKey(
+        CoporativeMembership, on_delete=models.CASCADE, related_name="dividends")
+    period = models.DateField()  # first day of the accrual month
+    date = models.DateField()
+    closing_balance = models.BigIntegerField()
+    dividend = models.BigIntegerField()
+    status = models.BooleanField(default=False)
 
-class CoporativeActivities(models.Model):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["membership", "period"], name="dividend_unique_period"),
+        ]
+        indexes = [
+            models.Index(fields=["period"], name="dividend_period_idx"),
+            models.Index(fields=["membership"], condition=models.Q(status=False),
+                         name="dividend_outstanding_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.membership_id} - {self.period} - {self.dividend} - {self.status}"
+
+    def as_entry(self):
+        return {
+            "date": self.date.strftime('%Y-%m-%d'),
+            "closing_balance": self.closing_balance,
+            "dividend": self.dividend,
+            "status": self.status
+        }
+
+
+class CoporativeActivities(LedgerRecordMixin, models.Model):
     amount = models.IntegerField()
     balance = models.IntegerField()
     user_coop = models.ForeignKey(
@@ -481,11 +619,24 @@ class CoporativeActivities(models.Model):
     def __str__(self):
         return f"{self.amount} by {self.user_coop.user.firstname} on {self.created_at}"
 
+    def ledger_entry(self):
+        return LedgerEntry(
+            user_id=self.user_coop.user_id, source="coporative_activities", source_id=str(self.pk),
+            title=f"Cooporative {self.activity_type.lower()}", amount=self.amount,
+            description=f"{self.activity_type.lower()} of N{self.amount} ",
+            activity_type="CREDIT" if self.activity_type == "WITHDRAWAL" else "DEBIT",
+            created_at=self.created_at)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_coop", "-created_at", "-id"], name="coop_act_user_created_idx"),
+        ]
+
 DATA_AND_AIRTIME_TYPE_CHOICE = [
     ("DATA", "Data purchase"),
     ("AIRTIME", "Airtime purchase")
 ]
-class DataAndAirtimeActivity(models.Model):
+class DataAndAirtimeActivity(LedgerRecordMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,related_name='user_data')
     refrence_code = models.CharField(max_length=50, editable=False)
     amount = models.IntegerField()
@@ -501,6 +652,18 @@ class DataAndAirtimeActivity(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     def __str__(self):
         return f"{self.type} purchase of {self.amount} by {self.user.firstname} {self.user.lastname} on {self.created_at}"
+
+    def ledger_entry(self):
+        return LedgerEntry(
+            user_id=self.user_id, source="data_activities", source_id=str(self.pk),
+            title="DATA PURCHASE", amount=self.amount, description=self.package or "",
+            activity_type="DEBIT", created_at=self.created_at)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="data_act_user_created_idx"),
+            models.Index(fields=["-created_at"], name="data_act_created_idx"),
+        ]
 class SafeHavenAPIDetails(models.Model):
     acc_token = models.TextField(max_length=255)
     client_id = models.CharField(max_length=255)
@@ -509,6 +672,23 @@ class SafeHavenAPIDetails(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+class VirtualAccount(models.Model):
+    """
+    Registry of issued deposit accounts. Inbound transfers are routed by
+    account_number and duplicate BVNs are caught on identity_hash, both
+    through unique indexes instead of scanning Users.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="virtual_account")
+    account_number = models.CharField(max_length=12, unique=True)
+    account_name = models.CharField(max_length=250, blank=True)
+    identity_hash = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.account_number} == {self.user_id}"
+
+
 LOAN_STATUS = [
     ("PENDING", "Loan waiting for admin approval"),
     ("APPROVED", "Loan approved by admin"),
@@ -543,9 +723,17 @@ class Loan(models.Model):
         choices=LOAN_STATUS, default=LOAN_STATUS[0][0], max_length=10)
     date_requested = models.DateTimeField(auto_now_add=True)
     date_approved = models.DateField(blank=True, null=True)
+    due_date = models.DateField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     repayment_details = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "due_date"], name="loan_status_due_idx"),
+            models.Index(fields=["status"], condition=models.Q(is_active=True), name="loan_active_status_idx"),
+            models.Index(fields=["-date_requested"], name="loan_requested_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         # Calculate the balance when the loan is created
         # if self._state.adding:
@@ -555,6 +743,7 @@ class Loan(models.Model):
             self.date_approved = date.today()
             self.populate_repayment_details()
             self.balance = self.amount + self.calculate_total_interest()
+        self.due_date = self.get_due_date()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -566,7 +755,7 @@ class Loan(models.Model):
         return None
 
     def is_overdue(self):
-        due_date = self.get_due_date()
+        due_date = self.due_date or self.get_due_date()
         if due_date and date.today() >= due_date:
             return True
         return False
@@ -607,6 +796,35 @@ class Loan(models.Model):
             total_interest += interest_payment
         return round(total_interest)
 
+class LedgerEntry(models.Model):
+    """
+    Append-only copy of every money movement, one row per source record, so
+    a user's history is a single index range scan.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="ledger_entries")
+    source = models.CharField(max_length=30, choices=LEDGER_SOURCE)
+    source_id = models.CharField(max_length=64)
+    transaction = models.ForeignKey(
+        "transaction.Transaction", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="ledger_entries")
+    title = models.CharField(max_length=250)
+    description = models.CharField(max_length=250, blank=True)
+    activity_type = models.CharField(max_length=10)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "source_id"], name="ledger_unique_source"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="ledger_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.amount} - {self.title} ({self.source}) on {self.created_at}"
+
 # LOAN_ACTIVITIES_CHOICE = [
 #     ("REPAYMENT", "REPAYMENT"),
 
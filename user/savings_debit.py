@@ -0,0 +1,218 @@
+import calendar
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from utils.sharding import in_shard
+from .models import (User,
+                     UserSavings,
+                     SavingsActivities,
+                     SavingsInstallment,
+                     SavingsShortfall,
+                     LedgerEntry)
+from .schedule import next_due
+
+
+def falls_due(today):
+    """Plans whose installment day is today; weekly and monthly plans without one keep their start day."""
+    month_day = Q(day_month=today.day) | Q(day_month__isnull=True, start_date__day=today.day)
+    if today.day == calendar.monthrange(today.year, today.month)[1]:
+        # installments set for the 29th-31st fall on the last day of shorter months
+        month_day |= Q(day_month__gt=today.day) | Q(day_month__isnull=True, start_date__day__gt=today.day)
+    return (Q(frequency='DAILY')
+            | Q(frequency='WEEKLY', day_week=today.strftime('%A'))
+            | Q(frequency='WEEKLY', day_week__isnull=True, start_date__week_day=today.isoweekday() % 7 + 1)
+            | Q(month_day, frequency='MONTHLY'))
+
+
+def due_savings(today, shard=None):
+    return in_shard(UserSavings.objects, shard).filter(
+        falls_due(today),
+        start_date__lte=today,
+        withdrawal_date__gte=today,
+        goal_met=False
+    ).exclude(withdrawal_date__isnull=True)
+
+
+def add_to_plan(saving, amount):
+    """Add a paid installment to the plan's totals; interest is accrued nightly by user.interest."""
+    saving.saved += amount
+    saving.all_time_saved += amount
+
+
+def paid_this_period(savings_ids, today):
+    """Amount already paid per plan in its current period, in one grouped query."""
+    period = (Q(savings__frequency='DAILY', due_at__date=today)
+              | Q(savings__frequency='WEEKLY', due_at__date__range=(today - timedelta(days=6), today))
+              | Q(savings__frequency='MONTHLY', due_at__date__range=(today - timedelta(days=30), today)))
+    rows = SavingsInstallment.objects.filter(
+        period, savings_id__in=savings_ids, paid_status=True
+    ).values('savings_id').annotate(total=Sum('amount')).order_by()
+    return {row['savings_id']: row['total'] for row in rows}
+
+
+def debit_batch(savings_ids, today, wages_point=0, due_by=None):
+    """
+    Debit one batch of plans. Plans and wallets already locked by another
+    worker are skipped and picked up on the next run. Plans the wallet cannot
+    cover are queued as shortfalls for settle_shortfalls. Every plan handled
+    gets its next_due_at moved past today; with due_by, plans whose
+    next_due_at is still later than that are left alone.
+    """
+    now = timezone.now().replace(microsecond=0)
+    with transaction.atomic():
+        # locks each plan together with its owner's wallet row, in wallet id order
+        savings = list(UserSavings.objects.select_related('user').select_for_update(skip_locked=True)
+                       .filter(id__in=savings_ids).order_by('user_id', 'id'))
+        if due_by is not None:
+            # rescheduled, ended or already taken by another worker since it was queued
+            savings = [saving for saving in savings if saving.next_due_at and saving.next_due_at <= due_by]
+        paid = paid_this_period([saving.id for saving in savings], today)
+
+        debited_users = {}
+        debited_savings = []
+        activities = []
+        installments = []
+        shortfalls = []
+        for saving in savings:
+            saving.next_due_at = next_due(saving, today + timedelta(days=1))
+            user = debited_users.get(saving.user_id, saving.user)
+            remaining_amount = saving.amount - paid.get(saving.id, 0)
+            if remaining_amount <= 0:
+                continue
+            if user.wallet_balance < remaining_amount:
+                shortfalls.append(SavingsShortfall(
+                    savings=saving, user_id=saving.user_id, due_date=today, amount=remaining_amount))
+                continue
+
+            user.wallet_balance -= remaining_amount
+            user.wages_point += wages_point
+            debited_users[user.id] = user
+
+            installments.append(SavingsInstallment(
+                savings=saving, due_at=now, paid_at=now, amount=remaining_amount,
+                paid_status=True, balance=saving.saved + remaining_amount))
+            add_to_plan(saving, remaining_amount)
+            saving.updated_at = now
+            debited_savings.append(saving)
+            activities.append(SavingsActivities(
+                savings=saving, amount=remaining_amount, balance=saving.saved,
+                user=user))
+
+        # a rerun of the same day finds the shortfall already queued
+        SavingsShortfall.objects.bulk_create(shortfalls, ignore_conflicts=True)
+        UserSavings.objects.bulk_update(
+            savings, ['saved', 'all_time_saved', 'updated_at', 'next_due_at'])
+        if not debited_savings:
+            return 0
+        User.objects.bulk_update(debited_users.values(), ['wallet_balance', 'wages_point'])
+        SavingsInstallment.objects.bulk_create(
+            installments, update_conflicts=True, unique_fields=['savings', 'due_at'],
+            update_fields=['amount', 'paid_status', 'balance', 'paid_at'])
+        SavingsActivities.objects.bulk_create(activities)
+        LedgerEntry.objects.bulk_create([activity.ledger_entry() for activity in activities])
+    return len(debited_savings)
+
+
+def settle_shortfalls(user_ids, today=None):
+    """
+    Debit these users' pending shortfalls, oldest due date first, while each
+    wallet covers the next one. Runs inside the caller's transaction when
+    there is one, so a deposit and the savings it pays for commit together.
+    Returns the number of shortfalls settled.
+    """
+    today = today or timezone.now().date()
+    now = timezone.now().replace(microsecond=0)
+    with transaction.atomic():
+        users = {user.id: user for user in User.objects.select_for_update()
+                 .filter(id__in=user_ids).order_by('id').only('id', 'wallet_balance')}
+        pending = (SavingsShortfall.objects.select_related('savings').select_for_update(of=('self', 'savings'))
+                   .filter(user_id__in=users, status='PENDING').order_by('user_id', 'due_date', 'id'))
+
+        plans = {}
+        settled = []
+        cancelled = []
+        short_users = set()
+        installments = []
+        activities = []
+        for shortfall in pending:
+            saving = plans.setdefault(shortfall.savings_id, shortfall.savings)
+            if (saving.goal_met or not saving.start_date or not saving.withdrawal_date
+                    or shortfall.due_date < saving.start_date or saving.withdrawal_date < today):
+                # the plan was paid out, cancelled or restarted since
+                cancelled.append(shortfall.id)
+                continue
+            user = users[shortfall.user_id]
+            if shortfall.user_id in short_users or user.wallet_balance < shortfall.amount:
+                # later shortfalls wait until the oldest one is paid
+                short_users.add(shortfall.user_id)
+                continue
+
+            user.wallet_balance -= shortfall.amount
+            installments.append(SavingsInstallment(
+                savings=saving, amount=shortfall.amount, paid_status=True, paid_at=now,
+                balance=saving.saved + shortfall.amount,
+                due_at=timezone.make_aware(datetime.combine(shortfall.due_date, saving.time or datetime.min.time()))))
+            add_to_plan(saving, shortfall.amount)
+            saving.updated_at = now
+            activities.append(SavingsActivities(
+                savings=saving, amount=shortfall.amount, balance=saving.saved,
+                user_id=user.id))
+            shortfall.status = 'SETTLED'
+            shortfall.settled_at = now
+            settled.append(shortfall)
+
+        SavingsShortfall.objects.filter(id__in=cancelled).update(status='CANCELLED')
+        if not settled:
+            return 0
+        paid_plans = {shortfall.savings_id: plans[shortfall.savings_id] for shortfall in settled}
+        User.objects.bulk_update([users[shortfall.user_id] for shortfall in settled], ['wallet_balance'])
+        UserSavings.objects.bulk_update(
+            paid_plans.values(), ['saved', 'all_time_saved', 'updated_at'])
+        SavingsShortfall.objects.bulk_update(settled, ['status', 'settled_at'])
+        SavingsInstallment.objects.bulk_create(
+            installments, update_conflicts=True, unique_fields=['savings', 'due_at'],
+            update_fields=['amount', 'paid_status', 'balance', 'paid_at'])
+        SavingsActivities.objects.bulk_create(activities)
+        LedgerEntry.objects.bulk_create([activity.ledger_entry() for activity in activities])
+    return len(settled)
+
+
+def settle_pending(today=None, batch_size=500, shard=None):
+    """Retry every queued shortfall, for wallets credited by anything other than a deposit."""
+    user_ids = list(in_shard(SavingsShortfall.objects, shard).filter(status='PENDING')
+                    .order_by('user_id').values_list('user_id', flat=True).distinct())
+    return sum(settle_shortfalls(user_ids[i:i + batch_size], today)
+               for i in range(0, len(user_ids), batch_size))
+
+
+def _run_chunks(chunks, today, wages_point):
+    try:
+        return sum(debit_batch(chunk, today, wages_point) for chunk in chunks)
+    finally:
+        connection.close()
+
+
+def run_savings_debit(today=None, batch_size=500, workers=1, wages_point=0, shard=None):
+    """Debit every plan due today and retry queued shortfalls; returns the number of installments paid."""
+    today = today or timezone.now().date()
+    chunks = []
+    chunk, last_user_id = [], None
+    # a user's plans always share a chunk so parallel workers never contend for one wallet
+    for savings_id, user_id in due_savings(today, shard).order_by('user_id', 'id').values_list('id', 'user_id'):
+        if len(chunk) >= batch_size and user_id != last_user_id:
+            chunks.append(chunk)
+            chunk = []
+        chunk.append(savings_id)
+        last_user_id = user_id
+    if chunk:
+        chunks.append(chunk)
+    if workers <= 1:
+        debited = sum(debit_batch(chunk, today, wages_point) for chunk in chunks)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_run_chunks, [chunks[i::workers] for i in range(workers)],
+                               [today] * workers, [wages_point] * workers)
+            debited = sum(results)
+    return debited + settle_pending(today, batch_size, shard)
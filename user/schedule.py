@@ -0,0 +1,142 @@
+import bisect
+import calendar
+import itertools
+from datetime import datetime, timedelta
+from django.utils import timezone
+
+
+def falls_on(saving, day):
+    """Whether the plan has an installment on this date; mirrors savings_debit.falls_due."""
+    if saving.frequency == 'WEEKLY':
+        return day.strftime('%A') == (saving.day_week or saving.start_date.strftime('%A'))
+    if saving.frequency == 'MONTHLY':
+        wanted = saving.day_month or saving.start_date.day
+        return day.day == min(wanted, calendar.monthrange(day.year, day.month)[1])
+    return True
+
+
+def next_due(saving, day):
+    """
+    When the plan's first installment on or after this date is taken, at the
+    plan's chosen time of day, or None once the plan has no more installments.
+    """
+    if saving.goal_met or not saving.start_date or not saving.withdrawal_date:
+        return None
+    day = max(day, saving.start_date)
+    # a monthly plan always has an installment within the next 31 days
+    for _ in range(32):
+        if day > saving.withdrawal_date:
+            return None
+        if falls_on(saving, day):
+            return timezone.make_aware(datetime.combine(day, saving.time or datetime.min.time()))
+        day += timedelta(days=1)
+    return None
+
+
+class Schedule:
+    """
+    A plan's installments worked out arithmetically from its start, frequency,
+    amount and withdrawal date, plus the payments actually made. Nothing is
+    stored per installment: installment n, how many fall by a date and the
+    running balance are computed on demand, balances from prefix sums over
+    the payments. Supports len() and slicing, so it can be paginated.
+    """
+
+    def __init__(self, saving, payments=()):
+        """payments: (paid_at, amount) pairs, in any order."""
+        self.saving = saving
+        self.amount = saving.amount
+        self.at = saving.time or datetime.min.time()
+        self.first = None
+        if saving.start_date and saving.withdrawal_date:
+            self.first = saving.start_date
+            while not falls_on(saving, self.first):
+                self.first += timedelta(days=1)
+            self.month_day = saving.day_month or saving.start_date.day
+        payments = sorted(payments)
+        self.paid_at = [paid_at for paid_at, _ in payments]
+        self.totals = [0] + list(itertools.accumulate(amount for _, amount in payments))
+        self.count = self.installments_through(saving.withdrawal_date)
+
+    @classmethod
+    def for_savings(cls, saving):
+        """Build from the plan's payment rows; uses prefetched installments when present."""
+        return cls(saving, [(row.due_at, row.amount) for row in saving.installments.all() if row.paid_status])
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.entry(n) for n in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return self.entry(index)
+
+    def due_date(self, n):
+        """Date of installment n, counting from 0."""
+        if self.saving.frequency == 'WEEKLY':
+            return self.first + timedelta(weeks=n)
+        if self.saving.frequency == 'MONTHLY':
+            year, month = divmod(self.first.year * 12 + self.first.month - 1 + n, 12)
+            month += 1
+            return self.first.replace(year=year, month=month, day=min(
+                self.month_day, calendar.monthrange(year, month)[1]))
+        return self.first + timedelta(days=n)
+
+    def due_at(self, n):
+        return timezone.make_aware(datetime.combine(self.due_date(n), self.at))
+
+    def installments_through(self, day):
+        if not self.first or day < self.first:
+            return 0
+        if self.saving.frequency == 'WEEKLY':
+            return (day - self.first).days // 7 + 1
+        if self.saving.frequency == 'MONTHLY':
+            months = (day.year - self.first.year) * 12 + day.month - self.first.month
+            return months + (self.due_date(months) <= day)
+        return (day - self.first).days + 1
+
+    def count_through(self, day):
+        """How many installments fall on or before this date."""
+        return min(self.installments_through(day), self.count)
+
+    def expected_by(self, day):
+        """Total the plan should hold by the end of this date."""
+        return self.count_through(day) * self.amount
+
+    def next_due_date(self, day):
+        """Date of the first installment on or after this date, or None when there are no more."""
+        n = self.count_through(day - timedelta(days=1))
+        return self.due_date(n) if n < self.count else None
+
+    def paid_before(self, moment):
+        """Prefix sum of every payment made before this moment."""
+        return self.totals[bisect.bisect_left(self.paid_at, moment)]
+
+    def paid_before_day(self, n):
+        """Prefix sum of every payment made before the date of installment n."""
+        return self.paid_before(timezone.make_aware(datetime.combine(self.due_date(n), datetime.min.time())))
+
+    def entry(self, n):
+        """
+        Installment n. Payments count towards the installment whose period
+        they fall in by date, not time of day, since the nightly debit and
+        manual top-ups are recorded when they happen rather than at the
+        plan's chosen time; early payments count towards the first one.
+        Balance is the total saved by the end of the period.
+        """
+        due_at = self.due_at(n)
+        start = self.paid_before_day(n) if n else 0
+        end = self.paid_before_day(n + 1) if n + 1 < self.count else self.totals[-1]
+        return {
+            "number": n + 1,
+            "date": str(due_at.date()),
+            "due_at": due_at,
+            "amount": self.amount,
+            "paid": end - start,
+            "paid_status": end - start >= self.amount,
+            "balance": end,
+        }
@@ -22,63 +22,28 @@ from transaction.models import Transaction
 #     return bool(pattern.match(date_string))
 class UserActivitiesSerializer(serializers.Serializer):
     title = serializers.CharField(required=False)
-    amount = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
     activity_type = serializers.CharField()
     created_at = serializers.DateTimeField()
     source = serializers.CharField()
 
     def to_representation(self, instance):
-        # Customize the representation of each activity depending on the source model
-        if isinstance(instance, Activities):
-            return {
-                "title": instance.title,
-                "amount": instance.amount,
-                "description": f"{instance.activity_type.lower()} of N{instance.amount} ",
-                "activity_type": instance.activity_type,
-                "created_at": instance.created_at,
-                "source": "activities"
-            }
-        elif isinstance(instance, Transaction):
-            return{
-                "title": instance.type.title(),
-                "amount": instance.amount,
-                "description": instance.description,
-                "activity_type": "CREDIT" if instance.type == "WALLET-CREDIT" else "DEBIT",
-                "created_at": instance.created_at,
-                "destination": instance.source,
-                "reference": f'WF-{str(instance.id).upper()}',
-                "reason": instance.message, 
-                "source": "transactions",
-                "status": instance.status
-            }
-        elif isinstance(instance, SavingsActivities):
-            return {
-                "title": instance.savings.type,
-                "amount": instance.amount,
-                "description": f"{instance.activity_type.lower()} of N{instance.amount} ",
-                "activity_type": "CREDIT" if instance.activity_type == "WITHDRAWAL" else "DEBIT",
-                "created_at": instance.created_at,
-                "source": "savings_activities"
-            }
-        elif isinstance(instance, DataAndAirtimeActivity):
-            return {
-                "title": "DATA PURCHASE",
-                "amount": instance.amount,
-                "description": instance.package,
-                "activity_type": "DEBIT",
-                "created_at": instance.created_at,
-                "source": "data_activities"
-            }
-        elif isinstance(instance, CoporativeActivities):
-            return {
-                "title": f"Cooporative {instance.activity_type.lower()}",
-                "amount": instance.amount,
-                "description": f"{instance.activity_type.lower()} of N{instance.amount} ",
-                "activity_type": "CREDIT" if instance.activity_type == "WITHDRAWAL" else "DEBIT",
-                "created_at": instance.created_at,
-                "source": "coporative_activities"
-            }
-        return super().to_representation(instance)
+        data = {
+            "title": instance.title,
+            "amount": instance.amount,
+            "description": instance.description,
+            "activity_type": instance.activity_type,
+            "created_at": instance.created_at,
+            "source": instance.source
+        }
+        if instance.source == "transactions" and instance.transaction:
+            data.update({
+                "destination": instance.transaction.source,
+                "reference": f'WF-{str(instance.transaction.id).upper()}',
+                "reason": instance.transaction.message,
+                "status": instance.transaction.status
+            })
+        return data
 class UserDividendsSerializer(serializers.ModelSerializer):
     class Meta:
         model = CoporativeMembership
@@ -201,6 +166,15 @@ class NewSavingsSerializer(serializers.ModelSerializer):
 #     class Meta:
 #         model = Activities
 #         fields = ["title", "amount", "activity_type", "created_at"]
+class SavingsScheduleSerializer(serializers.Serializer):
+    number = serializers.IntegerField()
+    date = serializers.DateField()
+    amount = serializers.IntegerField()
+    paid = serializers.IntegerField()
+    paid_status = serializers.BooleanField()
+    balance = serializers.IntegerField()
+
+
 class UserSavingsSerializers(serializers.ModelSerializer):
     activities = serializers.SerializerMethodField()
     class Meta:
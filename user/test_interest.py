@@ -0,0 +1,58 @@
+from unittest import mock
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from user.interest import accrue, accrue_missed, accrue_range
+from user.models import User, UserSavings, SavingsInstallment
+
+RATE = Decimal("0.0001")
+
+
+@mock.patch("user.interest.DAILY_RATE", RATE)
+class SavingsInterestTest(TestCase):
+    def setUp(self):
+        self.today = date.today()
+        self.start = self.today - timedelta(days=4)
+        user = User.objects.create(email="interest@example.com", firstname="Saver")
+        self.saving = UserSavings.objects.create(user=user, amount=1000, frequency="WEEKLY", start_date=self.start,
+                                                 withdrawal_date=self.today + timedelta(days=30))
+        self.pay(1000, self.start)
+
+    def at(self, day):
+        return timezone.make_aware(datetime.combine(day, time(9)))
+
+    def pay(self, amount, paid_on, due_on=None):
+        SavingsInstallment.objects.create(savings=self.saving, amount=amount, paid_status=True,
+                                          due_at=self.at(due_on or paid_on), paid_at=self.at(paid_on))
+        UserSavings.objects.filter(pk=self.saving.pk).update(saved=self.saving.saved + amount)
+        self.saving.refresh_from_db()
+
+    def balances(self):
+        return list(self.saving.interest_accruals.order_by("day").values_list("balance", flat=True))
+
+    def test_recompute_after_back_dated_payment_adjusts_totals(self):
+        for day in range(4):
+            accrue(self.start + timedelta(days=day))
+        self.saving.refresh_from_db()
+        self.assertEqual(self.saving.interest, Decimal("0.4"))
+
+        # a payment that arrived on the second day but was recorded late: only the difference is added
+        self.pay(500, self.start + timedelta(days=1))
+        accrue_range(self.start, self.today)
+        self.saving.refresh_from_db()
+        self.assertEqual(self.saving.interest, Decimal("0.55"))
+        self.assertEqual(self.saving.all_time_interest, self.saving.interest)
+        self.assertEqual(self.balances(), [1000, 1500, 1500, 1500])
+
+    def test_settled_shortfall_earns_from_when_it_was_paid(self):
+        # an installment due on the second day, paid today
+        self.pay(500, self.today, due_on=self.start + timedelta(days=1))
+        accrue_range(self.start, self.today)
+        self.assertEqual(self.balances(), [1000, 1000, 1000, 1000])
+
+    def test_missed_nights_are_caught_up(self):
+        accrue(self.start)
+        self.assertEqual(accrue_missed(), 3)
+        self.assertEqual(self.balances(), [1000, 1000, 1000, 1000])
+        self.assertEqual(accrue_missed(), 0)
@@ -0,0 +1,18 @@
+from datetime import date, datetime, time, timedelta
+from django.test import SimpleTestCase
+from django.utils import timezone
+from user.models import UserSavings
+from user.schedule import Schedule
+
+
+class ScheduleTest(SimpleTestCase):
+    def test_payment_before_the_plan_time_counts_for_that_day(self):
+        start = date(2026, 10, 1)
+        plan = UserSavings(amount=100, frequency="DAILY", start_date=start,
+                           withdrawal_date=start + timedelta(days=3), time=time(18))
+        # the nightly debit runs long before the plan's 18:00 slot
+        payments = [(timezone.make_aware(datetime.combine(start + timedelta(days=day), time(1))), 100)
+                    for day in range(2)]
+        entries = Schedule(plan, payments)[:]
+        self.assertEqual([entry["paid"] for entry in entries], [100, 100, 0, 0])
+        self.assertEqual([entry["balance"] for entry in entries], [100, 200, 200, 200])
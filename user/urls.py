@@ -12,6 +12,7 @@ urlpatterns = [
          name='one_time_subscription'),
     path('set_pin/', SetPin.as_view(), name='set_pin'),
     path('savings/', UserSavingsView.as_view(), name='user_savings'),
+    path('savings_schedule/<int:id>/', SavingsScheduleView.as_view(), name='savings_schedule'),
     path('set_savings/<int:id>', NewSavingsView.as_view(), name='set_pin'),
     path('fund_savings/<int:id>/', FundSavings.as_view(), name='fund_savings'),
     path('cancel_savings/<int:id>/', CancelSavings.as_view(), name='cancel_savings'),
@@ -8,12 +8,12 @@ import random
 from django.utils import timezone
 from datetime import timedelta, date
 from dateutil.relativedelta import relativedelta
-from itertools import chain
 from decimal import Decimal
-from operator import attrgetter
 from notification.models import Notification
 from utils.email import SendMail
-from utils.n3data import DataAPI, DATA_PLANS
+from utils.n3data import AsyncDataAPI, DATA_PLANS
+from utils.async_views import AsyncAPIView
+from asgiref.sync import sync_to_async
 import uuid
 import decimal
 import hashlib
@@ -29,6 +29,7 @@ from .serializers import (
     UserDividendsSerializer,
     DataHistorySerializer,
     UserSavingsSerializers,
+    SavingsScheduleSerializer,
     AmountPinSerializer,
     CoporativeDashboardSerializer,
     WithdrawalSeializer,
@@ -58,7 +59,12 @@ from .models import (Activities,
                      DataAndAirtimeActivity
                      )
 from utils.pagination import CustomPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from .feed import get_activity_page, InvalidCursor
+from .wallet import WalletService, InsufficientFunds
 from django.db import transaction
+from django.db.models import F
 from utils.sms import SendSMS
 from datetime import datetime
 from django.utils.encoding import smart_bytes, smart_str
@@ -72,29 +78,26 @@ class UserActivitiesView(generics.GenericAPIView):
 
     def get(self, request):
         user = request.user
-        activities_qs = Activities.objects.filter(
-            user=user).order_by("-created_at")
-        savings_activities_qs = SavingsActivities.objects.filter(
-            user=user).order_by("-created_at")
-        coporative_activities_qs = CoporativeActivities.objects.filter(
-            user_coop__user=user).order_by("-created_at")
-        data_activities_qs = DataAndAirtimeActivity.objects.filter(
-            user=user).order_by("-created_at")
-        transactions_qs = Transaction.objects.filter(user=user).order_by("-created_at")
-
-        combined_qs = sorted(
-            chain(activities_qs, savings_activities_qs,
-                  coporative_activities_qs, transactions_qs, data_activities_qs),
-            key=attrgetter('created_at'),
-            reverse=True
-        )
-        page = self.paginate_queryset(combined_qs)
-        if page is not None:
-            serializer = self.serializer_class(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.serializer_class(combined_qs, many=True)
-        return Response(serializer.data, status=200)
+        paginator = self.pagination_class()
+        limit = paginator.get_page_size(request) or api_settings.PAGE_SIZE
+        cursor = request.query_params.get("cursor")
+        try:
+            page, next_cursor = get_activity_page(user, limit, cursor)
+        except InvalidCursor as e:
+            return Response(data={"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        next_link = None
+        if next_cursor:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), "cursor", next_cursor)
+        serializer = self.serializer_class(page, many=True)
+        return Response({
+            'links': {
+                'next': next_link,
+                'previous': None
+            },
+            'limit': limit,
+            'results': serializer.data
+        }, status=200)
 
 
 class UserDashboard(generics.GenericAPIView):
@@ -133,13 +136,13 @@ class OneTimeSubscription(generics.GenericAPIView):
             return Response({"message": "You are already subscribed"}, status=status.HTTP_400_BAD_REQUEST)
         if serializer.validated_data["pin"] != user.pin:
             return Response({"message": "Invalid pin"}, status=status.HTTP_401_UNAUTHORIZED)
-        if user.wallet_balance < 5000:
-            return Response({"message": "Insufficient fund"}, status=status.HTTP_400_BAD_REQUEST)
 
         with transaction.atomic():
+            try:
+                WalletService.debit(user, 5000, points=5)
+            except InsufficientFunds:
+                return Response({"message": "Insufficient fund"}, status=status.HTTP_400_BAD_REQUEST)
             user.is_subscribed = True
-            user.wallet_balance -= 5000
-            user.wages_point += 5
             mem_id = 'WF-' + ''.join(random.sample('0123456789', 9))
             new_coop = CoporativeMembership.objects.create(
                 user=user, membership_id=mem_id)
@@ -149,17 +152,17 @@ class OneTimeSubscription(generics.GenericAPIView):
             new_activity.save()
             referal = user.referal
             if referal:
-                referal.referal_balance += 2000
-                referal.total_referal_balance += 2000
-                referal.wages_point += 5
+                User.objects.filter(pk=referal.pk).update(
+                    referal_balance=F('referal_balance') + 2000,
+                    total_referal_balance=F('total_referal_balance') + 2000,
+                    wages_point=F('wages_point') + 5)
                 ref_notification = Notification.objects.create(
                     user=referal,
                     title="Referal bonus",
                     text=f"N2000 Referal bonus for referring {user.firstname} {user.lastname}"
                 )
                 ref_notification.save()
-                referal.save()
-            user.save()
+            user.save(update_fields=["is_subscribed"])
             data = {
                 "balance": float(user.wallet_balance),
                 "is_subscribed": user.is_subscribed,
@@ -183,7 +186,7 @@ class SetPin(generics.GenericAPIView):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         user.pin = serializer.validated_data["pin"]
-        user.save()
+        user.save(update_fields=["pin"])
         return Response(data={"message": "success"}, status=status.HTTP_201_CREATED)
 
 
@@ -197,7 +200,7 @@ class UpdateDPView(generics.GenericAPIView):
         serialzer.is_valid(raise_exception=True)
         with transaction.atomic():
             user.profile_picture = serialzer.validated_data["image"]
-            user.save()
+            user.save(update_fields=["profile_picture"])
             return Response(status=status.HTTP_200_OK)
 
 
@@ -266,10 +269,38 @@ class UserSavingsView(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         queryset = UserSavings.objects.filter(
-            user=user, withdrawal_date__isnull=False).order_by("-created_at")
+            user=user, withdrawal_date__isnull=False).prefetch_related("installments").order_by("-created_at")
         return queryset
 
 
+
+class SavingsScheduleView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = SavingsScheduleSerializer
+    pagination_class = CustomPagination
+
+    def get(self, request, id):
+        option_types = {1: "BIRTHDAY", 2: "CHILDREN", 3: "VACATION", 4: "RETIREMENT", 5: "MISCELLANEOUS"}
+        if id not in option_types:
+            return Response(data={"message": "invalid option"}, status=status.HTTP_400_BAD_REQUEST)
+        savings = UserSavings.objects.filter(
+            user=request.user, type=option_types[id], withdrawal_date__isnull=False).first()
+        if not savings:
+            return Response(data={"message": "You don't have a savings of this type"}, status=status.HTTP_404_NOT_FOUND)
+        # only the requested page of installments is worked out
+        schedule = savings.schedule()
+        page = self.paginate_queryset(schedule)
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        today = timezone.localdate()
+        response.data["summary"] = {
+            "installments": len(schedule),
+            "next_due_date": schedule.next_due_date(today),
+            "expected_to_date": schedule.expected_by(today),
+            "saved": savings.saved,
+            "target_amount": savings.target_amount,
+        }
+        return response
+
 class FundCoporative(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = AmountPinSerializer
@@ -288,11 +319,10 @@ class FundCoporative(generics.GenericAPIView):
             #     return Response(data={"message": "Amount must be a minimum of N100"}, status=status.HTTP_403_FORBIDDEN)
             if user.pin != pin:
                 return Response(data={"message": "invalid pin"}, status=status.HTTP_403_FORBIDDEN)
-            if user.wallet_balance < amount:
+            try:
+                WalletService.debit(user, amount, points=5)
+            except InsufficientFunds:
                 return Response(data={"message": "Insufficent amount in wallet"}, status=status.HTTP_403_FORBIDDEN)
-            user.wallet_balance -= amount
-            user.wages_point += 5
-            user.save()
             coop.balance += amount
             current_date = date.today()
             last_day_of_year = date(current_date.year, 12, 31)
@@ -334,19 +364,13 @@ class FundSavings(generics.GenericAPIView):
                 return Response(data={"message": "Amount must be a minimum of N100"}, status=status.HTTP_403_FORBIDDEN)
             if user.pin != pin:
                 return Response(data={"message": "invalid pin"}, status=status.HTTP_403_FORBIDDEN)
-            if user.wallet_balance < amount:
+            try:
+                WalletService.debit(user, amount, points=5)
+            except InsufficientFunds:
                 return Response(data={"message": "Insufficent amount in wallet"}, status=status.HTTP_403_FORBIDDEN)
-            user.wallet_balance -= amount
-            user.wages_point += 5
-            user.save()
             savings.mark_payment_as_made(timezone.now(), int(amount))
-            savings.save()
-            ttday = datetime.now().date()
-            days_to_withdrawal = (savings.withdrawal_date - ttday).days
-            interest = days_to_withdrawal * 0.00041096 * amount
             new_savings_activity = SavingsActivities.objects.create(savings=savings, amount=amount,
-                                                                    balance = savings.saved, interest=interest,
-                                                                    user=user)
+                                                                    balance = savings.saved, user=user)
             new_savings_activity.save()
             return Response(data={"message": "success"}, status=status.HTTP_202_ACCEPTED)
 
@@ -378,7 +402,7 @@ class CancelSavings(generics.GenericAPIView):
         refund = savings.saved - penalty
         amt = savings.saved
         with transaction.atomic():
-            user.wallet_balance += Decimal(refund)
+            WalletService.credit(user, Decimal(refund))
             savings.amount = 0
             savings.saved = 0
             savings.withdrawal_date = None
@@ -386,16 +410,17 @@ class CancelSavings(generics.GenericAPIView):
             savings.target_amount = None
             savings.cancel_date = date.today()
             savings.goal_met = False
-            savings.payment_details = None
             savings.interest = 0
             savings.is_active=False
             savings.time = None
             savings.day_week = None
             savings.day_month = None
+            savings.next_due_at = None
             Activities.objects.create(title="Savings Canceled", amount=refund, user=user, activity_type="CREDIT")
             SavingsCancel.objects.create(savings=savings,penalty=penalty, amount=amt)
             savings.save()
-            user.save()
+            savings.installments.all().delete()
+            savings.shortfalls.filter(status="PENDING").update(status="CANCELLED")
         return Response(data={"message": "success"}, status=status.HTTP_200_OK)
         
         
@@ -417,7 +442,7 @@ class CancelInvestment(generics.GenericAPIView):
         penalty = investment_plan.amount * 0.02
         refund = investment_plan.amount - penalty
         with transaction.atomic():
-            user.wallet_balance += Decimal(refund)
+            WalletService.credit(user, Decimal(refund))
             Activities.objects.create(title="Investment withdrawal", amount=refund, user=user, activity_type="CREDIT")
             investment_plan.status = "WITHDRAWN"
             investment_plan.amount = refund
@@ -426,7 +451,6 @@ class CancelInvestment(generics.GenericAPIView):
             investment.save()
             investment_plan.save()
             InvestmentCancel.objects.create(investment=investment_plan, penalty = penalty)
-            user.save()
         return Response(data={"message": "success"}, status=status.HTTP_200_OK)
 
 class WithdrawInvestment(generics.GenericAPIView):
@@ -446,7 +470,7 @@ class WithdrawInvestment(generics.GenericAPIView):
             return Response(data={"message": "invalid pin"}, status=status.HTTP_403_FORBIDDEN)
         refund = investment_plan.amount + investment_plan.interest
         with transaction.atomic():
-            user.wallet_balance += Decimal(refund)
+            WalletService.credit(user, Decimal(refund))
             Activities.objects.create(title="Investment withdrawal", amount=refund, user=user, activity_type="CREDIT")
             investment_plan.status = "WITHDRAWN"
             # investment = investment_plan.investment
@@ -454,7 +478,6 @@ class WithdrawInvestment(generics.GenericAPIView):
             # investment.quota += investment_plan.shares
             # investment.save()
             investment_plan.save()
-            user.save()
         return Response(data={"message": "success"}, status=status.HTTP_200_OK)
          
 
@@ -477,14 +500,16 @@ class WithdrawalView(generics.GenericAPIView):
         bank_code = serializer.validated_data["bank_code"]
         if user.pin != pin:
             return Response(data={"message": "invalid pin"}, status=status.HTTP_401_UNAUTHORIZED)
-        if user.wallet_balance < amount:
-            return Response(data={"message": "Insufficient Fund"}, status=status.HTTP_400_BAD_REQUEST)
         serializer.validated_data.pop("pin", None)
         matching_bank = list(filter(lambda bank: bank["bankCode"] == bank_code, BANK_LISTS))
         if not matching_bank:
             return Response(data={"message": "invalid bank code"}, status=status.HTTP_400_BAD_REQUEST)
         matching_bank = matching_bank[0]
         with transaction.atomic():
+            try:
+                WalletService.debit(user, amount)
+            except InsufficientFunds:
+                return Response(data={"message": "Insufficient Fund"}, status=status.HTTP_400_BAD_REQUEST)
             new_transaction = Transaction.objects.create(
                 user = user,
                 amount = amount,
@@ -494,9 +519,6 @@ class WithdrawalView(generics.GenericAPIView):
             )
             new_transaction.save()
             serializer.save(user=user, bank_name=matching_bank["name"], transaction=new_transaction)
-             
-            user.wallet_balance -= amount
-            user.save()
             # new_activity = Activities.objects.create(
             #     title="Fund withdrawal",
             #     amount=amount,
@@ -555,16 +577,12 @@ class LoanRequestView(generics.GenericAPIView):
             data["amount"] = amount
             data["duration"] = loan_obj.duration_in_months
             data["user_name"] = f"{user.firstname} {user.lastname}"
-            data["guarantor_name"] = f"{g1.firstname} {g1.lastname}"
-            data["email"] = g1.email
-            data["accept_link"]= accept_link1
-            data["reject_link"]= reject_link1
-            SendMail.send_loan_notification_email(data)
-            data["guarantor_name"] = f"{g2.firstname} {g2.lastname}"
-            data["email"] = g2.email
-            data["accept_link"]= accept_link2
-            data["reject_link"]= reject_link2
-            SendMail.send_loan_notification_email(data)
+            SendMail.send_loan_notification_emails([
+                {**data, "guarantor_name": f"{g1.firstname} {g1.lastname}", "email": g1.email,
+                 "accept_link": accept_link1, "reject_link": reject_link1},
+                {**data, "guarantor_name": f"{g2.firstname} {g2.lastname}", "email": g2.email,
+                 "accept_link": accept_link2, "reject_link": reject_link2},
+            ])
             return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -587,15 +605,19 @@ class WithdrawReferalBonus(views.APIView):
         if user.referal_balance <= 0:
             return Response(data={"message": "No fund in referal balance"}, status=status.HTTP_400_BAD_REQUEST)
         with transaction.atomic():
+            # lock the bonus so two requests cannot both move it into the wallet
+            amount = User.objects.select_for_update().values_list('referal_balance', flat=True).get(pk=user.pk)
+            if amount <= 0:
+                return Response(data={"message": "No fund in referal balance"}, status=status.HTTP_400_BAD_REQUEST)
             new_activity = Activities.objects.create(
                 user=user,
                 title="Referal bonus withdrawal",
                 activity_type="CREDIT",
-                amount=user.referal_balance)
+                amount=amount)
             new_activity.save()
-            user.wallet_balance += user.referal_balance
+            User.objects.filter(pk=user.pk).update(referal_balance=0)
             user.referal_balance = 0
-            user.save()
+            WalletService.credit(user, amount)
             return Response(data={"message": "success"}, status=status.HTTP_200_OK)
 
 
@@ -624,8 +646,6 @@ class UserInvest(generics.GenericAPIView):
         if unit > investment.quota:
             return Response(data={"message": "Unit more than available quota"}, status=status.HTTP_400_BAD_REQUEST)
         amount = unit * investment.unit_share
-        if user.wallet_balance < amount:
-            return Response(data={"message": "insufficient fund"}, status=status.HTTP_400_BAD_REQUEST)
         if not user.is_subscribed:
             return Response(data={"message": "Subscribe to coporative before investing"}, status=status.HTTP_400_BAD_REQUEST)
         user_coporative_balance = CoporativeMembership.objects.get(
@@ -633,11 +653,12 @@ class UserInvest(generics.GenericAPIView):
         if (amount * 0.2) > user_coporative_balance:
             return Response(data={"message": "You must have more than 20 percent of the amount in your coporative balance"}, status=status.HTTP_400_BAD_REQUEST)
         with transaction.atomic():
+            try:
+                WalletService.debit(user, amount, points=5)
+            except InsufficientFunds:
+                return Response(data={"message": "insufficient fund"}, status=status.HTTP_400_BAD_REQUEST)
             if not incr:
                 investment.investors += 1
-            user.wallet_balance -= amount
-            user.wages_point += 5
-            user.save()
             due_date = date.today() + relativedelta(months=investment.duration)
             new_user_investment = UserInvestments.objects.create(
                 investment=investment,
@@ -741,7 +762,7 @@ class ChangePinView(generics.GenericAPIView):
             return Response(data={"message": "invalid pin"})
         new_pin = serializer.validated_data["new_pin"]
         user.pin = new_pin
-        user.save()
+        user.save(update_fields=["pin"])
         return Response(data={"message": "success"}, status=status.HTTP_200_OK)
 
 
@@ -836,14 +857,12 @@ class UserRepayLoan(generics.GenericAPIView):
 
         total_amount = sum(amounts_to_repay)
 
-        # Check if the user has sufficient funds
-        if user.wallet_balance < total_amount:
-            return Response({"message": "Insufficient funds"}, status=status.HTTP_400_BAD_REQUEST)
-
         # Process the repayment
         with transaction.atomic():
-            user.wallet_balance -= total_amount
-            user.wages_point += 5
+            try:
+                WalletService.debit(user, total_amount, points=5)
+            except InsufficientFunds:
+                return Response({"message": "Insufficient funds"}, status=status.HTTP_400_BAD_REQUEST)
             
             for index in repayment_indices:
                 key = keys[index - 1]  # -1 for zero-based index
@@ -866,7 +885,6 @@ class UserRepayLoan(generics.GenericAPIView):
             
             # Save changes
             loan.save()
-            user.save()
 
         return Response(data={"message": "Success"}, status=status.HTTP_200_OK)
 
@@ -911,12 +929,13 @@ class LiquidateLoan(generics.GenericAPIView):
         total_amount_due = sum(
             repayment['amount'] for repayment in repayment_details.values() if not repayment['paid_status']
         )
-        # Check if the user has sufficient funds
-        if user.wallet_balance < total_amount_due:
-            return Response({"message": "Insufficient funds"}, status=status.HTTP_400_BAD_REQUEST)
-
         # Mark all repayments as paid
         with transaction.atomic():
+            # Deduct the total amount from the user's wallet balance
+            try:
+                WalletService.debit(user, total_amount_due, points=5)
+            except InsufficientFunds:
+                return Response({"message": "Insufficient funds"}, status=status.HTTP_400_BAD_REQUEST)
             for repayment in repayment_details.values():
                 repayment['paid_status'] = True
             loan.repayment_details = repayment_details
@@ -924,33 +943,30 @@ class LiquidateLoan(generics.GenericAPIView):
             loan.status = "REPAYED"
             loan.amount_repayed += total_amount_due
             loan.balance = 0
-            # Deduct the total amount from the user's wallet balance
-            user.wallet_balance -= total_amount_due
-            user.wages_point += 5
             # Log the activity
             Activities.objects.create(title="Loan liquidation", amount=total_amount_due, user=user)
 
             # Save changes
             loan.save()
-            user.save()
 
         return Response(data={"message": "All repayments marked as paid"}, status=status.HTTP_200_OK)
 
-class BuyAirtime(generics.GenericAPIView):
-    permission_classes = [permissions.IsAuthenticated]
+class BuyAirtime(AsyncAPIView):
     serializer_class =  BuyAirtimeSerializer
-    def post(self, request):
+    async def post(self, request):
         user = request.user
-        serializer = self.serializer_class(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        pin = serializer.validated_data["pin"]
-        amount = serializer.validated_data["amount"]
-        phone = serializer.validated_data["phone"]
-        network = serializer.validated_data["network"].upper()
+        validated_data = self.validated_data(request)
+        pin = validated_data["pin"]
+        amount = validated_data["amount"]
+        phone = validated_data["phone"]
+        network = validated_data["network"].upper()
         if pin != user.pin:
-            return Response({"message": "Invalid pin"}, status=status.HTTP_401_UNAUTHORIZED)
-        if user.wallet_balance < amount:
-            return Response({"message": "Insufficient fund"}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponse({"message": "Invalid pin"}, status=status.HTTP_401_UNAUTHORIZED)
+        # hold the funds before calling the provider; they go back if the purchase fails
+        try:
+            await sync_to_async(WalletService.debit)(user, amount)
+        except InsufficientFunds:
+            return JsonResponse({"message": "Insufficient fund"}, status=status.HTTP_400_BAD_REQUEST)
         reference_number = hashlib.sha256(str(uuid.uuid4()).encode()).hexdigest()[:12]
         reference_code = f"AIRTIME_{reference_number}"
         data = {
@@ -959,41 +975,40 @@ class BuyAirtime(generics.GenericAPIView):
             "reference": reference_code,
             "network": network
         }
-        buy_status, buy_response = DataAPI.buy_airtime(data)
+        buy_status, buy_response = await AsyncDataAPI.buy_airtime(data)
         if not buy_status:
-            return Response(data={"message": buy_response}, status= status.HTTP_400_BAD_REQUEST)
-        with transaction.atomic():
-            user.wallet_balance -= amount
-            user.save()
-            DataAndAirtimeActivity.objects.create(
-                user=user,
-                amount=amount,
-                balance=user.wallet_balance,
-                network=network,
-                number=phone,
-                type="AIRTIME",
-                refrence_code=reference_code,
-                package= f'{network}-N{amount}-AIRTIME'
-                )
-            return Response(data={"message": "success"}, status=status.HTTP_200_OK)
-class BuyData(generics.GenericAPIView):
-    permission_classes = [permissions.IsAuthenticated]
+            await sync_to_async(WalletService.credit)(user, amount)
+            return JsonResponse(data={"message": buy_response}, status= status.HTTP_400_BAD_REQUEST)
+        await sync_to_async(DataAndAirtimeActivity.objects.create)(
+            user=user,
+            amount=amount,
+            balance=user.wallet_balance,
+            network=network,
+            number=phone,
+            type="AIRTIME",
+            refrence_code=reference_code,
+            package= f'{network}-N{amount}-AIRTIME'
+            )
+        return JsonResponse(data={"message": "success"}, status=status.HTTP_200_OK)
+class BuyData(AsyncAPIView):
     serializer_class =  BuyDataSerializer
-    def post(self, request):
+    async def post(self, request):
         user = request.user
-        serializer = self.serializer_class(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        pin = serializer.validated_data["pin"]
-        plan_id = str(serializer.validated_data["plan"])
-        phone = serializer.validated_data["phone"]
+        validated_data = self.validated_data(request)
+        pin = validated_data["pin"]
+        plan_id = str(validated_data["plan"])
+        phone = validated_data["phone"]
         if pin != user.pin:
-            return Response({"message": "Invalid pin"}, status=status.HTTP_401_UNAUTHORIZED)
+            return JsonResponse({"message": "Invalid pin"}, status=status.HTTP_401_UNAUTHORIZED)
         selected_plan = next((plan for plan in DATA_PLANS if plan["plan_id"] == plan_id), None)
         if not selected_plan:
-            return Response({"message": "Invalid data plan selected"}, status=status.HTTP_401_UNAUTHORIZED)
+            return JsonResponse({"message": "Invalid data plan selected"}, status=status.HTTP_401_UNAUTHORIZED)
         amount = decimal.Decimal(selected_plan["amount"])
-        if decimal.Decimal(user.wallet_balance) < amount:
-            return Response({"message": "Insufficient fund"}, status=status.HTTP_400_BAD_REQUEST)
+        # hold the funds before calling the provider; they go back if the purchase fails
+        try:
+            await sync_to_async(WalletService.debit)(user, amount)
+        except InsufficientFunds:
+            return JsonResponse({"message": "Insufficient fund"}, status=status.HTTP_400_BAD_REQUEST)
         reference_number = hashlib.sha256(str(uuid.uuid4()).encode()).hexdigest()[:12]
         reference_code = f"Data_{reference_number}"
         data = {
@@ -1001,22 +1016,20 @@ class BuyData(generics.GenericAPIView):
             "number": phone,
             "reference": reference_code
         }
-        buy_status, buy_response = DataAPI.buy_data(data)
+        buy_status, buy_response = await AsyncDataAPI.buy_data(data)
         if not buy_status:
-            return Response(data={"message": buy_response}, status= status.HTTP_400_BAD_REQUEST)
-        with transaction.atomic():
-            user.wallet_balance -= amount
-            user.save()
-            DataAndAirtimeActivity.objects.create(
-                user=user,
-                amount=amount,
-                balance=user.wallet_balance,
-                network=selected_plan["network"],
-                number=phone,
-                refrence_code=reference_code,
-                package= f'{selected_plan["network"]}-{selected_plan["plan_name"]}-N{amount}-{selected_plan["plan_day"]}'
-                )
-            return Response(data={"message": "success"}, status=status.HTTP_200_OK)
+            await sync_to_async(WalletService.credit)(user, amount)
+            return JsonResponse(data={"message": buy_response}, status= status.HTTP_400_BAD_REQUEST)
+        await sync_to_async(DataAndAirtimeActivity.objects.create)(
+            user=user,
+            amount=amount,
+            balance=user.wallet_balance,
+            network=selected_plan["network"],
+            number=phone,
+            refrence_code=reference_code,
+            package= f'{selected_plan["network"]}-{selected_plan["plan_name"]}-N{amount}-{selected_plan["plan_day"]}'
+            )
+        return JsonResponse(data={"message": "success"}, status=status.HTTP_200_OK)
 
 
 class GuarantorResponse(views.APIView):
@@ -0,0 +1,60 @@
+from decimal import Decimal
+from django.db import connection
+from .models import User
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+class WalletService:
+    """
+    Moves money in and out of User.wallet_balance with one conditional UPDATE
+    that only touches the balance (and wages_point when points are awarded),
+    so concurrent requests and the crons never overwrite each other's writes.
+    Never follow these calls with a plain user.save(): it would write the
+    whole row back.
+    """
+
+    @staticmethod
+    def _apply(user, delta, points, minimum):
+        sql = f"""
+            UPDATE {connection.ops.quote_name(User._meta.db_table)}
+            SET wallet_balance = wallet_balance + %s, wages_point = wages_point + %s
+            WHERE id = %s
+        """
+        params = [delta, points, user.pk]
+        if minimum is not None:
+            sql += " AND wallet_balance >= %s"
+            params.append(minimum)
+        sql += " RETURNING wallet_balance, wages_point"
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        # keep the caller's instance in step for balances it reports back
+        user.wallet_balance, user.wages_point = row
+        return row[0]
+
+    @classmethod
+    def debit(cls, user, amount, points=0):
+        """Take amount from the wallet and return the new balance, or raise InsufficientFunds."""
+        amount = Decimal(amount)
+        if amount < 0:
+            raise ValueError("amount must not be negative")
+        balance = cls._apply(user, -amount, points, amount)
+        if balance is None:
+            raise InsufficientFunds
+        return balance
+
+    @classmethod
+    def credit(cls, user, amount, points=0):
+        """Add amount to the wallet and return the new balance."""
+        amount = Decimal(amount)
+        if amount < 0:
+            raise ValueError("amount must not be negative")
+        balance = cls._apply(user, amount, points, None)
+        if balance is None:
+            raise User.DoesNotExist
+        return balance
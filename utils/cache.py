@@ -0,0 +1,101 @@
+import functools
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+
+
+def _version_key(name):
+    return f"dashboard:{name}:version"
+
+
+def _version(name):
+    version = cache.get(_version_key(name))
+    if version is None:
+        cache.add(_version_key(name), 1, timeout=None)
+        version = cache.get(_version_key(name), 1)
+    return version
+
+
+def invalidate_dashboards(*names):
+    """Bump the version of the named dashboards (all of them when none given)."""
+    for name in names or DASHBOARD_MODELS.keys():
+        try:
+            cache.incr(_version_key(name))
+        except ValueError:
+            cache.add(_version_key(name), 1, timeout=None)
+
+
+def cached_response(name, timeout=None):
+    """
+    Cache a successful GET response per dashboard and query string. One
+    request rebuilds an expired entry while the others wait for it.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            params = sorted(request.query_params.lists())
+            digest = hashlib.md5(repr((args, kwargs, params)).encode()).hexdigest()
+            key = f"dashboard:{name}:{_version(name)}:{digest}"
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            lock = f"{key}:lock"
+            owns_lock = cache.add(lock, 1, timeout=LOCK_TIMEOUT)
+            if not owns_lock:
+                deadline = time.monotonic() + LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(0.1)
+                    data = cache.get(key)
+                    if data is not None:
+                        return Response(data)
+            try:
+                response = view_method(view, request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response.data, timeout or settings.DASHBOARD_CACHE_TIMEOUT)
+                return response
+            finally:
+                if owns_lock:
+                    cache.delete(lock)
+        return wrapper
+    return decorator
+
+
+# dashboard name -> "app_label.Model" it reads; a write to any of them drops its cached responses
+DASHBOARD_MODELS = {
+    "overview": ["transaction.Transaction", "user.Withdrawal", "user.SavingsActivities", "user.User",
+                 "user.CoporativeMembership", "user.Loan", "user.Activities"],
+    "savings_stats": ["user.UserSavings", "user.SavingsCancel"],
+    "investment_stats": ["user.UserInvestments", "user.InvestmentPlan", "user.InvestmentCancel"],
+    "loan_dashboard": ["user.Loan"],
+    "coporative_stats": ["user.CoporativeMembership", "user.CooperativeDividend"],
+}
+
+
+def connect_invalidation_signals():
+    from django.apps import apps
+    from django.db.models.signals import post_save, post_delete
+
+    dashboards_by_model = {}
+    for name, labels in DASHBOARD_MODELS.items():
+        for label in labels:
+            dashboards_by_model.setdefault(apps.get_model(label), []).append(name)
+
+    for model, names in dashboards_by_model.items():
+        def handler(sender, names=tuple(names), update_fields=None, **kwargs):
+            # logins only touch last_login, which no dashboard reads
+            if update_fields and set(update_fields) <= {"last_login"}:
+                return
+            # after commit, so a concurrent request cannot re-cache the old figures
+            transaction.on_commit(functools.partial(invalidate_dashboards, *names))
+        post_save.connect(handler, sender=model, weak=False,
+                          dispatch_uid=f"dashboard-cache-{model._meta.label}")
+        post_delete.connect(handler, sender=model, weak=False,
+                            dispatch_uid=f"dashboard-cache-delete-{model._meta.label}")
@@ -1,22 +1,68 @@
-from django.core.mail import EmailMessage, EmailMultiAlternatives
+import functools
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
 from django.conf import settings
-from django.template.loader import render_to_string
+from django.template.loader import get_template
 from decouple import config
+from notification.outbox import enqueue, enqueue_many
 import os
 
 
+@functools.lru_cache(maxsize=None)
+def template(name):
+    """Load and compile a template once per process."""
+    return get_template(name)
+
+
+def email_payload(data, html=None):
+    return {"subject": data["subject"], "body": data["body"], "user": data["user"], "html": bool(html)}
+
+
 class SendMail:
 
     @staticmethod
     def send_email(data, html=None):
-        send_email = EmailMessage(
+        # sent by run_outbox_worker once the caller's transaction commits
+        enqueue("EMAIL", email_payload(data, html))
+
+    @staticmethod
+    def send_bulk(messages, html=None):
+        """Queue many emails in one insert; the worker sends them over one SMTP session."""
+        enqueue_many("EMAIL", [email_payload(data, html) for data in messages])
+
+    @staticmethod
+    def build(data):
+        message = EmailMessage(
             subject=data["subject"], body=data["body"], from_email=settings.EMAIL_FROM_USER, to=[data["user"]])
-        if html:
-            send_email.content_subtype = 'html'
+        if data.get("html"):
+            message.content_subtype = 'html'
+        return message
+
+    @staticmethod
+    def deliver(data):
+        SendMail.deliver_many([data])[0].raise_if_failed()
+
+    @staticmethod
+    def deliver_many(messages, connection=None):
+        """
+        Send every message through one SMTP connection and return a
+        DeliveryResult per message, so one bad address does not fail the rest.
+        """
+        connection = connection or get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            return [DeliveryResult(e) for _ in messages]
+        results = []
         try:
-            send_email.send()
-        except BaseException:
-            pass
+            for data in messages:
+                try:
+                    sent = connection.send_messages([SendMail.build(data)])
+                    results.append(DeliveryResult(None if sent else "backend accepted no message"))
+                except Exception as e:
+                    results.append(DeliveryResult(e))
+        finally:
+            connection.close()
+        return results
 
     @staticmethod
     def send_invite_mail(info):
@@ -31,25 +77,29 @@ class SendMail:
         SendMail.send_email(data)
 
     @staticmethod
-    def send_loan_notification_email(info):
-        frontend_url = config("FRONTEND_URL")
-        html_content = render_to_string('mail.html', {
+    def loan_notification(info):
+        html_content = template('mail.html').render({
             "guarantor_name":info["guarantor_name"],
             "user_name":info["user_name"],
             "amount": info["amount"],
-            "frontend_url":frontend_url,
+            "frontend_url":config("FRONTEND_URL"),
             "accept_link":info["accept_link"],
             "reject_link":info["reject_link"],
             "duration":info["duration"]
             })
-        data = {
+        return {
             "subject": "Guarantor Notification",
             "body": html_content,
             "user": info["email"]
         }
-        SendMail.send_email(data, html=True)
 
-        # SendMail.send_email(data, html=True)
+    @staticmethod
+    def send_loan_notification_email(info):
+        SendMail.send_email(SendMail.loan_notification(info), html=True)
+
+    @staticmethod
+    def send_loan_notification_emails(infos):
+        SendMail.send_bulk([SendMail.loan_notification(info) for info in infos], html=True)
 
     @staticmethod
     def send_email_verification_mail(info):
@@ -69,3 +119,17 @@ class SendMail:
         data["subject"] = "Reset password email"
         SendMail.send_email(data)
 
+
+class DeliveryResult:
+    def __init__(self, error=None):
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def raise_if_failed(self):
+        if isinstance(self.error, Exception):
+            raise self.error
+        if self.error:
+            raise RuntimeError(self.error)
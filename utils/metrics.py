@@ -0,0 +1,261 @@
+import contextlib
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from decouple import config
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+# request latency histogram upper bounds, in seconds
+BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FLUSH_INTERVAL = config("METRICS_FLUSH_INTERVAL", default=10, cast=float)
+INDEX_KEY = "metrics:index"
+# times are kept as integer microseconds so every counter can use cache.incr
+MICROS = 1_000_000
+
+_current = contextvars.ContextVar("metrics_request", default=None)
+
+
+class Registry:
+    """
+    Counters accumulated in process memory and added to the shared cache
+    every FLUSH_INTERVAL seconds by a background thread, so requests never
+    wait on the cache and every worker process and cron run lands in the
+    same totals.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.known = set()
+        self.pid = None
+
+    def add(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.check_process()
+            self.pending[key] = self.pending.get(key, 0) + int(value)
+
+    def check_process(self):
+        """Called under the lock: (re)start the flusher in a new or forked process."""
+        if self.pid == os.getpid():
+            return
+        # a forked child must not report what its parent collected, and does not inherit its thread
+        self.pending, self.known, self.pid = {}, set(), os.getpid()
+        threading.Thread(target=self.run_flusher, name="metrics-flush", daemon=True).start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                # an unreachable cache loses this interval's counts, not the thread
+                pass
+
+    def flush(self):
+        with self.lock:
+            self.check_process()
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        keys = {cache_key(key): key for key in pending}
+        for cached, key in keys.items():
+            try:
+                cache.incr(cached, pending[key])
+            except ValueError:
+                if not cache.add(cached, pending[key], timeout=None):
+                    cache.incr(cached, pending[key])
+        if not keys.keys() <= self.known:
+            # read-modify-write; a name lost to a concurrent writer is added back on a later flush
+            index = cache.get(INDEX_KEY) or {}
+            index.update(keys)
+            cache.set(INDEX_KEY, index, timeout=None)
+            self.known |= keys.keys()
+
+    def snapshot(self):
+        self.flush()
+        index = cache.get(INDEX_KEY) or {}
+        values = cache.get_many(list(index))
+        return {index[cached]: value for cached, value in values.items()}
+
+
+registry = Registry()
+
+
+def cache_key(key):
+    return "metrics:" + hashlib.md5(repr(key).encode()).hexdigest()
+
+
+def observe_request(labels, seconds, queries, db_seconds, outbound):
+    registry.add("http_requests_total", labels)
+    view = {"route": labels["route"]}
+    bucket = next((str(bound) for bound in BUCKETS if seconds <= bound), "+Inf")
+    registry.add("http_request_duration_seconds_bucket", {**view, "le": bucket})
+    registry.add("http_request_duration_seconds_sum", view, seconds * MICROS)
+    registry.add("http_db_queries_total", view, queries)
+    registry.add("http_db_seconds_total", view, db_seconds * MICROS)
+    for provider, (calls, provider_seconds) in outbound.items():
+        registry.add("http_outbound_requests_total", {**view, "provider": provider}, calls)
+        registry.add("http_outbound_seconds_total", {**view, "provider": provider}, provider_seconds * MICROS)
+
+
+def record_job(command, job, seconds, rows=0):
+    """Add one run of a management command's sub-job and publish it straight away."""
+    labels = {"command": command, "job": job}
+    registry.add("job_runs_total", labels)
+    registry.add("job_seconds_total", labels, seconds * MICROS)
+    registry.add("job_rows_total", labels, rows or 0)
+    registry.flush()
+
+
+@contextlib.contextmanager
+def outbound(provider):
+    """Time a call to an external provider against the request being served, if any."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        request = _current.get()
+        if request is not None:
+            calls, total = request.outbound.get(provider, (0, 0))
+            request.outbound[provider] = (calls + 1, total + seconds)
+        else:
+            labels = {"route": "", "provider": provider}
+            registry.add("http_outbound_requests_total", labels)
+            registry.add("http_outbound_seconds_total", labels, seconds * MICROS)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0
+        self.outbound = {}
+
+
+def count_query(execute, sql, params, many, context):
+    """
+    Installed on every connection; charges the query to the request being
+    served. The request is found through a context variable rather than a
+    per-request wrapper because async views run their queries on
+    sync_to_async threads, whose connections are not the event loop's.
+    """
+    request = _current.get()
+    if request is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request.queries += 1
+        request.db_seconds += time.perf_counter() - started
+
+
+def install_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+connection_created.connect(install_query_counter)
+
+
+@sync_and_async_middleware
+class MetricsMiddleware:
+    """
+    Count requests per resolved route with a latency histogram, the SQL
+    they ran and the time spent waiting on SafeHaven, N3 and Termii.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # connections opened before this module was imported missed the signal
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(None, connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, metrics, seconds):
+        match = request.resolver_match
+        labels = {
+            # url names repeat across apps, the route pattern does not
+            "route": match.route if match else "unmatched",
+            "name": (match.url_name or "") if match else "",
+            "method": request.method,
+            "status": str(response.status_code),
+        }
+        observe_request(labels, seconds, metrics.queries, metrics.db_seconds, metrics.outbound)
+
+
+def render():
+    """All counters in the Prometheus text exposition format."""
+    samples = {}
+    for (name, labels), value in registry.snapshot().items():
+        samples.setdefault(name, []).append((dict(labels), value))
+
+    lines = []
+
+    def emit(name, kind, rows, scale=1):
+        lines.append(f"# TYPE wages_{name} {kind}")
+        for labels, value in sorted(rows, key=lambda row: sorted(row[0].items())):
+            text = ",".join(f'{key}="{escape(val)}"' for key, val in labels.items())
+            lines.append(f"wages_{name}{{{text}}} {value / scale:g}")
+
+    for name in ("http_requests_total", "http_db_queries_total", "http_outbound_requests_total",
+                 "job_runs_total", "job_rows_total"):
+        if name in samples:
+            emit(name, "counter", samples[name])
+    for name in ("http_db_seconds_total", "http_outbound_seconds_total", "job_seconds_total"):
+        if name in samples:
+            emit(name, "counter", samples[name], MICROS)
+
+    # stored per bucket; Prometheus expects cumulative buckets plus _sum and _count
+    buckets = {}
+    for labels, value in samples.get("http_request_duration_seconds_bucket", []):
+        route = labels["route"]
+        buckets.setdefault(route, {})[labels["le"]] = value
+    sums = {labels["route"]: value for labels, value in samples.get("http_request_duration_seconds_sum", [])}
+    if buckets:
+        lines.append("# TYPE wages_http_request_duration_seconds histogram")
+        for route in sorted(buckets):
+            total = 0
+            for bound in [str(bound) for bound in BUCKETS] + ["+Inf"]:
+                total += buckets[route].get(bound, 0)
+                lines.append(f'wages_http_request_duration_seconds_bucket{{route="{escape(route)}",le="{bound}"}} {total}')
+            lines.append(f'wages_http_request_duration_seconds_sum{{route="{escape(route)}"}} {sums.get(route, 0) / MICROS:g}')
+            lines.append(f'wages_http_request_duration_seconds_count{{route="{escape(route)}"}} {total}')
+    return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
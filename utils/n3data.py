@@ -1,6 +1,10 @@
+import asyncio
 import base64
+import weakref
+import httpx
 from decouple import config
 import requests
+from utils.metrics import outbound
 
 
 USERNAME = config("N3USERNAME")
@@ -14,6 +18,72 @@ headers = {
     "Authorization": f"Basic {encoded_credentials}"
 }
 
+NETWORKS = {
+    "MTN": 1,
+    "AIRTEL":2,
+    "GLO": 3,
+    "9MOBILE":4
+}
+# (connect, read) seconds for purchases, and how many may be in flight per process
+TIMEOUT = (config("N3_CONNECT_TIMEOUT", default=5, cast=float),
+           config("N3_READ_TIMEOUT", default=30, cast=float))
+MAX_CONNECTIONS = config("N3_MAX_CONNECTIONS", default=100, cast=int)
+# how long a purchase may queue for one of those connections
+POOL_TIMEOUT = config("N3_POOL_TIMEOUT", default=60, cast=float)
+PROVIDER_DOWN = "Provider not responding, please retry"
+
+
+def purchase_headers():
+    return {
+        "Authorization": f"Token {TOKEN}",
+        "Content-Type": "application/json"
+    }
+
+
+def data_payload(data):
+    """Build the /data request body, as (payload, None) or (None, error message)."""
+    plan_id_to_find = data.get("plan_id")
+    if not plan_id_to_find:
+        return (None, "No plan selected")
+    selected_plan = next((plan for plan in DATA_PLANS if plan["plan_id"] == plan_id_to_find), None)
+    if not selected_plan:
+        return (None, "Invalid plan")
+    payload = {
+        "network": NETWORKS.get(selected_plan["network"]),
+        "phone": data["number"],
+        "plan_type": "VTU",
+        "bypass": False,
+        "data_plan": selected_plan["plan_id"],
+        "request-id": data["reference"]
+    }
+    return (payload, None)
+
+
+def airtime_payload(data):
+    """Build the /topup/ request body, as (payload, None) or (None, error message)."""
+    newtork_id = NETWORKS.get(data["network"])
+    if not newtork_id:
+        return (None, "Invalid network")
+    payload = {
+        "network": newtork_id,
+        "phone": data["number"],
+        "plan_type": "VTU",
+        "bypass": False,
+        "amount": data["amount"],
+        "request-id": data["reference"]
+    }
+    return (payload, None)
+
+
+def purchase_result(status_code, json_response):
+    if status_code == 200:
+        status = json_response.get('status')
+        if status and status == 'success':
+            return (True, "success")
+        return (False, json_response.get('message', "Failed"))
+    return (False, json_response.get('message'))
+
+
 class DataAPI:
     @staticmethod
     def get_user():
@@ -24,81 +94,69 @@ class DataAPI:
             return json_response
     @staticmethod
     def buy_data(data):
-        networks = {
-            "MTN": 1,
-            "AIRTEL":2,
-            "GLO": 3,
-            "9MOBILE":4
-        }
-        url = f"{BASE_URL}/data"
-        plan_id_to_find = data.get("plan_id")
-        if not plan_id_to_find:
-            return (False, "No plan selected")
-        selected_plan = next((plan for plan in DATA_PLANS if plan["plan_id"] == plan_id_to_find), None)
-        if not selected_plan:
-            return (False, "Invalid plan")
-        newtork_id = networks.get(selected_plan["network"])
-        payload = {
-            "network": newtork_id,
-            "phone": data["number"],
-            "plan_type": "VTU",
-            "bypass": False,
-            "data_plan": selected_plan["plan_id"],
-            "request-id": data["reference"]
-        }
-        headers = {
-            "Authorization": f"Token {TOKEN}",
-            "Content-Type": "application/json"
-        }
-        # Make POST request
-        response = requests.post(url, headers=headers, json=payload)
-        # Check if the request was successful
-        json_response = response.json()
-        if response.status_code == 200:
-            # Load JSON response
-            status = json_response.get('status')
-            if status and status == 'success':
-                return (True, "success")
-            return (False, json_response.get('message', "Failed"))
-        else:
-            return (False, json_response.get('message'))
+        payload, error = data_payload(data)
+        if error:
+            return (False, error)
+        with outbound("n3"):
+            response = requests.post(f"{BASE_URL}/data", headers=purchase_headers(), json=payload, timeout=TIMEOUT)
+        return purchase_result(response.status_code, response.json())
     @staticmethod
     def buy_airtime(data):
-        desired_network = data["network"]
-        networks = {
-            "MTN": 1,
-            "AIRTEL":2,
-            "GLO": 3,
-            "9MOBILE":4
-        }
-        url = f"{BASE_URL}/topup/"
-        newtork_id = networks.get(desired_network)
-        if not newtork_id:
-            return (False, "Invalid network")
-        payload = {
-            "network": newtork_id,
-            "phone": data["number"],
-            "plan_type": "VTU",
-            "bypass": False,
-            "amount": data["amount"],
-            "request-id": data["reference"]
-        }
-        headers = {
-            "Authorization": f"Token {TOKEN}",
-            "Content-Type": "application/json"
-        }
-        # Make POST request
-        response = requests.post(url, headers=headers, json=payload)
-        # Check if the request was successful
-        json_response = response.json()
-        if response.status_code == 200:
-            # Load JSON response
-            status = json_response.get('status')
-            if status and status == 'success':
-                return (True, "success")
-            return (False, json_response.get('message', "Failed"))
-        else:
-            return (False, json_response.get('message'))
+        payload, error = airtime_payload(data)
+        if error:
+            return (False, error)
+        with outbound("n3"):
+            response = requests.post(f"{BASE_URL}/topup/", headers=purchase_headers(), json=payload, timeout=TIMEOUT)
+        return purchase_result(response.status_code, response.json())
+
+
+class AsyncDataAPI:
+    """
+    Non-blocking DataAPI for async views. Each event loop gets one pooled
+    httpx client; its connection limit caps concurrent purchases and the
+    rest queue for a free connection.
+    """
+    base_url = BASE_URL
+    _clients = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def client(cls):
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None:
+            connect, read = TIMEOUT
+            client = httpx.AsyncClient(
+                base_url=cls.base_url,
+                headers=purchase_headers(),
+                timeout=httpx.Timeout(read, connect=connect, pool=POOL_TIMEOUT),
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                    max_keepalive_connections=MAX_CONNECTIONS),
+            )
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    async def _purchase(cls, path, payload):
+        try:
+            with outbound("n3"):
+                response = await cls.client().post(path, json=payload)
+            return purchase_result(response.status_code, response.json())
+        except (httpx.HTTPError, ValueError):
+            return (False, PROVIDER_DOWN)
+
+    @classmethod
+    async def buy_data(cls, data):
+        payload, error = data_payload(data)
+        if error:
+            return (False, error)
+        return await cls._purchase("/data", payload)
+
+    @classmethod
+    async def buy_airtime(cls, data):
+        payload, error = airtime_payload(data)
+        if error:
+            return (False, error)
+        return await cls._purchase("/topup/", payload)
 
 DATA_PLANS =  [
     {
@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+import json
+import math
+import random
+import socket
+import threading
+import time
+import uuid
+import uvicorn
+
+TERMII_PATH = "/api/sms/send"
+
+
+class Profile:
+    """
+    How one provider behaves: lognormal latency around a median, a share of
+    500 responses, and for SafeHaven a share of 403s on otherwise valid tokens.
+    """
+
+    def __init__(self, median=0.2, sigma=0.5, error_rate=0.0, forbidden_rate=0.0):
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.forbidden_rate = forbidden_rate
+
+    @classmethod
+    def parse(cls, spec):
+        """Read "median:sigma:error_rate[:forbidden_rate]", e.g. "0.3:0.6:0.01:0.02"."""
+        try:
+            return cls(*[float(part) for part in spec.split(":")])
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid provider profile {spec!r}; expected median:sigma:error_rate[:forbidden_rate]")
+
+    def delay(self, rng):
+        return self.median * math.exp(self.sigma * rng.gauss(0, 1))
+
+
+class ProviderSimulator:
+    """
+    ASGI stand-in for the SafeHaven, N3 and Termii endpoints the code calls,
+    answering with the response shapes utils.safehaven, utils.n3data and
+    utils.sms read. SafeHaven tokens stop being accepted token_ttl seconds
+    after they are issued, while clients are told advertised_ttl.
+    """
+
+    def __init__(self, safehaven=None, n3=None, termii=None, token_ttl=300, advertised_ttl=None, seed=None):
+        self.profiles = {"safehaven": safehaven or Profile(), "n3": n3 or Profile(), "termii": termii or Profile()}
+        self.token_ttl = token_ttl
+        self.advertised_ttl = advertised_ttl or token_ttl
+        self.rng = random.Random(seed)
+        self.tokens = {}
+        self.numbers = itertools.count(1)
+        self.calls = {}
+        self.routes = {
+            "/oauth2/token": ("safehaven", self.token),
+            "/identity/v2": ("safehaven", self.identity),
+            "/identity/v2/validate": ("safehaven", self.validate),
+            "/accounts/subaccount": ("safehaven", self.subaccount),
+            "/transfers/name-enquiry": ("safehaven", self.name_enquiry),
+            "/transfers": ("safehaven", self.transfer),
+            "/data": ("n3", self.purchase),
+            "/topup/": ("n3", self.purchase),
+            "/user": ("n3", self.n3_user),
+            TERMII_PATH: ("termii", self.sms),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        status, payload = await self.handle(scope["path"], dict(scope["headers"]), body)
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": json.dumps(payload).encode()})
+
+    async def handle(self, path, headers, body):
+        if path not in self.routes:
+            return 404, {"message": "Not found"}
+        provider, handler = self.routes[path]
+        profile = self.profiles[provider]
+        self.calls[path] = self.calls.get(path, 0) + 1
+        await asyncio.sleep(profile.delay(self.rng))
+        if self.rng.random() < profile.error_rate:
+            return 500, {"statusCode": 500, "message": "Internal server error"}
+        if provider == "safehaven" and path != "/oauth2/token" and not self.authorized(headers, profile):
+            return 403, {"statusCode": 403, "message": "Forbidden"}
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"statusCode": 400, "message": "Invalid JSON"}
+        return handler(data)
+
+    def authorized(self, headers, profile):
+        token = headers.get(b"authorization", b"").decode().removeprefix("Bearer ")
+        expires_at = self.tokens.get(token)
+        if expires_at is None or expires_at < time.monotonic():
+            return False
+        return self.rng.random() >= profile.forbidden_rate
+
+    def token(self, data):
+        token = uuid.uuid4().hex
+        self.tokens[token] = time.monotonic() + self.token_ttl
+        return 201, {"access_token": token, "expires_in": self.advertised_ttl, "client_id": "simulator",
+                     "ibs_client_id": "simulator", "ibs_user_id": "simulator"}
+
+    def identity(self, data):
+        return 201, {"statusCode": 200, "data": {"_id": uuid.uuid4().hex, "type": data.get("type"),
+                                                   "status": "PENDING", "debitMessage": "Approved"}}
+
+    def validate(self, data):
+        return 201, {"statusCode": 200, "data": {"_id": data.get("identityId"), "providerResponse": {
+            "bvn": f"{next(self.numbers) + 20000000000:011d}", "firstName": "SIM", "lastName": "USER"}}}
+
+    def subaccount(self, data):
+        return 201, {"statusCode": 200, "data": {
+            "accountNumber": f"6{next(self.numbers):09d}", "accountName": "WAGES/SIMULATED"}}
+
+    def name_enquiry(self, data):
+        return 201, {"statusCode": 200, "data": {"sessionId": f"{next(self.numbers):030d}",
+                                                   "accountName": "SIMULATED BENEFICIARY"}}
+
+    def transfer(self, data):
+        return 201, {"statusCode": 200, "responseCode": "00", "message": "Approved or completed successfully",
+                     "data": {"sessionId": data.get("nameEnquiryReference"), "amount": data.get("amount"),
+                              "paymentReference": data.get("paymentReference"), "status": "Created"}}
+
+    def purchase(self, data):
+        return 200, {"status": "success", "message": "Purchase successful", "request-id": data.get("request-id")}
+
+    def n3_user(self, data):
+        return 200, {"status": "success", "balance": 1000000}
+
+    def sms(self, data):
+        return 200, {"code": "ok", "message_id": uuid.uuid4().hex, "message": "Successfully Sent"}
+
+
+def add_profile_arguments(parser):
+    help_text = 'median seconds:lognormal sigma:error rate[:403 rate]'
+    parser.add_argument('--safehaven', default='0.3:0.5:0.01:0.01', help=help_text)
+    parser.add_argument('--n3', default='0.8:0.6:0.02', help=help_text)
+    parser.add_argument('--termii', default='0.2:0.4:0.01', help=help_text)
+    parser.add_argument('--token-ttl', type=float, default=300,
+                        help='Seconds SafeHaven accepts a token for')
+    parser.add_argument('--advertised-ttl', type=float,
+                        help='expires_in reported to clients; set above --token-ttl to exercise the 403 refresh')
+    parser.add_argument('--seed', type=int, default=7)
+
+
+def build_simulator(options):
+    profiles = {name: Profile.parse(options[name]) for name in ('safehaven', 'n3', 'termii')}
+    return ProviderSimulator(token_ttl=options['token_ttl'], advertised_ttl=options['advertised_ttl'],
+                             seed=options['seed'], **profiles)
+
+
+def serve_in_thread(app, host="127.0.0.1", port=0):
+    """Run an ASGI app under uvicorn in a daemon thread; returns (server, thread, base_url)."""
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, "http://%s:%s" % sock.getsockname()
+
+
+def point_clients_at(base_url):
+    """Send this process's SafeHaven, N3 and Termii calls to base_url."""
+    from utils import n3data, safehaven, sms
+    safehaven.client.base_url = base_url
+    safehaven.client._token = None
+    n3data.BASE_URL = base_url
+    n3data.AsyncDataAPI.base_url = base_url
+    n3data.AsyncDataAPI._clients.clear()
+    sms.TERMII_BASE_URL = base_url + TERMII_PATH
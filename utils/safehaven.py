@@ -1,9 +1,14 @@
+import functools
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from decouple import config
+from django.db import IntegrityError, transaction
 from user.models import SafeHavenAPIDetails
+from user.accounts import register as register_account
+from utils.metrics import outbound
 from requests.exceptions import ReadTimeout
-from datetime import datetime, timedelta
-from django.utils import timezone
 import uuid
 
 
@@ -12,152 +17,159 @@ ACCOUNT = config("SAFEHAVEN_Account")
 CLIENT_ID = config("CLIENT_ID")
 CLIENT_ASSERTION = config("CLIENT_ASSERTION")
 BASE_URL = config("SAFE_HAVEN_BASE_URL")
-headers = {
-    "accept": "application/json",
-    "content-type": "application/json",
-    "ClientID": CLIENT_ID,
-    "Authorization": "Bearer abc"
-}
-
-
-def safehaven_auth(a=None):
-    global headers
-    token = SafeHavenAPIDetails.objects.first()
-    current_time = timezone.now()
-    token_expired = token and (
-        current_time - token.updated_at) > timedelta(minutes=2)
-
-    if a is not None or not token or token_expired:
-        url = f"{BASE_URL}/oauth2/token"
+# (connect, read) seconds
+TIMEOUT = (config("SAFEHAVEN_CONNECT_TIMEOUT", default=5, cast=float),
+           config("SAFEHAVEN_READ_TIMEOUT", default=30, cast=float))
+POOL_SIZE = config("SAFEHAVEN_POOL_SIZE", default=10, cast=int)
+# refresh this long before the provider says the token expires
+TOKEN_EXPIRY_MARGIN = 60
+BANK_ERROR = "An error occured from the bank, Please retry latter"
+
+
+class TokenRejected(Exception):
+    pass
+
+
+class SafeHavenClient:
+    """
+    One pooled, keep-alive session per process. The access token is kept in
+    memory until shortly before the expiry the token endpoint reports, and a
+    lock makes sure only one thread fetches a new one at a time.
+    """
+
+    def __init__(self, base_url=BASE_URL, timeout=TIMEOUT, pool_size=POOL_SIZE):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "accept": "application/json",
+            "content-type": "application/json",
+        })
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def token(self, stale=None):
+        """
+        Return a valid access token. Passing the token the provider just
+        rejected forces a refresh, unless another thread already replaced it.
+        """
+        token = self._token
+        if token and token != stale and time.monotonic() < self._expires_at:
+            return token
+        with self._lock:
+            if self._token and self._token != stale and time.monotonic() < self._expires_at:
+                return self._token
+            self._refresh()
+            return self._token
+
+    def _refresh(self):
         payload = {
             "grant_type": "client_credentials",
             "client_assertion_type": "urn:ietf:params:oauth:client-assertion-type:jwt-bearer",
             "client_id": CLIENT_ID,
             "client_assertion": CLIENT_ASSERTION
         }
-        local_headers = {
-            "accept": "application/json",
-            "content-type": "application/json"
-        }
-
-        response = requests.post(url, json=payload, headers=local_headers)
-
-        if response.status_code == 201:
-            data = response.json()
-            acc_token = data['access_token']
-            # Use .get() to provide a default value
-            client_id = data.get('client_id', '')
-            ibs_client_id = data.get('ibs_client_id', '')
-            ibs_user_id = data.get('ibs_user_id', '')
-
-            if token:
-                token.acc_token = acc_token
-                token.client_id = client_id
-                token.ibs_client_id = ibs_client_id
-                token.ibs_user_id = ibs_user_id
-                token.updated_at = current_time
-                token.save()
-            else:
-                token = SafeHavenAPIDetails.objects.create(
-                    acc_token=acc_token,
-                    client_id=client_id,
-                    ibs_client_id=ibs_client_id,
-                    ibs_user_id=ibs_user_id,
-                    updated_at=current_time
-                )
-                token.save()
-
-            # Update the global headers with the new access token
-            headers.update({
-                "Authorization": f"Bearer {acc_token}"
-            })
-    else:
-        return
+        with outbound("safehaven"):
+            response = self.session.post(f"{self.base_url}/oauth2/token", json=payload, timeout=self.timeout)
+        if response.status_code != 201:
+            raise TokenRejected(f"token request failed with {response.status_code}")
+        data = response.json()
+        # the old code assumed two minutes; keep that when the response gives no lifetime
+        lifetime = data.get("expires_in") or 120
+        self._token = data["access_token"]
+        self._expires_at = time.monotonic() + max(lifetime - TOKEN_EXPIRY_MARGIN, lifetime / 2)
+        # kept for visibility in the Django admin; requests never read it back
+        SafeHavenAPIDetails.objects.update_or_create(pk=1, defaults={
+            "acc_token": self._token,
+            "client_id": data.get("client_id", ""),
+            "ibs_client_id": data.get("ibs_client_id", ""),
+            "ibs_user_id": data.get("ibs_user_id", ""),
+        })
+
+    def post(self, path, payload):
+        """
+        POST with the current token, refreshing it once if SafeHaven answers
+        403 either as the HTTP status or in the body. Returns (response, body).
+        """
+        token = self.token()
+        response, body = self._post(path, payload, token)
+        if self._forbidden(response, body):
+            response, body = self._post(path, payload, self.token(stale=token))
+            if self._forbidden(response, body):
+                raise TokenRejected(path)
+        return response, body
+
+    def _post(self, path, payload, token):
+        with outbound("safehaven"):
+            response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout,
+                                         headers={"ClientID": CLIENT_ID, "Authorization": f"Bearer {token}"})
+        return response, response.json()
+
+    @staticmethod
+    def _forbidden(response, body):
+        return response.status_code == 403 or (isinstance(body, dict) and body.get("statusCode") == 403)
+
+
+client = SafeHavenClient()
+
+
+def bank_error_on_rejected_token(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except TokenRejected:
+            return (False, BANK_ERROR)
+        except requests.exceptions.RequestException:
+            return (False, "Service not responding, please retry")
+    return wrapper
 
 
+@bank_error_on_rejected_token
 def safe_initiate(data):
-    safehaven_auth()  # Ensure the token is up-to-date
-
-    url = f"{BASE_URL}/identity/v2"
     payload = {
         "type": data["type"],
         "number": str(data["number"]),
         "debitAccountNumber": ACCOUNT
     }
     try:
-        response = requests.post(url, json=payload, headers=headers)
-
-        resp = response.json()
+        response, resp = client.post("/identity/v2", payload)
         if response.status_code == 201:
             if "data" in resp.keys():
-                return (True, response.json()['data'])
-            if resp['statusCode'] == 403:
-                safehaven_auth(a=True)
-                response = requests.post(url, json=payload, headers=headers)
-                resp = response.json()
-                if response.status_code == 201:
-                    if "data" in resp.keys():
-                        return (True, response.json()['data'])
-                    if resp['statusCode'] == 403:
-                        return (False, "An error occured from the bank, Please retry latter")
-        if response.status_code == 403:
-            # Token expired, get a new token and retry
-            safehaven_auth(a=True)
-            response = requests.post(url, json=payload, headers=headers)
-            resp = response.json()
-            if response.status_code == 201:
-                if "data" in resp.keys():
-                    return (True, response.json()['data'])
-                return (False, "An error occured from the bank, Please retry latter")
+                return (True, resp['data'])
         if response.status_code == 500:
             return (False, "Service not responding, please retry")
-        return (False, response.json()['data']['debitMessage'])
+        return (False, resp['data']['debitMessage'])
     except ReadTimeout:
         return (False, "Verification server not responding")
     except requests.exceptions.RequestException as e:
         return (False, "Verification server not responding, please retry latter")
 
 
+@bank_error_on_rejected_token
 def safe_validate(data):
-    safehaven_auth()  # Ensure the token is up-to-date
-    url = f"{BASE_URL}/identity/v2/validate"
     payload = {
         "type": data["type"],
         "identityId": data["_id"],
         "otp": data["otp"]
     }
-    response = requests.post(url, json=payload, headers=headers)
-    resp = response.json()
-
+    response, resp = client.post("/identity/v2/validate", payload)
     if response.status_code == 201:
         if "data" in resp.keys():
-            return (True, response.json()["data"]["providerResponse"])
+            return (True, resp["data"]["providerResponse"])
         if resp['statusCode'] == 400:
             if resp["message"] == 'OTP already verified.':
                 return (True, "VERIFIED")
-        if resp['statusCode'] == 403:
-            safehaven_auth(a=True)
-            response = requests.post(url, json=payload, headers=headers)
-            resp = response.json()
-            if "data" in resp.keys():
-                return (True, response.json()["data"]["providerResponse"])
-            return (False, "An error occured from the bank, Please retry latter")
         return (False, resp["message"])
-    if response.status_code == 403:
-        # Token expired, get a new token and retry
-        safehaven_auth(a=True)
-        response = requests.post(url, json=payload, headers=headers)
-        resp = response.json()
-        if response.status_code == 201:
-            if "data" in resp.keys():
-                return (True, resp["data"]["providerResponse"])
-        return (False, "An error occured from the bank, Please retry latter")
-    return (False, "An error occured from the bank, Please retry latter")
+    return (False, BANK_ERROR)
 
 
-def create_safehaven_account(data):
-    safehaven_auth()  # Ensure the token is up-to-date
-    url = f"{BASE_URL}/accounts/subaccount"
+@bank_error_on_rejected_token
+def create_safehaven_account(user, data):
     payload = {
         "phoneNumber": data["phone"],
         "emailAddress": data["email"],
@@ -172,70 +184,37 @@ def create_safehaven_account(data):
             "accountNumber": ACCOUNT
         }
     }
-    response = requests.post(url, json=payload, headers=headers)
-    resp = response.json()
-    if response.status_code == 201:
-        if "data" in resp.keys():
-            return (resp["data"]["accountNumber"], resp["data"]["accountName"])
-        if resp['statusCode'] == 403:
-            safehaven_auth(a=True)
-            response = requests.post(url, json=payload, headers=headers)
-            resp = response.json()
-            if "data" in resp.keys():
-                return (True, response.json()["data"]["providerResponse"])
-            return (False, "An error occured from the bank, Please retry latter")
-        return (False, resp["message"])
-    if response.status_code == 403:
-        # Token expired, get a new token and retry
-        safehaven_auth(a=True)
-        response = requests.post(url, json=payload, headers=headers)
-        resp = response.json()
-        if response.status_code == 201:
-            if "data" in resp.keys():
-                return (resp["data"]["accountNumber"], resp["data"]["accountName"])
-            return (False, "An error occured from the bank, Please retry latter")
+    response, resp = client.post("/accounts/subaccount", payload)
     if not "data" in resp:
         return (False, resp["message"])
-    return (resp["data"]["accountNumber"], resp["data"]["accountName"])
+    account_number, account_name = resp["data"]["accountNumber"], resp["data"]["accountName"]
+    try:
+        # a savepoint, so the caller's transaction survives a collision
+        with transaction.atomic():
+            register_account(user, account_number, account_name, data["bvn"])
+    except IntegrityError:
+        # unique identity_hash or one account per user: SafeHaven opened one we cannot keep
+        return (False, "A wallet account is already registered for this BVN or user")
+    return (account_number, account_name)
 
 
+@bank_error_on_rejected_token
 def safe_name_enquires(data):
-    safehaven_auth()  # Ensure the token is up-to-date
-    url = f"{BASE_URL}/transfers/name-enquiry"
     payload = {
         "bankCode": data["bankCode"],
         "accountNumber": data["accountNumber"],
     }
-    response = requests.post(url, json=payload, headers=headers)
-    resp = response.json()
+    response, resp = client.post("/transfers/name-enquiry", payload)
     if response.status_code == 201:
         if "data" in resp.keys():
             reply = {"id": resp["data"]["sessionId"],
                      "accountName": resp["data"]["accountName"]}
             return (True, reply)
-        if resp['statusCode'] == 403:
-            safehaven_auth(a=True)
-            response = requests.post(url, json=payload, headers=headers)
-            resp = response.json()
-            if "data" in resp.keys():
-                return (True, resp["data"]["sessionId"])
-            return (False, "An error occured from the bank, Please retry latter")
-    if response.status_code == 403:
-        safehaven_auth(a=True)
-        response = requests.post(url, json=payload, headers=headers)
-        resp = response.json()
-        if response.status_code == 201:
-            if "data" in resp.keys():
-                reply = {"id": resp["data"]["sessionId"],
-                         "accountName": resp["data"]["accountName"]}
-                return (True, reply)
-            return (False, "An error occured from the bank, Please retry latter")
     return (False, resp["message"])
 
 
+@bank_error_on_rejected_token
 def send_money(data):
-    safehaven_auth()  # Ensure the token is up-to-date
-    url = f"{BASE_URL}/transfers"
     payload = {
         "nameEnquiryReference": data["nameEnquiryReference"],
         "debitAccountNumber": ACCOUNT,
@@ -246,27 +225,10 @@ def send_money(data):
         "narration": data["narration"],
         "paymentReference": data["paymentReference"]
     }
-    response = requests.post(url, json=payload, headers=headers)
-    resp = response.json()
+    response, resp = client.post("/transfers", payload)
     if response.status_code == 201:
         if resp['message'] == 'Approved or completed successfully':
             return (True, {"message": "success"})
-        if resp['statusCode'] == 403:
-            safehaven_auth(a=True)
-            response = requests.post(url, json=payload, headers=headers)
-            resp = response.json()
-            if response.status_code == 201:
-                if resp['message'] == 'Approved or completed successfully':
-                    return (True, {"message": "success"})
-            return (False, "An error occured from the bank, Please retry latter")
-    if response.status_code == 403:
-        safehaven_auth(a=True)
-        response = requests.post(url, json=payload, headers=headers)
-        resp = response.json()
-        if response.status_code == 201:
-            if resp['message'] == 'Approved or completed successfully':
-                return (True, {"message": "success"})
-            return (False, "An error occured from the bank, Please retry latter")
     return (False, resp["message"])
 
 
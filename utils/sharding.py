@@ -0,0 +1,20 @@
+from django.db.models.functions import Mod
+
+
+def parse_shard(value):
+    """Parse an "N/M" option into (N, M), with 0 <= N < M."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except (AttributeError, ValueError):
+        raise ValueError("shard must look like N/M, e.g. 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError("shard must satisfy 0 <= N < M")
+    return index, count
+
+
+def in_shard(queryset, shard, field="user_id"):
+    """Restrict the queryset to rows whose user id hashes to this shard."""
+    if shard is None:
+        return queryset
+    index, count = shard
+    return queryset.alias(shard_key=Mod(field, count)).filter(shard_key=index)
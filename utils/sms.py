@@ -1,5 +1,7 @@
 import requests
 from decouple import config
+from notification.outbox import enqueue
+from utils.metrics import outbound
 
 API_KEY = config('TERMII_API_KEY')
 TERMII_BASE_URL = config('TERMII_BASE_URL')
@@ -7,6 +9,11 @@ TERMII_BASE_URL = config('TERMII_BASE_URL')
 class SendSMS:
     @staticmethod
     def sendVerificationCode(info):
+        # sent by run_outbox_worker once the caller's transaction commits
+        enqueue("SMS", {"number": info["number"], "token": info["token"]})
+
+    @staticmethod
+    def deliver(info):
         url = TERMII_BASE_URL
         payload = {
                 "to": info["number"],
@@ -19,4 +26,6 @@ class SendSMS:
         headers = {
         'Content-Type': 'application/json',
         }
-        response = requests.request("POST", url, headers=headers, json=payload)
+        with outbound("termii"):
+            response = requests.request("POST", url, headers=headers, json=payload, timeout=30)
+        response.raise_for_status()